@@ -1,19 +1,25 @@
 import pandas as pd
 import os
+import threading
+from collections import OrderedDict
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-from .models import db, Admin, Order, OrderStatus  # 修改為相對導入
+from .models import db, Admin, Order, OrderStatus, Product  # 修改為相對導入
 from .config import Config
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 import plotly.express as px
 import json
 from codes.db import dbconfig, DB
-from tools.load_path import LoadPath
-from predict.models import Pred_total, Pred_sales
-from predict.total_pred.predict_total_sales import Pred_Total_Sales
-from predict.sales_pred.predict_sales_v4_2 import Pred_Sales
-from weather_API.weather_API import weather_dict, classify_weather, get_weather_data, get_tomorrow_weather
+from codes.query_stats import query_stats, instrument_engine
+from codes.menu_index import menu_index
+from codes.order_stats import get_order_stats
+from codes.order_queries import SALES_RANKING_QUERY, DAILY_SALES_TREND_QUERY, TOP_PRODUCTS_QUERY
+from codes.sales_rollup import get_sales_rollup
+from codes.wait_estimator import get_wait_estimator, order_key
+from predict.recommendation_scheduler import get_recommendation, recommendation_scheduler
+from weather_API.weather_API import weather_dict, classify_weather, get_tomorrow_weather
+from weather_API.weather_cache import get_cached_weather, weather_cache
 
 
 
@@ -39,7 +45,17 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 # 初始化資料庫
 db.init_app(app)
+with app.app_context():
+    instrument_engine(db.engine)  # SQLAlchemy 查詢也記錄到 query_stats
 db2 = DB(dbconfig())
+db2.init_app(app)  # 每個請求結束時歸還連線到連線池
+
+# 啟動時建立/回填每日銷售彙總表，之後的訂單與狀態改變只做增量更新
+# 資料庫無法連線時不影響啟動，第一筆訂單或分析查詢時會再嘗試
+try:
+    get_sales_rollup().ensure_ready()
+except Exception as e:
+    print(f"每日銷售彙總表初始化失敗: {str(e)}")
 
 
 # 初始化登入管理器
@@ -51,6 +67,12 @@ login_manager.login_message = '請先登入'  # 添加中文提示訊息
 socketio = SocketIO(cors_allowed_origins="*")
 socketio.init_app(app)
 
+# 啟動時就開始背景更新天氣快取
+weather_cache.start()
+
+# 啟動時就開始預先計算推薦，避免開機後的前幾個請求都使用備援推薦
+recommendation_scheduler.start()
+
 @login_manager.user_loader
 def load_user(user_id):
     return Admin.query.get(int(user_id))
@@ -78,16 +100,12 @@ def login():
 def dashboard():
     print("開始載入儀表板...")
     try:
-        # 獲取今日訂單統計
-        today = datetime.utcnow().date()
+        # 獲取今日訂單統計 (單一 GROUP BY 查詢，短暫快取，訂單狀態改變時失效)
+        # 與點餐端寫入 order_date 的方式相同，使用伺服器本地日期
+        today = datetime.now().date()
         print(f"正在查詢今日({today})訂單...")
         
-        stats = {
-            'total_orders': Order.query.filter(Order.order_date == today).count(),
-            'pending_orders': Order.query.filter_by(status=OrderStatus.PENDING).count(),
-            'processing_orders': Order.query.filter_by(status=OrderStatus.PROCESSING).count(),
-            'completed_orders': Order.query.filter_by(status=OrderStatus.COMPLETED).count()
-        }
+        stats = get_order_stats().get(today)
         print("訂單統計查詢完成:", stats)
         
         return render_template('dashboard.html', stats=stats)
@@ -119,6 +137,13 @@ def products():
     products = Product.query.all()
     return render_template('products.html', products=products)
 
+def refresh_menu_index():
+    """產品異動後重新讀取菜單，前台的點餐解析器只更新有變化的名稱"""
+    try:
+        menu_index.load(db2)
+    except Exception as e:
+        print(f"更新菜單索引失敗: {str(e)}")
+
 # 產品 API 端點
 @app.route('/api/products', methods=['GET', 'POST'])
 @login_required
@@ -146,6 +171,7 @@ def api_products():
             
             db.session.add(product)
             db.session.commit()
+            refresh_menu_index()
             return jsonify({'status': 'success', 'message': '產品已新增'})
             
         except Exception as e:
@@ -180,6 +206,7 @@ def api_product(product_id):
                     product.image_url = f'/static/uploads/{filename}'
             
             db.session.commit()
+            refresh_menu_index()
             return jsonify({'status': 'success', 'message': '產品已更新'})
             
         except Exception as e:
@@ -195,6 +222,7 @@ def api_product(product_id):
             
             db.session.delete(product)
             db.session.commit()
+            refresh_menu_index()
             return jsonify({'status': 'success', 'message': '產品已刪除'})
             
         except Exception as e:
@@ -209,6 +237,7 @@ def update_product_status(product_id):
     try:
         product.is_available = data['is_available']
         db.session.commit()
+        refresh_menu_index()
         return jsonify({'status': 'success'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 400
@@ -233,8 +262,18 @@ def update_order_status(order_id):
             return jsonify({'status': 'error', 'message': f'無效的狀態：{new_status}，有效狀態：{all_statuses}'}), 400
 
         old_status = order.status
+        # 彙總表的增減與訂單狀態在同一個交易中 commit
+        sales_rollup = get_sales_rollup()
+        rollup_batches = sales_rollup.status_change_batches(order, old_status, new_status)
         order.status = new_status
+        for rollup_query, rollup_values in rollup_batches:
+            db.session.connection().exec_driver_sql(rollup_query, rollup_values)
         db.session.commit()
+        if rollup_batches:
+            sales_rollup.mark_changed()
+        get_order_stats().record_status_change(old_status, new_status, order.order_date)
+        get_wait_estimator().record_status(order_key(order.order_number, order.order_id), new_status,
+                                           drink=order.drink_name, created_at=order.created_at)
         
         # 計算新的等候時間
         waiting_time = calculate_waiting_time()
@@ -307,30 +346,16 @@ def get_waiting_time():
 #後台計算等候時間的函數
 def calculate_waiting_time():
     """計算目前等候時間（僅考慮未完成且未取消的訂單）"""
-    # 只計算待處理和處理中的訂單
-    active_count = Order.query.filter(
-        Order.status.in_([OrderStatus.PENDING.value, OrderStatus.PROCESSING.value])
-    ).count()
-    waiting_minutes = round(active_count * 1.2, 1)  # 四捨五入到小數點後一位
-    return waiting_minutes
+    # 記憶體中的佇列依各飲料實際的製作時間估計，不需每次查詢資料庫
+    return get_wait_estimator().waiting_minutes()
 
 # -----數據分析頁面------------------------------------------------------------
 
 def get_sales_ranking(days): ## get_sales_ranking_query
-    #{days}日內所有飲料銷售排名(包含銷售量為0商品)
-    query = """
-         SELECT
-             m.drink_name,
-             COALESCE(COUNT(o.drink_name), 0) AS total_sales
-         FROM menu AS m
-         LEFT JOIN orders AS o
-             ON m.drink_name = o.drink_name
-             AND o.order_date BETWEEN DATE_SUB(CURDATE(), INTERVAL %s DAY) AND CURDATE()
-         GROUP BY m.drink_name
-         ORDER BY total_sales DESC;
-         """
+    #{days}日內所有飲料銷售排名(包含銷售量為0商品)，讀取每日銷售彙總表
+    get_sales_rollup().ensure_ready()
     db2.connect()
-    db2.execute(query=query, data=(days,))
+    db2.execute(query=SALES_RANKING_QUERY, data=(days,))
     sales = db2.fetchall()
     # print(f"sales: {sales}")
     # db2.disconnect()
@@ -339,6 +364,15 @@ def get_sales_ranking(days): ## get_sales_ranking_query
     # print(f"sales_dict: {sales_dict}")
     return sales_dict
 
+@app.route('/api/db_metrics', methods=['GET'])
+@login_required
+def db_metrics():
+    """資料庫連線池與各查詢的耗時統計"""
+    return jsonify({
+        "pool": db2.metrics(),
+        "queries": query_stats.snapshot()
+    })
+
 @app.route('/analytics')
 @login_required
 def analytics():
@@ -347,7 +381,10 @@ def analytics():
 
 @app.route("/api/weather", methods=["GET"])
 def weather_api():
-    station, location, weather, temperature = get_weather_data()
+    weather_data = get_cached_weather()
+    if not weather_data:
+        return jsonify({"error": "天氣資料尚未更新，請稍後再試"}), 503
+    station, location, weather, temperature = weather_data
     return jsonify({
          "station": station,
          "location": location,
@@ -373,66 +410,15 @@ def tomorrow_weather():
 
 @app.route('/api/predict_sales', methods=['GET'])
 def predict_sales():
-    test_date = latest_weather['date']
-    test_weather = latest_weather['weather']
-    test_temperature = latest_weather['temperature']
-
-    total_model_filename = "sales_total_model_v2_2025_03_18.pkl"
-    sales_model_filename = "lgbm_drink_weather_model_v4_2025_03_18.pkl"
-    sales_csv_filename = "drink_orders_2025_03_18.csv"
-    load_path = LoadPath(total_model_filename=total_model_filename,
-                         sales_model_filename=sales_model_filename,
-                         sales_csv_filename=sales_csv_filename
-                         )
-    total_model_filename = load_path.load_total_model_path()
-    sales_model_filename = load_path.load_sales_model_path()
-    sales_csv_filename = load_path.load_sales_csv_path()
-
-    missing_files = [
-         filename for filename in [total_model_filename, sales_model_filename, sales_csv_filename]
-             if not os.path.exists(filename)
-             ]
-    if missing_files:
-        print(f"錯誤: 未找到以下檔案 {', '.join(missing_files)}")
-        return fallback_recommendation()
-    
-    # 錯誤處理包裝 - 使用備用推薦
-    try:
-        # 第一步: 總銷量預測
-        pred_total_info = Pred_total(
-             date_string=test_date,
-             weather=test_weather,
-             temperature=test_temperature,
-             model_filename=total_model_filename
-             )
-        
-        predtotal = Pred_Total_Sales(pred_total_info)
-        daily_total_sales = predtotal.pred()
-        print(f"預測總銷量: {daily_total_sales} 杯")
-        
-        # 第二步: 飲品銷量預測
-        pred_sales_info = Pred_sales(
-             date_string=test_date,
-             weather=test_weather,
-             temperature=test_temperature,
-             daily_total_sales=daily_total_sales,
-             model_filename=sales_model_filename,
-             csv_filename=sales_csv_filename
-             )
-
-        predsales = Pred_Sales(pred_sales_info)
-        weather_recommend = predsales.get_top_6_sales_by_condition()
-        print(f"推薦飲品: {weather_recommend}")
-
-        return jsonify({
-            "daily_total_sales": daily_total_sales,
-            "top_6_drinks": weather_recommend
-        })
-        
-    except Exception as e:
-        print(f"預測過程中發生錯誤: {str(e)}")
-        # 使用備用推薦
+    # 明日的預測由背景排程在天氣或模型改變時預先計算，這裡只讀取結果
+    recommendation = get_recommendation('tomorrow')
+    if recommendation is None:
         return fallback_recommendation()
+    return jsonify({
+        "daily_total_sales": recommendation['daily_total_sales'],
+        "top_6_drinks": recommendation['top_6_drinks'],
+        "computed_at": recommendation['computed_at']
+    })
 
 def fallback_recommendation():
     """當推薦模型失敗時提供備用推薦"""
@@ -455,26 +441,50 @@ def fallback_recommendation():
         "top_6_drinks": top_drinks
     })
 
-@app.route('/api/sales_chart')
-def sales_chart():
-    days = request.args.get("days", default=7, type=int)  # 取得輸入的天數
-    sales_data = get_sales_ranking(days)
-    # print(f"sales_data: {sales_data}")
-    # 轉換為 DataFrame，確保所有品項都存在
-    df = pd.DataFrame({'飲料名稱': list(sales_data.keys()), '銷量': list(sales_data.values())})
+# 銷售排行圖快取：days -> {stamp, data, html}
+# 產生 Plotly 圖與序列化 HTML 遠比查詢本身耗時，銷售資料版本戳記未變時直接回傳記憶體中的結果
+SALES_CHART_CACHE_SIZE = 16
+sales_chart_cache = OrderedDict()
+sales_chart_lock = threading.Lock()
+
+def get_sales_chart_entry(days):
+    """取得 (必要時重新查詢) days 天銷售排行的快取項目"""
+    # 先取版本戳記再查詢：查詢期間有新訂單時，下次請求會因戳記不同而重新查詢
+    stamp = get_sales_rollup().data_version()
+    with sales_chart_lock:
+        entry = sales_chart_cache.get(days)
+        if entry and entry['stamp'] == stamp:
+            sales_chart_cache.move_to_end(days)
+            return entry
 
-    df["銷量"] = pd.to_numeric(df["銷量"], errors="coerce").fillna(0).astype(int)
-    # print(df["銷量"].describe())  # 看看是否範圍跑掉
-    # print(df["銷量"].dtype)  # 確認資料型態
+    sales_data = get_sales_ranking(days)
+    # 銷量小的在最下方（橫向條狀圖）
+    ranking = sorted(((name, int(count or 0)) for name, count in sales_data.items()), key=lambda item: item[1])
+    entry = {
+        'stamp': stamp,
+        'data': {
+            'days': days,
+            'version': stamp,
+            'labels': [name for name, _ in ranking],
+            'values': [count for _, count in ranking]
+        },
+        'html': None
+    }
+    with sales_chart_lock:
+        sales_chart_cache[days] = entry
+        sales_chart_cache.move_to_end(days)
+        while len(sales_chart_cache) > SALES_CHART_CACHE_SIZE:
+            sales_chart_cache.popitem(last=False)
+    return entry
 
-    df = df.sort_values(by="銷量", ascending=True)  # 銷量小的在最下方（橫向條狀圖）
-    # print(df.columns)  # 應該輸出 Index(['飲料名稱', '銷量'], dtype='object')
-    # print(df.dtypes)
+def render_sales_chart(data):
+    """以排行資料產生長條圖 HTML"""
+    df = pd.DataFrame({'飲料名稱': data['labels'], '銷量': data['values']})
 
     # 產生長條圖
     min_height = 300
     fig = px.bar(df, x="銷量", y="飲料名稱", orientation='h', 
-                 title=f"過去 {days} 天的飲料銷售排名", color="銷量", 
+                 title=f"過去 {data['days']} 天的飲料銷售排名", color="銷量", 
                  height=max(min_height, 25 * len(df)))
 
     fig.update_layout(
@@ -486,9 +496,28 @@ def sales_chart():
         xaxis=dict(title="銷量", tickfont=dict(size=14))
     )
 
-    graph_html = fig.to_html(full_html=False, include_plotlyjs="cdn")
+    return fig.to_html(full_html=False, include_plotlyjs="cdn")
+
+@app.route('/api/sales_chart')
+def sales_chart():
+    """
+    飲料銷售排行圖
+    預設回傳伺服器產生的 Plotly HTML；format=json 時只回傳排行資料，由前端自行繪圖
+    """
+    days = request.args.get("days", default=7, type=int)  # 取得輸入的天數
+    output = request.args.get("format", default="html")
+    entry = get_sales_chart_entry(days)
+
+    if output == "json":
+        response = jsonify(entry['data'])
+    else:
+        if entry['html'] is None:
+            entry['html'] = render_sales_chart(entry['data'])
+        response = Response(entry['html'], mimetype="text/html")  # 回傳完整 HTML
 
-    return Response(graph_html, mimetype="text/html")  # 回傳完整 HTML
+    # 相同版本的資料讓瀏覽器以 304 沿用自己的快取
+    response.set_etag(f"{entry['stamp']}-{days}-{output}")
+    return response.make_conditional(request)
 
 #---數據分析頁面-以上--
 
@@ -498,22 +527,16 @@ def calculate_growth(current, previous):
     return round(((current - previous) / previous) * 100, 2)
 
 def get_sales_trend(start_date):
-    # 獲取每日銷售數據
-    daily_sales = db.session.query(
-        Order.order_date,
-        db.func.count(Order.id).label('orders'),
-        db.func.sum(Order.total_amount).label('revenue')
-    ).filter(
-        Order.order_date >= start_date
-    ).group_by(
-        Order.order_date
-    ).all()
+    # 獲取每日銷售數據 (每日銷售彙總表)
+    get_sales_rollup().ensure_ready()
+    daily_sales = db2.fetch_all(DAILY_SALES_TREND_QUERY, (start_date,))
+    db2.close()
     
     dates = []
     sales = []
-    for date, orders, revenue in daily_sales:
-        dates.append(date.strftime('%Y-%m-%d'))
-        sales.append(float(revenue or 0))
+    for row in daily_sales:
+        dates.append(row['sale_date'].strftime('%Y-%m-%d'))
+        sales.append(float(row['revenue'] or 0))
     
     return {
         'labels': dates,
@@ -521,21 +544,14 @@ def get_sales_trend(start_date):
     }
 
 def get_top_products(start_date):
-    # 獲取熱門商品數據
-    top_products = db.session.query(
-        Order.drink_name,
-        db.func.count(Order.id).label('count')
-    ).filter(
-        Order.order_date >= start_date
-    ).group_by(
-        Order.drink_name
-    ).order_by(
-        db.text('count DESC')
-    ).limit(5).all()
+    # 獲取熱門商品數據 (每日銷售彙總表)
+    get_sales_rollup().ensure_ready()
+    top_products = db2.fetch_all(TOP_PRODUCTS_QUERY, (start_date, 5))
+    db2.close()
     
     return {
-        'labels': [p[0] for p in top_products],
-        'data': [p[1] for p in top_products]
+        'labels': [p['drink_name'] for p in top_products],
+        'data': [int(p['count']) for p in top_products]
     }
 
 # 系統設定頁面
@@ -1,87 +1,3 @@
-import mysql.connector
-import os
-from dotenv import load_dotenv
-from mysql.connector import Error
-from .models import DBUser
-
-load_dotenv()
-
-def dbconfig() -> DBUser:
-    return DBUser(
-         host=os.getenv("DB_HOST"),
-         port=int(os.getenv("DB_PORT")),
-         user=os.getenv("DB_USER"),
-         password=os.getenv("DB_PASSWORD"),
-         database=os.getenv("DB_NAME")
-         )
-
-class DB:
-    def __init__(self, account: DBUser):
-        self.host = account.host
-        self.port = account.port
-        self.user = account.user
-        self.password = account.password
-        self.database = account.database
-        self.conn = None
-        self.cursor = None
-
-    def connect(self):
-        try:
-            self.conn = mysql.connector.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
-            if self.conn.is_connected():
-                    print(f"資料庫: {self.database} 連線成功666")
-                    self.cursor = self.conn.cursor()
-        except Error as e:
-            print(f"資料庫錯誤: {e}")
-            self.conn = None
-            self.cursor = None
-
-    def disconnect(self):
-        if self.conn and self.conn.is_connected():
-            self.cursor.close()
-            self.conn.close()
-            print('資料庫關閉連線')
-
-    # def execute(self, query: str, data: tuple = None):
-    #     if self.conn and self.cursor:
-    #         try:
-    #             self.cursor.execute(query, data)
-    #             self.conn.commit()
-    #             return self.cursor.fetchall()  # 如果是查詢資料會返回結果
-    #         except Exception as e:
-    #             print(f"execute錯誤: {e}")
-    #             return None
-    #     else:
-    #         print("資料庫尚未連線")
-    #         return None
-    
-    def execute(self, query: str, data: tuple = None):
-        if self.conn and self.cursor:
-            try:
-                if data:
-                    self.cursor.execute(query, data)
-                else:
-                    self.cursor.execute(query)
-
-                if self.cursor.description:  # 只有 SELECT 會有 description
-                    result = self.cursor.fetchall()
-                else:
-                    self.conn.commit()
-                    result = None  # 非查詢類 SQL 沒有回傳結果
-
-                return result
-
-            except Exception as e:
-                print(f"execute 錯誤: {e}")
-                return None
-        else:
-            print("資料庫尚未連線")
-            return None
-    def roll_back(self):
-        self.conn.rollback()
\ No newline at end of file
+# 資料庫存取已統一至專案根目錄的 codes.db (連線池 + 查詢統計)
+# 保留此模組以相容舊的匯入路徑
+from codes.db import DB, DBUser, dbconfig
@@ -18,6 +18,14 @@ def get_tw_time():
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    # 與 codes/order_queries.py 的 ORDER_INDEXES 一致；既有資料庫以 tools/migrate_order_indexes.py 補上
+    __table_args__ = (
+        db.Index('ix_orders_date_status', 'order_date', 'status'),
+        db.Index('ix_orders_order_number', 'order_number'),
+        db.Index('ix_orders_date_drink', 'order_date', 'drink_name'),
+        db.Index('ix_orders_created_at', 'created_at'),
+        db.Index('ix_orders_status_updated', 'status', 'updated_at'),
+    )
     order_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     drink_name = db.Column(db.String(20), nullable=False)
     size = db.Column(db.Enum('大杯', '小杯'), nullable=False, default='小杯')
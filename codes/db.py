@@ -1,11 +1,24 @@
 import os
+import queue
+import threading
+import time
 import pymysql
 from pymysql.cursors import DictCursor
 from dataclasses import dataclass
 from dotenv import load_dotenv
+from codes.query_stats import timed_query
 
 load_dotenv()
 
+# 連線池設定
+# 同一個 thread 的所有 DB 物件共用一條連線，一個請求 (或背景執行緒) 最多佔用一條
+# DB_POOL_SIZE 需大於同時處理的請求數 + 背景執行緒數 (天氣、推薦、等候時間重建...)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))          # 最大連線數
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))   # 等待可用連線的秒數
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+DB_READ_TIMEOUT = int(os.getenv("DB_READ_TIMEOUT", 30))
+DB_WRITE_TIMEOUT = int(os.getenv("DB_WRITE_TIMEOUT", 30))
+
 @dataclass
 class DBUser:
     host: str
@@ -23,7 +36,141 @@ def dbconfig() -> DBUser:
         database=os.getenv("DB_NAME")
     )
 
+
+class PoolTimeoutError(Exception):
+    """等待可用連線逾時"""
+
+
+class ConnectionPool:
+    """
+    pymysql 連線池
+    借出時先 ping 確認連線可用，歸還時 rollback 清除未結束的交易
+    local 保存每個 thread 借出的連線，使用同一個連線池的 DB 物件共用
+    """
+    def __init__(self, config: DBUser, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.config = config
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.local = threading.local()
+        # 統計數據
+        self.in_use = 0
+        self.created = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    def _create(self):
+        conn = pymysql.connect(
+            host=self.config.host,
+            port=self.config.port,
+            user=self.config.user,
+            password=self.config.password,
+            db=self.config.database,
+            charset='utf8mb4',
+            cursorclass=DictCursor,
+            connect_timeout=DB_CONNECT_TIMEOUT,
+            read_timeout=DB_READ_TIMEOUT,
+            write_timeout=DB_WRITE_TIMEOUT
+        )
+        with conn.cursor() as cursor:
+            cursor.execute("SET SESSION time_zone = '+08:00';")
+        with self._lock:
+            self.created += 1
+        print("資料庫連線成功")
+        return conn
+
+    def acquire(self):
+        """借出一條連線，池滿時最多等待 timeout 秒"""
+        if not self._slots.acquire(blocking=False):
+            start = time.perf_counter()
+            acquired = self._slots.acquire(timeout=self.timeout)
+            with self._lock:
+                self.waits += 1
+                self.wait_time += time.perf_counter() - start
+                if not acquired:
+                    self.timeouts += 1
+            if not acquired:
+                raise PoolTimeoutError(f"等待資料庫連線逾時 ({self.timeout} 秒)")
+
+        try:
+            conn = None
+            while conn is None:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._create()
+                    break
+                # 借出前的健康檢查，失效的連線直接丟棄
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    self._close_quietly(conn)
+                    conn = None
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.in_use += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        """歸還連線；discard=True 或交易無法清除時關閉連線"""
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            self._close_quietly(conn)
+        else:
+            self._idle.put(conn)
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "in_use": self.in_use,
+                "idle": self._idle.qsize(),
+                "created": self.created,
+                "waits": self.waits,
+                "wait_time": round(self.wait_time, 4),
+                "timeouts": self.timeouts
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(config: DBUser) -> ConnectionPool:
+    """相同資料庫設定共用同一個連線池"""
+    key = (config.host, config.port, config.user, config.database)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(config)
+        return _pools[key]
+
+
 class DB:
+    """
+    以連線池為基礎的資料庫操作
+    每個 thread 在第一次查詢時借出一條連線，同一個資料庫設定的 DB 物件 (請求用的 db、
+    訂單號碼配發器、統計與彙總的單例...) 共用這條連線，close() 時歸還
+    在 Flask 中可呼叫 init_app(app)，請求期間 release() 不歸還，請求結束時統一歸還
+    """
     def __init__(self, config: DBUser):
         self.config = config
         # 使用點運算符存取屬性
@@ -32,40 +179,80 @@ class DB:
         self.user = config.user
         self.password = config.password
         self.database = config.database
-        self.conn = None
-        self.cursor = None
+        self.pool = get_pool(config)
+        self._local = self.pool.local
+
+    @property
+    def conn(self):
+        return getattr(self._local, 'conn', None)
+
+    @property
+    def cursor(self):
+        return getattr(self._local, 'cursor', None)
+
+    def init_app(self, app):
+        """請求結束時歸還該 thread 借出的連線"""
+        app.before_request(self._enter_request)
+        app.teardown_appcontext(self._leave_request)
+
+    def _enter_request(self):
+        self._local.in_request = True
+
+    def _leave_request(self, exception=None):
+        self._local.in_request = False
+        self.close()
 
     def connect(self):
-        """建立資料庫連接"""
+        """向連線池借出連線 (同一個 thread 重複呼叫會沿用已借出的連線)"""
         if not self.conn:
             try:
-                self.conn = pymysql.connect(
-                    host=self.host,
-                    port=self.port,
-                    user=self.user,
-                    password=self.password,
-                    db=self.database,
-                    charset='utf8mb4',
-                    cursorclass=DictCursor
-                )
-                self.cursor = self.conn.cursor()
-                self.cursor.execute("SET SESSION time_zone = '+08:00';")
-                print("資料庫連線成功")
+                conn = self.pool.acquire()
+                self._local.conn = conn
+                self._local.cursor = conn.cursor()
             except Exception as e:
                 print(f"資料庫連線失敗: {str(e)}")
                 raise e
 
     def execute(self, query, data=None):
         try:
-            if data:
-                self.cursor.execute(query, data)
-            else:
-                self.cursor.execute(query)
+            self.connect()
+            with timed_query(query, self.cursor):
+                if data:
+                    self.cursor.execute(query, data)
+                else:
+                    self.cursor.execute(query)
             self.conn.commit()
             return True
         except Exception as e:
             print(f'execute錯誤: {e}')
-            self.conn.rollback()
+            self._rollback()
+            return False
+
+    def executemany(self, query, data_list):
+        """在同一個交易中寫入多筆資料，全部成功才 commit"""
+        try:
+            self.connect()
+            with timed_query(query, self.cursor):
+                self.cursor.executemany(query, data_list)
+            self.conn.commit()
+            return True
+        except Exception as e:
+            print(f'executemany錯誤: {e}')
+            self._rollback()
+            return False
+
+    def executemany_all(self, batches):
+        """依序執行多組 executemany [(query, data_list), ...]，在同一個交易中全部成功才 commit"""
+        try:
+            self.connect()
+            for query, data_list in batches:
+                with timed_query(query, self.cursor):
+                    self.cursor.executemany(query, data_list)
+            self.conn.commit()
+            return True
+        except Exception as e:
+            print(f'executemany_all錯誤: {e}')
+            self._rollback()
             return False
 
     def fetchall(self):
@@ -78,23 +265,66 @@ class DB:
     def fetchone(self, query, params=None):
         """執行查詢並返回一筆結果"""
         try:
-            if not self.conn or not self.cursor:
-                self.connect()
-            
-            self.cursor.execute(query, params)
+            self.connect()
+            with timed_query(query, self.cursor):
+                self.cursor.execute(query, params)
             result = self.cursor.fetchone()
             return result
         except Exception as e:
             print(f'fetchone錯誤: {e}')
             return None
 
-    def close(self):
-        """關閉資料庫連接"""
-        if self.cursor:
+    def fetch_all(self, query, params=None):
+        """執行查詢並返回所有結果"""
+        try:
+            self.connect()
+            with timed_query(query, self.cursor):
+                self.cursor.execute(query, params)
+            return self.cursor.fetchall()
+        except Exception as e:
+            print(f'fetch_all錯誤: {e}')
+            return []
+
+    def _rollback(self):
+        if not self.conn:
+            return
+        try:
+            self.conn.rollback()
+        except Exception:
+            # 連線已失效，丟棄後下次查詢會重新借出
+            self._release(discard=True)
+
+    def _release(self, discard=False):
+        conn = self.conn
+        if not conn:
+            return
+        try:
             self.cursor.close()
-        if self.conn:
-            self.conn.close()
-            self.conn = None
-            self.cursor = None
-        print('資料庫關閉連線')
-        return True
\ No newline at end of file
+        except Exception:
+            pass
+        self._local.conn = None
+        self._local.cursor = None
+        self.pool.release(conn, discard=discard)
+
+    def close(self):
+        """歸還連線到連線池"""
+        self._release()
+        return True
+
+    def release(self):
+        """
+        共用元件 (單例、背景任務) 用完連線後呼叫：在請求之外立即歸還，
+        請求之內保留給同一個請求的後續查詢，由 teardown 歸還
+        """
+        if not getattr(self._local, 'in_request', False):
+            self._release()
+
+    # 舊版介面的別名
+    disconnect = close
+
+    def roll_back(self):
+        self._rollback()
+
+    def metrics(self):
+        """連線池統計 (使用中、等待次數、等待時間...)"""
+        return self.pool.metrics()
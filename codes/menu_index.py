@@ -0,0 +1,176 @@
+import threading
+
+# 菜單來源：menu 表的飲料與後台上架中的商品
+MENU_QUERY = """
+    SELECT drink_name AS name FROM menu
+    UNION
+    SELECT name FROM products WHERE is_available = 1
+"""
+
+# 字詞同義 (別名, 菜單用字)：菜單名稱中的用字可被別名取代
+# 例如菜單只有「珍珠奶茶」時，「波霸奶茶」也會對應到珍珠奶茶；兩者都在菜單上時各自對應
+WORD_ALIASES = [
+    ('波霸', '珍珠'),
+    ('珍珠', '波霸'),
+    ('冬瓜', '冬瓜茶'),
+    ('咖啡拿鐵', '拿鐵咖啡'),
+]
+
+# 整個名稱的簡稱 (簡稱 -> 菜單名稱)
+NAME_ALIASES = {
+    '珍奶': '珍珠奶茶',
+    '波奶': '波霸奶茶',
+    '拿鐵': '拿鐵咖啡',
+    '美式': '美式咖啡',
+    '摩卡': '摩卡咖啡',
+    '卡布': '卡布奇諾',
+    '冬檸': '冬瓜檸檬',
+}
+
+_END = None  # 字典樹中標記字詞結尾的鍵
+
+
+class MenuIndex:
+    """
+    菜單名稱與別名的最長匹配索引
+    菜單變動時只比對差異，在字典樹中新增/刪除有變化的字詞，不必整棵重建
+    查詢不加鎖 (單一 dict 操作在 GIL 下是原子的)，修改時加鎖
+    """
+    def __init__(self, names=()):
+        self._root = {}
+        self._names = set()
+        self._words = {}   # 字典樹中的字詞 -> 菜單名稱 (名稱本身與別名)
+        self._lock = threading.RLock()
+        self._listeners = []
+        self.version = 0
+        if names:
+            self.replace_all(names)
+
+    @property
+    def names(self):
+        """菜單名稱 (排序後)"""
+        return sorted(self._names)
+
+    @property
+    def aliases(self):
+        return {word: name for word, name in self._words.items() if word != name}
+
+    def subscribe(self, callback):
+        """菜單改變時呼叫 callback(index)"""
+        self._listeners.append(callback)
+
+    # ---- 查詢 ----
+
+    def lookup(self, text):
+        """完整名稱或別名對應的菜單名稱，沒有則回傳 None"""
+        return self._words.get(text.strip())
+
+    def longest_match(self, text, start=0):
+        """回傳從 start 開始最長的菜單名稱 (結束位置, 菜單名稱)，沒有則回傳 None"""
+        node = self._root
+        match = None
+        for i in range(start, len(text)):
+            node = node.get(text[i])
+            if node is None:
+                break
+            if _END in node:
+                match = (i + 1, node[_END])
+        return match
+
+    def find_all(self, text):
+        """由左至右以最長匹配找出文字中所有飲料 (可重複)"""
+        found = []
+        pos = 0
+        while pos < len(text):
+            match = self.longest_match(text, pos)
+            if match:
+                pos, name = match
+                found.append(name)
+            else:
+                pos += 1
+        return found
+
+    # ---- 修改 ----
+
+    def add(self, name):
+        with self._lock:
+            if name and name not in self._names:
+                self._names.add(name)
+                self._sync()
+
+    def remove(self, name):
+        with self._lock:
+            if name in self._names:
+                self._names.discard(name)
+                self._sync()
+
+    def replace_all(self, names):
+        with self._lock:
+            names = {name for name in names if name}
+            if names != self._names:
+                self._names = names
+                self._sync()
+
+    def load(self, db):
+        """
+        從資料庫 menu/products 表載入菜單
+        查詢失敗或沒有資料時保留目前的菜單，回傳是否成功
+        """
+        rows = db.fetch_all(MENU_QUERY)
+        names = {row['name'].strip() for row in rows or [] if row.get('name')}
+        if not names:
+            print("無法從資料庫載入菜單，沿用目前的菜單")
+            return False
+        self.replace_all(names)
+        return True
+
+    def _build_words(self):
+        """計算所有應存在的字詞；名稱本身優先，其次是別名 (先產生者優先)"""
+        words = {name: name for name in self._names}
+        for name in sorted(self._names):
+            for alias, word in WORD_ALIASES:
+                if word in name:
+                    words.setdefault(name.replace(word, alias), name)
+        for alias, name in NAME_ALIASES.items():
+            if name in self._names:
+                words.setdefault(alias, name)
+        return words
+
+    def _sync(self):
+        words = self._build_words()
+        for word in self._words.keys() - words.keys():
+            self._delete(word)
+        for word, name in words.items():
+            if self._words.get(word) != name:
+                self._insert(word, name)
+        self._words = words
+        self.version += 1
+        for callback in self._listeners:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"菜單更新通知失敗: {e}")
+
+    def _insert(self, word, name):
+        node = self._root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[_END] = name
+
+    def _delete(self, word):
+        # 記錄路徑，刪除結尾標記後由下往上移除空節點
+        path = [self._root]
+        for char in word:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].pop(_END, None)
+        for i in range(len(word), 0, -1):
+            if path[i]:
+                break
+            del path[i - 1][word[i - 1]]
+
+
+# 前後台共用的菜單索引 (run.py 在同一個 process 中啟動兩者)
+menu_index = MenuIndex()
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+from codes.order_sequence import SEED_SEQUENCE
+from codes.order_stats import STATUS_COUNTS_QUERY
+from codes.wait_estimator import ACTIVE_ORDERS_QUERY, RECENT_COMPLETED_QUERY
+
+# orders 表的索引 (名稱, 欄位)，與 admin_backend/models.py 的 Order.__table_args__ 一致
+ORDER_INDEXES = [
+    ('ix_orders_date_status', ('order_date', 'status')),       # 儀表板統計、當日訂單序號
+    ('ix_orders_order_number', ('order_number',)),            # 以訂單號碼更新狀態、號碼前綴查詢
+    ('ix_orders_date_drink', ('order_date', 'drink_name')),   # 日期區間內各飲料銷量 (彙總表回填)
+    ('ix_orders_created_at', ('created_at',)),                # 後台訂單列表排序
+    ('ix_orders_status_updated', ('status', 'updated_at')),   # 等候佇列、最近完成的訂單
+]
+
+# 點餐寫入：VALUES 全部為參數，pymysql 的 executemany 才會合併成單一多列 INSERT
+# (VALUES 中有 NOW() 等常數時會退回逐列執行)
+INSERT_ORDER_QUERY = """
+    INSERT INTO orders (
+        drink_name, size, ice_type, sugar_type,
+        order_date, order_time,
+        weather_status, temperature,
+        status, created_at, order_number
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# 以下分析查詢讀取 daily_sales 彙總表 (codes/sales_rollup.py)，成本與訂單筆數無關
+
+# 本月熱銷飲品 (以範圍條件查詢日期，才能使用索引)
+MONTHLY_TOP_DRINKS_QUERY = """
+    SELECT drink_name, SUM(cups) as count
+    FROM daily_sales
+    WHERE sale_date >= %s
+    GROUP BY drink_name
+    ORDER BY count DESC
+    LIMIT 3
+"""
+
+# {days}日內所有飲料銷售排名(包含銷售量為0商品)
+SALES_RANKING_QUERY = """
+    SELECT
+        m.drink_name,
+        COALESCE(SUM(s.cups), 0) AS total_sales
+    FROM menu AS m
+    LEFT JOIN daily_sales AS s
+        ON m.drink_name = s.drink_name
+        AND s.sale_date BETWEEN DATE_SUB(CURDATE(), INTERVAL %s DAY) AND CURDATE()
+    GROUP BY m.drink_name
+    ORDER BY total_sales DESC
+"""
+
+# 每日杯數與營收
+DAILY_SALES_TREND_QUERY = """
+    SELECT sale_date, SUM(cups) AS orders, SUM(revenue) AS revenue
+    FROM daily_sales
+    WHERE sale_date >= %s
+    GROUP BY sale_date
+    ORDER BY sale_date
+"""
+
+# 熱門商品
+TOP_PRODUCTS_QUERY = """
+    SELECT drink_name, SUM(cups) AS count
+    FROM daily_sales
+    WHERE sale_date >= %s
+    GROUP BY drink_name
+    ORDER BY count DESC
+    LIMIT %s
+"""
+
+EXISTING_INDEXES_QUERY = """
+    SELECT DISTINCT INDEX_NAME AS name
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'orders'
+"""
+
+
+def hot_queries(today=None):
+    """
+    需要使用索引的熱門查詢 (名稱, SQL, 參數, 要檢查的資料表或別名)
+    直接引用各模組中實際執行的 SQL，查詢改寫後檢查也會跟著更新
+    """
+    today = today or datetime.now().date()
+    return [
+        ('dashboard_stats', STATUS_COUNTS_QUERY, (today,), 'orders'),
+        ('order_sequence_seed', SEED_SEQUENCE, (today, today, f"{today.strftime('%m%d')}%"), 'orders'),
+        ('order_number_update', "UPDATE orders SET status = 'completed' WHERE order_number = %s",
+         (f"{today.strftime('%m%d')}A1-1",), 'orders'),
+        ('monthly_top_drinks', MONTHLY_TOP_DRINKS_QUERY, (today.replace(day=1),), 'daily_sales'),
+        ('sales_ranking', SALES_RANKING_QUERY, (7,), 's'),
+        ('sales_trend', DAILY_SALES_TREND_QUERY, (today - timedelta(days=30),), 'daily_sales'),
+        ('top_products', TOP_PRODUCTS_QUERY, (today - timedelta(days=30), 5), 'daily_sales'),
+        ('waiting_queue', ACTIVE_ORDERS_QUERY, None, 'orders'),
+        ('recent_completed', RECENT_COMPLETED_QUERY, (500,), 'orders'),
+    ]
+
+
+def missing_indexes(db):
+    existing = {row['name'] for row in db.fetch_all(EXISTING_INDEXES_QUERY)}
+    return [(name, columns) for name, columns in ORDER_INDEXES if name not in existing]
+
+
+def migrate(db):
+    """建立缺少的索引 (可重複執行)，回傳新建立的索引名稱"""
+    created = []
+    for name, columns in missing_indexes(db):
+        print(f"建立索引 {name} ({', '.join(columns)}) ...")
+        if not db.execute(f"CREATE INDEX {name} ON orders ({', '.join(columns)})"):
+            raise RuntimeError(f"建立索引 {name} 失敗")
+        created.append(name)
+    return created
+
+
+def explain_hot_queries(db, today=None):
+    """
+    以 EXPLAIN 檢查熱門查詢，回傳 [(名稱, 使用的索引, 問題)]
+    沒有任何可用的索引 (possible_keys 為空) 而全表掃描時視為問題；
+    資料很少時優化器仍可能選擇全表掃描，因此只以「有沒有索引可用」判斷
+    """
+    results = []
+    for name, query, params, alias in hot_queries(today):
+        rows = [row for row in db.fetch_all(f"EXPLAIN {query}", params) if row.get('table') == alias]
+        if not rows:
+            results.append((name, None, 'EXPLAIN 失敗'))
+            continue
+        row = rows[0]
+        problem = None
+        if row.get('type') == 'ALL' and not row.get('possible_keys'):
+            problem = '全表掃描 (沒有可用的索引)'
+        results.append((name, row.get('key'), problem))
+    return results
@@ -0,0 +1,97 @@
+import threading
+from datetime import datetime
+
+# 每日一列的訂單序號計數表
+CREATE_SEQUENCE_TABLE = """
+    CREATE TABLE IF NOT EXISTS order_sequences (
+        seq_date DATE NOT NULL PRIMARY KEY,
+        last_value INT NOT NULL
+    )
+"""
+
+# 表格剛建立或當天第一次使用時，以當天已存在的訂單數對齊計數器
+SEED_SEQUENCE = """
+    INSERT IGNORE INTO order_sequences (seq_date, last_value)
+    SELECT %s, COUNT(DISTINCT SUBSTRING_INDEX(order_number, '-', 1))
+    FROM orders
+    WHERE order_date = %s AND order_number LIKE %s
+"""
+
+# 以 LAST_INSERT_ID(expr) 在單一語句內完成遞增，該列的行鎖保證多台機器併發時不會拿到相同序號
+NEXT_SEQUENCE = """
+    INSERT INTO order_sequences (seq_date, last_value)
+    VALUES (%s, LAST_INSERT_ID(1))
+    ON DUPLICATE KEY UPDATE last_value = LAST_INSERT_ID(last_value + 1)
+"""
+
+LETTERS = 26
+NUMBERS_PER_LETTER = 9
+DAILY_CAPACITY = LETTERS * NUMBERS_PER_LETTER  # 每天可配發的號碼數 (A1 ~ Z9)
+
+
+class OrderNumberExhaustedError(Exception):
+    """當天的訂單號碼已用完"""
+
+
+def format_order_number(date_prefix, sequence):
+    """
+    將當天第 n 個序號轉為 mmddX# 格式 (A1~A9, B1~B9 ... Z9)
+    超過當天容量時拋出 OrderNumberExhaustedError，不回到 A1 以免同一天出現重複號碼
+    (取餐畫面只顯示最後兩碼，因此不延長格式)
+    """
+    if not 1 <= sequence <= DAILY_CAPACITY:
+        raise OrderNumberExhaustedError(f"{date_prefix} 的訂單號碼已用完 (第 {sequence} 號，每天上限 {DAILY_CAPACITY})")
+    index = sequence - 1
+    letter = chr(ord('A') + index // NUMBERS_PER_LETTER)
+    number = index % NUMBERS_PER_LETTER + 1
+    return f"{date_prefix}{letter}{number}"
+
+
+class OrderNumberAllocator:
+    """
+    以資料庫計數表配發訂單號碼，每次配發為 O(1) 的單列更新
+    LAST_INSERT_ID 以連線為單位，遞增與讀取必須在同一條借出的連線上完成
+    """
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self._seeded_date = None
+
+    def _ensure_ready(self, order_date):
+        if not self._table_ready:
+            if not self.db.execute(CREATE_SEQUENCE_TABLE):
+                raise RuntimeError("無法建立訂單序號表")
+            self._table_ready = True
+        if self._seeded_date != order_date:
+            prefix = order_date.strftime('%m%d')
+            if not self.db.execute(SEED_SEQUENCE, (order_date, order_date, f"{prefix}%")):
+                raise RuntimeError("無法初始化訂單序號")
+            self._seeded_date = order_date
+
+    def next_sequence(self, order_date=None):
+        """取得指定日期 (預設今天) 的下一個序號"""
+        order_date = order_date or datetime.now().date()
+        with self._lock:
+            try:
+                self._ensure_ready(order_date)
+                if not self.db.execute(NEXT_SEQUENCE, (order_date,)):
+                    raise RuntimeError("無法取得訂單序號")
+                row = self.db.fetchone("SELECT LAST_INSERT_ID() AS seq")
+                if not row:
+                    raise RuntimeError("無法取得訂單序號")
+                return int(row['seq'])
+            finally:
+                # 兩條語句在同一條借出的連線上完成；請求之外立即歸還
+                self.db.release()
+
+    def allocate(self, count=1, order_date=None):
+        """
+        配發一組訂單號碼
+        回傳 (基礎訂單號, [基礎訂單號-1, 基礎訂單號-2, ...])
+        """
+        order_date = order_date or datetime.now().date()
+        sequence = self.next_sequence(order_date)
+        base_order_number = format_order_number(order_date.strftime('%m%d'), sequence)
+        order_numbers = [f"{base_order_number}-{i+1}" for i in range(count)]
+        return base_order_number, order_numbers
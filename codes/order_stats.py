@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from datetime import datetime
+from codes.db import DB, dbconfig
+
+# 儀表板統計設定
+ORDER_STATS_TTL = float(os.getenv("ORDER_STATS_TTL", 10))                 # 快取秒數
+ORDER_STATS_INCREMENTAL = os.getenv("ORDER_STATS_INCREMENTAL") == "1"    # 由寫入端直接增減計數
+ORDER_STATS_RECONCILE = float(os.getenv("ORDER_STATS_RECONCILE", 300))    # 增量模式下與資料庫對帳的間隔
+
+# 單一查詢取得當天各狀態的杯數
+STATUS_COUNTS_QUERY = """
+    SELECT status, COUNT(*) AS count
+    FROM orders
+    WHERE order_date = %s
+    GROUP BY status
+"""
+
+STATUSES = ('pending', 'processing', 'completed', 'cancelled')
+
+
+def _status_key(status):
+    """OrderStatus、'pending' 或 'PENDING' 都轉為小寫的狀態值"""
+    status = getattr(status, 'value', status)
+    return str(status).lower() if status is not None else None
+
+
+class OrderStatsService:
+    """
+    儀表板的當日訂單統計
+    以一個 GROUP BY status 查詢取得所有狀態，結果快取 ttl 秒，訂單狀態改變時失效
+    incremental=True 時由寫入端直接增減快取中的計數，每 reconcile 秒才重新查詢資料庫對帳
+    查詢期間不持有鎖；以 _generation 判斷查詢期間是否有寫入，有的話結果不放進快取，下次重新查詢
+    """
+    def __init__(self, db, ttl=ORDER_STATS_TTL, incremental=ORDER_STATS_INCREMENTAL,
+                 reconcile=ORDER_STATS_RECONCILE):
+        self.db = db
+        self.ttl = ttl
+        self.incremental = incremental
+        self.reconcile = reconcile
+        self._day = None
+        self._counts = None
+        self._loaded_at = 0.0
+        self._generation = 0  # 每次寫入端呼叫 _apply 時遞增
+        self._lock = threading.Lock()
+        # 統計數據
+        self.hits = 0
+        self.queries = 0
+
+    def _load(self, day):
+        rows = self.db.fetch_all(STATUS_COUNTS_QUERY, (day,))
+        self.db.release()
+        counts = dict.fromkeys(STATUSES, 0)
+        for row in rows:
+            key = _status_key(row['status'])
+            counts[key] = counts.get(key, 0) + row['count']
+        return counts
+
+    def get(self, day=None):
+        """回傳儀表板使用的統計 (total_orders、pending_orders ...)"""
+        day = day or datetime.now().date()
+        max_age = self.reconcile if self.incremental else self.ttl
+        with self._lock:
+            fresh = (self._day == day and self._counts is not None
+                     and time.monotonic() - self._loaded_at < max_age)
+            if fresh:
+                self.hits += 1
+                counts = dict(self._counts)
+            generation = self._generation
+        if not fresh:
+            counts = self._load(day)
+            with self._lock:
+                self.queries += 1
+                # 查詢期間的增減可能不在結果中，放進快取會遺失；這次仍回傳查詢結果
+                if self._generation == generation:
+                    self._day, self._counts, self._loaded_at = day, dict(counts), time.monotonic()
+                else:
+                    self._counts = None
+        stats = {f"{status}_orders": count for status, count in counts.items()}
+        stats['total_orders'] = sum(counts.values())
+        return stats
+
+    def invalidate(self):
+        with self._lock:
+            self._counts = None
+
+    def record_created(self, count, day, status='pending'):
+        """新增訂單 (count 杯) 後呼叫"""
+        self._apply(day, {_status_key(status): count})
+
+    def record_status_change(self, old_status, new_status, day):
+        """訂單狀態改變後呼叫"""
+        old_key, new_key = _status_key(old_status), _status_key(new_status)
+        if old_key == new_key:
+            return
+        self._apply(day, {old_key: -1, new_key: 1})
+
+    def _apply(self, day, deltas):
+        with self._lock:
+            self._generation += 1
+            if self._counts is None or self._day != day:
+                # 快取中沒有該日的統計，不受影響
+                return
+            if not self.incremental:
+                # 非增量模式直接失效，下次查詢重新計算
+                self._counts = None
+                return
+            for key, delta in deltas.items():
+                self._counts[key] = max(self._counts.get(key, 0) + delta, 0)
+
+    def metrics(self):
+        with self._lock:
+            return {"hits": self.hits, "queries": self.queries, "incremental": self.incremental}
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_order_stats():
+    """前後台共用同一份統計 (run.py 在同一個 process 中啟動兩者)，第一次使用時建立"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = OrderStatsService(DB(dbconfig()))
+        return _service
@@ -0,0 +1,121 @@
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# 超過此毫秒數的查詢會印出慢查詢紀錄
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", 200))
+
+# 延遲分布的區間上限 (毫秒)
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(query):
+    """
+    將 SQL 正規化為指紋：去除字面值與多餘空白
+    參數不同但結構相同的查詢會歸為同一類
+    """
+    text = _STRING_LITERAL.sub("?", query)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _IN_LIST.sub("(?+)", text)
+    text = _WHITESPACE.sub(" ", text).strip().rstrip(";")
+    return text
+
+
+class QueryStats:
+    """依查詢指紋統計次數、回傳列數與延遲分布"""
+    def __init__(self, slow_query_ms=DB_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, query, elapsed, rows=0):
+        key = fingerprint(query)
+        elapsed_ms = elapsed * 1000
+        rows = rows if rows and rows > 0 else 0
+
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = {
+                    "count": 0,
+                    "rows": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1)
+                }
+            entry["count"] += 1
+            entry["rows"] += rows
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["histogram"][self._bucket(elapsed_ms)] += 1
+
+        if elapsed_ms >= self.slow_query_ms:
+            print(f"慢查詢 {elapsed_ms:.1f}ms ({rows} 列): {key}")
+
+    @staticmethod
+    def _bucket(elapsed_ms):
+        for i, upper in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= upper:
+                return i
+        return len(LATENCY_BUCKETS_MS)
+
+    def snapshot(self):
+        """依總耗時由高到低排序的統計結果"""
+        labels = [f"<={upper}ms" for upper in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        with self._lock:
+            items = [(key, dict(entry)) for key, entry in self._stats.items()]
+
+        result = []
+        for key, entry in sorted(items, key=lambda item: item[1]["total_ms"], reverse=True):
+            result.append({
+                "query": key,
+                "count": entry["count"],
+                "rows": entry["rows"],
+                "total_ms": round(entry["total_ms"], 2),
+                "avg_ms": round(entry["total_ms"] / entry["count"], 2),
+                "max_ms": round(entry["max_ms"], 2),
+                "histogram": dict(zip(labels, entry["histogram"]))
+            })
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# 全域共用的查詢統計 (pymysql 與 SQLAlchemy 共用)
+query_stats = QueryStats()
+
+
+@contextmanager
+def timed_query(query, cursor=None):
+    """記錄區塊內單一查詢的耗時與影響列數"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        rows = cursor.rowcount if cursor is not None else 0
+        query_stats.record(query, time.perf_counter() - start, rows)
+
+
+def instrument_engine(engine):
+    """讓 SQLAlchemy engine 的查詢也記錄到 query_stats"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        query_stats.record(statement, time.perf_counter() - start, cursor.rowcount)
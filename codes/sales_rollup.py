@@ -0,0 +1,144 @@
+import threading
+from datetime import date
+from codes.db import DB, dbconfig
+
+# 每日銷售彙總表：每天每種組合一列，分析查詢讀這張表而不必掃描所有訂單
+CREATE_ROLLUP_TABLE = """
+    CREATE TABLE IF NOT EXISTS daily_sales (
+        sale_date DATE NOT NULL,
+        drink_name VARCHAR(20) NOT NULL,
+        size VARCHAR(10) NOT NULL,
+        ice_type VARCHAR(10) NOT NULL,
+        sugar_type VARCHAR(10) NOT NULL,
+        weather_status VARCHAR(10) NOT NULL,
+        cups INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (sale_date, drink_name, size, ice_type, sugar_type, weather_status),
+        KEY ix_daily_sales_drink (drink_name, sale_date)
+    )
+"""
+
+ROLLUP_IS_EMPTY = "SELECT 1 AS found FROM daily_sales LIMIT 1"
+
+# 增量更新：新訂單 +1 杯，取消 -1 杯
+UPSERT_ROLLUP = """
+    INSERT INTO daily_sales (sale_date, drink_name, size, ice_type, sugar_type, weather_status, cups, revenue)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE cups = cups + VALUES(cups), revenue = revenue + VALUES(revenue)
+"""
+
+# 以 orders 重新計算日期區間 (已取消的訂單不計入銷量)
+DELETE_ROLLUP_RANGE = "DELETE FROM daily_sales WHERE sale_date BETWEEN %s AND %s"
+REBUILD_ROLLUP_RANGE = """
+    INSERT INTO daily_sales (sale_date, drink_name, size, ice_type, sugar_type, weather_status, cups, revenue)
+    SELECT order_date, drink_name, size, ice_type, sugar_type, weather_status,
+           COUNT(*), COALESCE(SUM(total_amount), 0)
+    FROM orders
+    WHERE order_date BETWEEN %s AND %s AND status <> 'cancelled'
+    GROUP BY order_date, drink_name, size, ice_type, sugar_type, weather_status
+"""
+ORDER_DATE_RANGE = "SELECT MIN(order_date) AS first_day, MAX(order_date) AS last_day FROM orders"
+
+UNCOUNTED_STATUS = 'cancelled'
+
+
+def _status_key(status):
+    status = getattr(status, 'value', status)
+    return str(status).lower() if status is not None else None
+
+
+class SalesRollup:
+    """
+    維護 daily_sales 彙總表 (日期 × 飲料 × 大小 × 冰量 × 甜度 × 天氣 → 杯數, 營收)
+    訂單寫入與狀態改變時在同一個交易中增量更新；表格第一次建立時自動從歷史訂單回填 (app 啟動時先呼叫 ensure_ready)
+    """
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self.version = 0  # 每次彙總表內容改變時遞增，供分析結果的快取判斷是否過期
+
+    def ensure_ready(self):
+        """建立彙總表，空表時從歷史訂單回填 (只在第一次成功前檢查)，回傳表格是否可用"""
+        return self._prepare() is not None
+
+    def _prepare(self):
+        """同 ensure_ready，回傳 None (無法使用)、'backfilled' (這次呼叫剛從 orders 回填) 或 'ready'"""
+        if self._table_ready:
+            return 'ready'
+        with self._lock:
+            if self._table_ready:
+                return 'ready'
+            try:
+                if not self.db.execute(CREATE_ROLLUP_TABLE):
+                    print("無法建立 daily_sales 彙總表")
+                    return None
+                state = 'ready'
+                if not self.db.fetchone(ROLLUP_IS_EMPTY):
+                    print("daily_sales 為空，從歷史訂單回填...")
+                    self.rebuild()
+                    state = 'backfilled'
+                self._table_ready = True
+                return state
+            finally:
+                self.db.release()
+
+    def order_batches(self, rows):
+        """
+        新訂單的彙總表更新 [(query, values_list)]，由呼叫端與訂單 INSERT 放在同一個交易中執行
+        rows: [(order_date, drink_name, size, ice_type, sugar_type, weather_status, amount)]
+        """
+        return self._batches([(*row[:6], 1, row[6] or 0) for row in rows])
+
+    def status_change_batches(self, order, old_status, new_status):
+        """訂單 (Order) 狀態改變的彙總表更新，與狀態的 UPDATE 同一個交易執行；只有取消與取消後恢復會影響銷量"""
+        old_key, new_key = _status_key(old_status), _status_key(new_status)
+        if (old_key == UNCOUNTED_STATUS) == (new_key == UNCOUNTED_STATUS):
+            return []
+        sign = -1 if new_key == UNCOUNTED_STATUS else 1
+        return self._batches([(order.order_date, order.drink_name, order.size, order.ice_type, order.sugar_type,
+                               order.weather_status, sign, sign * (order.total_amount or 0))])
+
+    def _batches(self, values_list):
+        # 在訂單交易開始前準備好表格：回填 (若有) 讀到的是這次變更之前的 orders，交易內再累加不會重複計算
+        # 彙總表無法使用時回傳 []，之後回填時會從 orders 計入
+        if self._prepare() is None:
+            return []
+        return [(UPSERT_ROLLUP, values_list)]
+
+    def mark_changed(self):
+        """包含彙總表更新的交易 commit 後呼叫，讓分析結果的快取失效"""
+        self.version += 1
+
+    def rebuild(self, first_day=None, last_day=None):
+        """以 orders 重新計算 first_day ~ last_day (預設為所有歷史訂單)，回傳是否成功"""
+        if first_day is None or last_day is None:
+            bounds = self.db.fetchone(ORDER_DATE_RANGE) or {}
+            first_day = first_day or bounds.get('first_day')
+            last_day = last_day or bounds.get('last_day')
+            if first_day is None or last_day is None:
+                return True  # 還沒有任何訂單
+        # DELETE 與 INSERT ... SELECT 在各自的交易中執行，區間內的查詢可能短暫看到不完整的資料
+        ok = (self.db.execute(DELETE_ROLLUP_RANGE, (first_day, last_day))
+              and self.db.execute(REBUILD_ROLLUP_RANGE, (first_day, last_day)))
+        self.version += 1
+        return ok
+
+    def data_version(self):
+        """
+        銷售資料的版本戳記：彙總表改變或換日 (「最近 N 天」的範圍改變) 時都會不同
+        只反映本 process 的寫入；直接修改資料庫後需重新啟動或執行回填工具
+        """
+        return f"{date.today().isoformat()}.{self.version}"
+
+
+_rollup = None
+_rollup_lock = threading.Lock()
+
+def get_sales_rollup():
+    """前後台共用 (run.py 在同一個 process 中啟動兩者)，第一次使用時建立"""
+    global _rollup
+    with _rollup_lock:
+        if _rollup is None:
+            _rollup = SalesRollup(DB(dbconfig()))
+        return _rollup
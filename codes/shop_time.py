@@ -0,0 +1,13 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# 店家時區，與資料庫連線的 time_zone (+08:00，見 codes/db.py) 相同
+SHOP_TIMEZONE = ZoneInfo("Asia/Taipei")
+
+
+def shop_now():
+    """
+    店家時區的現在時間 (不帶時區資訊)
+    與資料庫的 NOW() 及 DATETIME 欄位同一個時鐘，主機時區不是 +08:00 時也能直接比較
+    """
+    return datetime.now(SHOP_TIMEZONE).replace(tzinfo=None)
@@ -0,0 +1,263 @@
+import os
+import threading
+import time
+from codes.db import DB, dbconfig
+from codes.shop_time import shop_now
+
+# 等候時間估計設定
+WAIT_DEFAULT_PREP = float(os.getenv("WAIT_DEFAULT_PREP", 72))       # 尚無觀測資料時每杯的製作秒數 (原本的 1.2 分鐘)
+WAIT_EWMA_ALPHA = float(os.getenv("WAIT_EWMA_ALPHA", 0.2))          # 新觀測值的權重
+WAIT_MAX_SAMPLE = float(os.getenv("WAIT_MAX_SAMPLE", 1800))         # 超過此秒數的觀測值視為異常 (忘了按完成等)
+WAIT_BARISTAS = max(int(os.getenv("WAIT_BARISTAS", 1)), 1)          # 同時製作的人數
+WAIT_RECONCILE = float(os.getenv("WAIT_RECONCILE", 300))            # 與資料庫重新對齊佇列的間隔秒數
+
+ACTIVE_STATUSES = ('pending', 'processing')
+
+# 啟動時載入目前的佇列
+ACTIVE_ORDERS_QUERY = """
+    SELECT order_id, order_number, drink_name, status, created_at
+    FROM orders
+    WHERE status IN ('pending', 'processing')
+"""
+
+# 啟動時以最近完成的訂單估計各飲料的製作時間 (updated_at 為改成已完成的時間)
+RECENT_COMPLETED_QUERY = """
+    SELECT drink_name, created_at, updated_at AS completed_at
+    FROM orders
+    WHERE status = 'completed' AND updated_at IS NOT NULL
+    ORDER BY updated_at DESC
+    LIMIT %s
+"""
+SEED_SAMPLES = 500
+
+
+def _status_key(status):
+    status = getattr(status, 'value', status)
+    return str(status).lower() if status is not None else None
+
+
+def order_key(order_number, order_id=None):
+    """佇列以訂單號碼識別 (點餐端寫入時只有號碼)，沒有號碼時使用 order_id"""
+    return order_number or f"#{order_id}"
+
+
+class WaitTimeEstimator:
+    """
+    記憶體中的製作佇列與等候時間估計
+    每種飲料的製作秒數以指數移動平均 (EWMA) 學習，佇列的預估總秒數隨新增/完成即時增減，
+    查詢等候時間為 O(1)，不需要對資料庫 COUNT(*)
+
+    製作秒數 = 完成時間 - 開始製作時間；沒有看到 processing 時，以
+    max(建立時間, 上一杯完成時間) 作為開始時間，避免把排隊時間算成製作時間
+    所有時間都使用店家時區 (shop_now)，與資料庫的 created_at / updated_at 同一個時鐘
+    """
+    def __init__(self, db=None, default_prep=WAIT_DEFAULT_PREP, alpha=WAIT_EWMA_ALPHA,
+                 baristas=WAIT_BARISTAS, max_sample=WAIT_MAX_SAMPLE, reconcile=WAIT_RECONCILE):
+        self.db = db
+        self.alpha = alpha
+        self.baristas = baristas
+        self.max_sample = max_sample
+        self.reconcile = reconcile
+        self._default = float(default_prep)   # 所有飲料的平均，作為沒有資料的飲料的估計
+        self._prep = {}                        # 飲料 -> 平均製作秒數
+        self._active = {}                      # 訂單 key -> [飲料, 狀態, 開始時間]
+        self._active_by_drink = {}             # 飲料 -> 佇列中的杯數
+        self._fallback_active = 0              # 佇列中使用 _default 估計的杯數
+        self._total = 0.0                      # 佇列的預估總製作秒數
+        self._last_completed = None
+        self._loaded_at = None
+        self._journal = None                   # 載入期間的寫入 (查詢與重建之間發生的變更需重播)
+        self._lock = threading.RLock()
+        # 統計數據
+        self.samples = 0
+        self.rejected = 0
+        self.reloads = 0
+
+    # ---- 佇列總秒數的增量維護 (需持有 _lock) ----
+
+    def _estimate(self, drink):
+        return self._prep.get(drink, self._default)
+
+    def _add(self, drink):
+        self._active_by_drink[drink] = self._active_by_drink.get(drink, 0) + 1
+        if drink not in self._prep:
+            self._fallback_active += 1
+        self._total += self._estimate(drink)
+
+    def _discard(self, drink):
+        count = self._active_by_drink.get(drink, 0) - 1
+        if count > 0:
+            self._active_by_drink[drink] = count
+        else:
+            self._active_by_drink.pop(drink, None)
+        if drink not in self._prep:
+            self._fallback_active -= 1
+        self._total = max(self._total - self._estimate(drink), 0.0)
+
+    def _observe(self, drink, seconds):
+        """記錄一杯的製作秒數，並把平均值的變動套用到佇列總秒數"""
+        if not 0 < seconds <= self.max_sample:
+            self.rejected += 1
+            return
+        self.samples += 1
+        old_default = self._default
+        self._default += self.alpha * (seconds - old_default)
+
+        count = self._active_by_drink.get(drink, 0)
+        old = self._prep.get(drink)
+        if old is None:
+            # 第一筆觀測值：這種飲料改用自己的估計
+            new = seconds
+            self._fallback_active -= count
+            self._total += count * (new - old_default)
+        else:
+            new = old + self.alpha * (seconds - old)
+            self._total += count * (new - old)
+        self._prep[drink] = new
+        self._total = max(self._total + self._fallback_active * (self._default - old_default), 0.0)
+
+    # ---- 寫入端呼叫 ----
+
+    def record_created(self, key, drink, created_at=None):
+        """新訂單 (一杯) 寫入後呼叫"""
+        created_at = created_at or shop_now()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((self._apply_created, (key, drink, created_at)))
+            self._apply_created(key, drink, created_at)
+
+    def record_status(self, key, status, drink=None, created_at=None, now=None):
+        """
+        訂單狀態改變後呼叫
+        佇列中沒有的訂單 (例如對齊後才建立) 提供 drink 時會補登
+        """
+        status = _status_key(status)
+        now = now or shop_now()
+        with self._lock:
+            if self._journal is not None:
+                # 重播時不再記錄製作秒數 (這次呼叫已記錄過)
+                self._journal.append((self._apply_status, (key, status, drink, created_at, now, False)))
+            self._apply_status(key, status, drink, created_at, now)
+
+    def _apply_created(self, key, drink, created_at):
+        if key in self._active:
+            return
+        self._active[key] = [drink, 'pending', created_at]
+        self._add(drink)
+
+    def _apply_status(self, key, status, drink, created_at, now, observe=True):
+        entry = self._active.get(key)
+        if status in ACTIVE_STATUSES:
+            if entry is None:
+                if drink is None:
+                    return
+                entry = self._active[key] = [drink, status, created_at or now]
+                self._add(drink)
+            elif status == 'processing' and entry[1] != 'processing':
+                # 開始製作的時間才是製作秒數的起點
+                entry[1], entry[2] = status, now
+            return
+
+        if entry is None:
+            return
+        del self._active[key]
+        self._discard(entry[0])
+        if status == 'completed' and observe:
+            self._complete(entry, now)
+
+    def _complete(self, entry, now):
+        drink, status, started_at = entry
+        if status != 'processing' and self._last_completed and self._last_completed > started_at:
+            # 前一杯完成後才輪到這一杯
+            started_at = self._last_completed
+        self._observe(drink, (now - started_at).total_seconds())
+        self._last_completed = max(self._last_completed or now, now)
+
+    # ---- 查詢 ----
+
+    def waiting_minutes(self):
+        """目前等候時間 (分鐘，四捨五入到小數點後一位)"""
+        self._maybe_reload()
+        with self._lock:
+            return round(self._total / self.baristas / 60, 1)
+
+    def _maybe_reload(self):
+        if self.db is None:
+            return
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at >= self.reconcile:
+            self.load()
+
+    def load(self):
+        """
+        從資料庫重新載入佇列；第一次載入時同時以最近完成的訂單估計製作時間
+        在 reconcile 間隔內修正漏掉的狀態變更 (例如直接改資料庫)
+        查詢期間不持有鎖，這段期間的寫入先記在 _journal，重建佇列後再重播
+        """
+        with self._lock:
+            if self._journal is not None:
+                return  # 其他 thread 正在載入
+            first = self._loaded_at is None
+            self._loaded_at = time.monotonic()
+            self._journal = []
+        try:
+            samples = self.db.fetch_all(RECENT_COMPLETED_QUERY, (SEED_SAMPLES,)) if first else []
+            rows = self.db.fetch_all(ACTIVE_ORDERS_QUERY)
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+        finally:
+            self.db.release()
+
+        with self._lock:
+            journal, self._journal = self._journal, None
+            if first:
+                # 依完成時間由舊到新重播
+                last = None
+                for row in reversed(samples):
+                    completed_at, created_at = row['completed_at'], row['created_at']
+                    if not completed_at or not created_at:
+                        continue
+                    started_at = max(created_at, last) if last else created_at
+                    self._observe(row['drink_name'], (completed_at - started_at).total_seconds())
+                    last = completed_at
+            previous = self._active
+            self._active = {}
+            self._active_by_drink.clear()
+            self._fallback_active = 0
+            self._total = 0.0
+            for row in rows:
+                key = order_key(row['order_number'], row['order_id'])
+                # 已在佇列中的訂單保留記錄到的開始製作時間
+                self._active[key] = previous.get(key) or [row['drink_name'], _status_key(row['status']),
+                                                          row['created_at'] or shop_now()]
+                self._add(row['drink_name'])
+            # 查詢之後才發生的寫入 (已反映在查詢結果中的會被略過)
+            for apply, args in journal:
+                apply(*args)
+            self.reloads += 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "active_orders": len(self._active),
+                "estimated_seconds": round(self._total, 1),
+                "default_prep_seconds": round(self._default, 1),
+                "prep_seconds": {drink: round(sec, 1) for drink, sec in self._prep.items()},
+                "samples": self.samples,
+                "rejected": self.rejected,
+                "reloads": self.reloads
+            }
+
+
+_estimator = None
+_estimator_lock = threading.Lock()
+
+def get_wait_estimator():
+    """前後台共用同一個佇列 (run.py 在同一個 process 中啟動兩者)，第一次查詢時從資料庫載入"""
+    global _estimator
+    with _estimator_lock:
+        if _estimator is None:
+            _estimator = WaitTimeEstimator(DB(dbconfig()))
+        return _estimator
@@ -4,34 +4,61 @@ import os
 import datetime
 from datetime import datetime
 from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
 import speech_recognition as sr
 from pydub import AudioSegment
 from codes.db import DB, dbconfig
-from predict.models import Pred_total, Pred_sales
-from predict.total_pred.predict_total_sales import Pred_Total_Sales
-from predict.sales_pred.predict_sales_v4_2 import Pred_Sales
-from tools.load_path import LoadPath
+from codes.order_sequence import OrderNumberAllocator
+from codes.order_stats import get_order_stats
+from codes.order_queries import MONTHLY_TOP_DRINKS_QUERY, INSERT_ORDER_QUERY
+from codes.sales_rollup import get_sales_rollup
+from codes.shop_time import shop_now
+from codes.wait_estimator import get_wait_estimator
+from predict.recommendation_scheduler import get_recommendation, recommendation_scheduler
 from tools.tools import convert_order_date_for_db, get_now_time
 from .order_analyzer import OrderAnalyzer
-from weather_API.weather_API import weather_dict ,classify_weather, get_weather_data
+from weather_API.weather_API import weather_dict ,classify_weather
+from weather_API.weather_cache import get_cached_weather, weather_cache
 from flask_socketio import SocketIO  # 添加這行
 from frontend.codes.speech import speech_bp
+from frontend.codes.audio_janitor import audio_janitor
 from chat_tools.chat_analyzer import ChatAnalyzer
-import re
+from chat_tools.chat_streams import ChatStreamRegistry
 
 
 # 初始化 Flask 應用
 app = Flask(__name__)
 chat_analyzer = ChatAnalyzer()
+# 進行中的串流聊天，供前端逾時後的 POST 備援取回同一個結果
+chat_streams = ChatStreamRegistry()
 # 初始化資料庫連接
 db = DB(dbconfig())
 
+# 訂單號碼配發器
+order_number_allocator = OrderNumberAllocator(DB(dbconfig()))
+
+# 啟動時建立/回填每日銷售彙總表，之後的訂單與狀態改變只做增量更新
+# 資料庫無法連線時不影響啟動，第一筆訂單或分析查詢時會再嘗試
+try:
+    get_sales_rollup().ensure_ready()
+except Exception as e:
+    print(f"每日銷售彙總表初始化失敗: {str(e)}")
+
 # 初始化訂單分析器
 analyzer = OrderAnalyzer()
 
+# 同時送出意圖判斷與訂單分析用的執行緒池
+llm_executor = ThreadPoolExecutor(max_workers=int(os.getenv('LLM_MAX_WORKERS', 8)))
+
 socketio = SocketIO(cors_allowed_origins="*")
 socketio.init_app(app)
 
+# 啟動時就開始背景更新天氣快取
+weather_cache.start()
+
+# 啟動時就開始預先計算推薦，避免開機後的前幾個請求都使用備援推薦
+recommendation_scheduler.start()
+
 
 # 定義 Enum 類型
 class Size(Enum):
@@ -85,9 +112,8 @@ app.register_blueprint(speech_bp)
 # 添加路由讓靜態檔案可以被訪問
 @app.route('/temp_audio/<path:filename>')
 def temp_audio(filename):
-    # 確保使用絕對路徑
-    audio_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp_audio')
-    return send_from_directory(audio_dir, filename)
+    # temp_audio 目錄由 audio_janitor 管理 (到期刪除)
+    return send_from_directory(audio_janitor.directory, filename)
 
 @app.route('/')
 def index():
@@ -129,52 +155,132 @@ def format_order_text(order_details):
     
     return '、'.join(order_text)
 
+def dispatch_chat_analysis(text, session_id='default', on_delta=None):
+    """
+    依意圖分派聊天分析，避免每句話都連續呼叫兩次 OpenAI
+    1. 規則解析器有把握時直接回傳訂單，不呼叫 OpenAI
+    2. 句子中有飲料名稱但無法確定時，意圖判斷與訂單分析同時送出
+    3. 其他情況先判斷意圖，只有點餐意圖才進行訂單分析
+    提供 on_delta 時聊天回覆以串流方式逐段送出
+    回傳 (chat_result, order_result)，未執行的項目為 None
+    """
+    parsed = analyzer.parser.parse(text)
+    if parsed.confidence >= analyzer.min_confidence:
+        return None, parsed.items
+
+    if parsed.items:
+        chat_future = llm_executor.submit(chat_analyzer.analyze_chat, text,
+                                          session_id=session_id, on_delta=on_delta)
+        order_future = llm_executor.submit(analyzer.analyze_order, text)
+        return chat_future.result(), order_future.result()
+
+    chat_result = chat_analyzer.analyze_chat(text, session_id=session_id, on_delta=on_delta)
+    if chat_result.get('is_order_intent'):
+        return chat_result, analyzer.analyze_order(text)
+    return chat_result, None
+
+@app.route('/api/llm_cache_stats')
+def llm_cache_stats():
+    """LLM 回應快取的命中率與省下的 API 延遲"""
+    return jsonify({
+        'chat': chat_analyzer.cache.stats(),
+        'order': analyzer.cache.stats(),
+        'conversations': chat_analyzer.conversations.stats()
+    })
+
+@app.route('/api/llm_metrics')
+def llm_metrics():
+    """LLM 呼叫延遲、token 用量、重試與斷路器狀態"""
+    return jsonify(analyzer.llm.stats())
+
 @app.route('/analyze_chat', methods=['POST'])
 def analyze_chat():
     try:
         data = request.json
         text = data.get('text', '')
+        # 每台點餐機/手機各自的對話，未提供時以來源 IP 區分
+        session_id = data.get('session_id') or request.remote_addr or 'default'
         
-        app.logger.info(f"處理聊天輸入: '{text}'")
-        
-        # 使用 OpenAI 判斷意圖
-        chat_result = chat_analyzer.analyze_chat(text)
-        app.logger.info(f"OpenAI 意圖判斷結果: {chat_result}")
+        # 串流逾時後的備援請求：等待原本的串流結果，不再呼叫一次 LLM
+        stream_id = data.get('stream_id')
+        if chat_streams.known(stream_id):
+            app.logger.info(f"等待串流聊天結果: {stream_id}")
+            result = chat_streams.wait(stream_id)
+            if result is None:
+                return jsonify(chat_error_response(TimeoutError("串流回覆逾時")))
+            return jsonify({key: value for key, value in result.items() if key != 'stream_id'})
         
-        # 修正這一行 - 使用正確的變數名
-        order_result = analyzer.analyze_order(text)  # 使用 analyzer 而非 order_analyzer
-        app.logger.info(f"訂單分析結果: {order_result}")
-        
-        # 如果訂單分析成功（有結果）
-        if isinstance(order_result, list) and len(order_result) > 0:
-            order_text = format_order_text(order_result)
-            return jsonify({
-                'status': 'success',
-                'is_order': True,
-                'reply': f"我幫您確認一下訂單：{order_text}\n\n請問確認訂購嗎？",
-                'order_details': order_result
-            })
+        app.logger.info(f"處理聊天輸入: '{text}'")
         
-        # 否則使用聊天回應
-        return jsonify({
-            'status': 'success',
-            'is_order': chat_result.get('is_order_intent', False),
-            'reply': chat_result.get('reply', "抱歉，我不太明白您的意思。"),
-            'order_details': []
-        })
+        chat_result, order_result = dispatch_chat_analysis(text, session_id)
+        return jsonify(build_chat_response(chat_result, order_result))
     except Exception as e:
         app.logger.error(f"處理聊天時出錯: {str(e)}", exc_info=True)
-        return jsonify({
-            'status': 'error',
-            'message': f"處理失敗: {str(e)}",
-            'reply': "抱歉，系統暫時遇到問題，請稍後再試。"
-        })
+        return jsonify(chat_error_response(e))
+
+@socketio.on('analyze_chat')
+def analyze_chat_stream(data):
+    """
+    串流版 /analyze_chat
+    回覆文字產生時以 chat_reply_delta 逐段送出，最後以 chat_reply_done 送出與 /analyze_chat 相同的完整結果
+    """
+    sid = request.sid
+    data = data or {}
+    stream_id = data.get('stream_id')
+    text = data.get('text', '')
+    session_id = data.get('session_id') or sid
+
+    def on_delta(delta):
+        socketio.emit('chat_reply_delta', {'stream_id': stream_id, 'delta': delta}, to=sid)
+
+    chat_streams.start(stream_id)
+    try:
+        app.logger.info(f"處理串流聊天輸入: '{text}'")
+        chat_result, order_result = dispatch_chat_analysis(text, session_id, on_delta)
+        result = build_chat_response(chat_result, order_result)
+    except Exception as e:
+        app.logger.error(f"處理串流聊天時出錯: {str(e)}", exc_info=True)
+        result = chat_error_response(e)
+    result['stream_id'] = stream_id
+    chat_streams.finish(stream_id, result)
+    socketio.emit('chat_reply_done', result, to=sid)
+
+def build_chat_response(chat_result, order_result):
+    """將意圖判斷與訂單分析結果整理成前端使用的格式"""
+    app.logger.info(f"意圖判斷結果: {chat_result}")
+    app.logger.info(f"訂單分析結果: {order_result}")
+    
+    # 如果訂單分析成功（有結果）
+    if isinstance(order_result, list) and len(order_result) > 0:
+        order_text = format_order_text(order_result)
+        return {
+            'status': 'success',
+            'is_order': True,
+            'reply': f"我幫您確認一下訂單：{order_text}\n\n請問確認訂購嗎？",
+            'order_details': order_result
+        }
+    
+    # 否則使用聊天回應
+    chat_result = chat_result or {}
+    return {
+        'status': 'success',
+        'is_order': chat_result.get('is_order_intent', False),
+        'reply': chat_result.get('reply', "抱歉，我不太明白您的意思。"),
+        'order_details': []
+    }
+
+def chat_error_response(error):
+    return {
+        'status': 'error',
+        'message': f"處理失敗: {str(error)}",
+        'reply': "抱歉，系統暫時遇到問題，請稍後再試。"
+    }
 # 修改處理文字訂單的路由
 def preprocess_order_text(text):
-    # 檢查是否是純飲料名稱，例如："蜂蜜檸檬"
-    for drink in analyzer.drinks_menu:
-        if text.strip() == drink:
-            return f"一杯{text}"
+    # 檢查是否是純飲料名稱或別名，例如："蜂蜜檸檬"、"珍奶"
+    drink = analyzer.menu.lookup(text)
+    if drink:
+        return f"一杯{drink}"
     
     return text
 
@@ -201,7 +307,10 @@ def enhance_order_text(text):
 # 初始化資料庫連接
 try:
     db = DB(dbconfig())
-    db.connect()  # 確保建立連接
+    db.init_app(app)  # 每個請求結束時歸還連線到連線池
+    # 以資料庫 menu/products 表取代預設菜單
+    analyzer.menu.load(db)
+    db.close()
 except Exception as e:
     print(f"資料庫連接失敗: {str(e)}")
     db = None
@@ -216,21 +325,9 @@ def monthly_top_drinks():
         today = datetime.now()
         first_day = datetime(today.year, today.month, 1)
         
-        # 查詢本月熱銷飲品
-        query = """
-            SELECT drink_name, COUNT(*) as count 
-            FROM orders 
-            WHERE DATE(created_at) >= DATE(%s)
-            GROUP BY drink_name 
-            ORDER BY count DESC 
-            LIMIT 3
-        """
-        
-        # 使用 connect() 確保每次查詢都有連接
-        db.connect()
-        
-        # 執行查詢
-        if db.execute(query, (first_day.strftime('%Y-%m-%d'),)):
+        # 查詢本月熱銷飲品 (讀取每日銷售彙總表)
+        get_sales_rollup().ensure_ready()
+        if db.execute(MONTHLY_TOP_DRINKS_QUERY, (first_day.date(),)):
             results = db.fetchall()
             print(f"查詢結果: {results}")  # 除錯用
             
@@ -253,9 +350,16 @@ def monthly_top_drinks():
             ]
         })
     
+# 沒有天氣資料時的預設推薦
+DEFAULT_RECOMMENDATION = ["珍珠奶茶", "波霸奶茶", "烏龍拿鐵", "檸檬綠茶", "焦糖奶茶", "蜂蜜奶茶"]
+
 def fallback_recommendation():
     try:
-        station, location, weather, temperature = get_weather_data()
+        weather_data = get_cached_weather()
+        if not (isinstance(weather_data, tuple) and len(weather_data) >= 4):
+            print("天氣資料尚未取得，使用預設推薦")
+            return jsonify(DEFAULT_RECOMMENDATION)
+        station, location, weather, temperature = weather_data[:4]
         date = str(datetime.now().date())
 
         test_date = date
@@ -286,130 +390,25 @@ def fallback_recommendation():
     except Exception as e:
         print(f"天氣推薦功能錯誤: {str(e)}")
         # 返回預設推薦
-        return jsonify(["珍珠奶茶", "波霸奶茶", "烏龍拿鐵", "檸檬綠茶", "焦糖奶茶", "蜂蜜奶茶"])
+        return jsonify(DEFAULT_RECOMMENDATION)
     
 @app.route('/api/weather_recommend', methods=['GET'])
 def weather_recommend():
-    try:
-        station, location, weather, temperature = get_weather_data()
-        date = str(datetime.now().date())
-
-        test_date = date
-        test_weather = classify_weather(weather=weather, weather_dict=weather_dict)
-        test_temperature = int(temperature)
-
-        total_model_filename = "sales_total_model_v2_2025_03_18.pkl"
-        sales_model_filename = "lgbm_drink_weather_model_v4_2025_03_18.pkl"
-        sales_csv_filename = "drink_orders_2025_03_18.csv"
-        load_path = LoadPath(total_model_filename=total_model_filename,
-                             sales_model_filename=sales_model_filename,
-                             sales_csv_filename=sales_csv_filename
-                             )
-        total_model_filename = load_path.load_total_model_path()
-        sales_model_filename = load_path.load_sales_model_path()
-        sales_csv_filename = load_path.load_sales_csv_path()
-
-        missing_files = [
-             filename for filename in [total_model_filename, sales_model_filename, sales_csv_filename]
-                 if not os.path.exists(filename)
-                 ]
-        if missing_files:
-            print(f"錯誤: 未找到以下檔案 {', '.join(missing_files)}")
-            return fallback_recommendation()
-
-        pred_total_info = Pred_total(
-            date_string=test_date,
-            weather=test_weather,
-            temperature=test_temperature,
-            model_filename=total_model_filename
-            )
-        predtotal = Pred_Total_Sales(pred_total_info)
-        daily_total_sales = predtotal.pred()
-        pred_sales_info = Pred_sales(
-            date_string=test_date,
-            weather=test_weather,
-            temperature=test_temperature,
-            daily_total_sales=daily_total_sales,
-            model_filename=sales_model_filename,
-            csv_filename=sales_csv_filename
-            )
-        predsales = Pred_Sales(pred_sales_info)
-        weather_recommend = predsales.get_top_6_sales_by_condition()
-
-        return jsonify(weather_recommend)
-    except Exception as e:
-        print(f"天氣推薦菜單異常: {e}")
+    # 推薦由背景排程在天氣或模型改變時預先計算，這裡只讀取結果
+    recommendation = get_recommendation('today')
+    if recommendation is None:
         return fallback_recommendation()
+    response = jsonify(recommendation['top_6_drinks'])
+    response.headers['X-Computed-At'] = recommendation['computed_at']
+    return response
 
-def get_last_order_number(db_instance):
-    """獲取今天最後一筆訂單號碼"""
+def generate_order_number(count=1):
+    """生成新的訂單號碼，由每日序號表配發，多台點餐機同時下單也不會重複"""
     try:
-        today = datetime.now().strftime('%m%d')
-        query = """
-            SELECT order_number 
-            FROM orders 
-            WHERE order_number LIKE %s
-            AND DATE(created_at) = CURDATE()
-            ORDER BY order_number DESC 
-            LIMIT 1
-        """
-        result = db_instance.fetchone(query, (f"{today}%",))
-        return result['order_number'] if result else None
+        return order_number_allocator.allocate(count)
     except Exception as e:
-        print(f"獲取最後訂單號碼時發生錯誤: {str(e)}")
-        return None
-
-def generate_order_number(db, count=1):
-    """生成新的訂單號碼，確保唯一性和序列性"""
-    
-    today = datetime.now().strftime('%m%d')
-    
-    # 獲取最後一筆訂單號碼
-    last_number = get_last_order_number(db)
-    
-    # 確定下一個字母和數字
-    if not last_number or not last_number.startswith(today):
-        # 今天第一筆訂單，從 A1 開始
-        letter = 'A'
-        number = 1
-    else:
-        try:
-            # 從訂單號提取字母和數字部分
-            base_part = last_number.split('-')[0] if '-' in last_number else last_number
-            pattern = r'\d{4}([A-Z])(\d)'
-            match = re.search(pattern, base_part)
-            
-            if match:
-                letter = match.group(1)  # 字母部分
-                number = int(match.group(2))  # 數字部分
-                
-                # 計算下一個字母和數字
-                number += 1
-                if number > 9:
-                    number = 1
-                    letter = chr(ord(letter) + 1)
-                    # 如果超過Z，回到A
-                    if letter > 'Z':
-                        letter = 'A'
-            else:
-                # 匹配失敗，使用默認值
-                letter = 'A'
-                number = 1
-        except Exception as e:
-            print(f"解析訂單號時出錯: {str(e)}, 使用默認值")
-            letter = 'A'
-            number = 1
-    
-    # 基礎訂單號
-    base_order_number = f"{today}{letter}{number}"
-    
-    # 生成所有訂單號碼（依據杯數添加後綴）
-    order_numbers = []
-    for i in range(count):
-        item_order_number = f"{base_order_number}-{i+1}"
-        order_numbers.append(item_order_number)
-    
-    return base_order_number, order_numbers
+        print(f"生成訂單號碼時發生錯誤: {str(e)}")
+        return None, []
 
 
 @app.route('/confirm_order', methods=['POST'])
@@ -436,21 +435,21 @@ def confirm_order():
                 expanded_orders.append(order_item)
         
         # 生成符合規定的訂單號碼
-        base_order_number, item_order_numbers = generate_order_number(db, len(expanded_orders))
+        base_order_number, item_order_numbers = generate_order_number(len(expanded_orders))
         if not base_order_number:
             return jsonify({'status': 'error', 'message': '無法生成訂單號碼'})
         display_number = base_order_number[4:] if len(base_order_number) >= 6 else base_order_number
 
-        # 取得當前時間
-        now = datetime.now()
+        # 取得當前時間 (店家時區，與資料庫的時鐘相同)
+        now = shop_now()
         order_date = now.date()
+        created_at = now.replace(microsecond=0)  # DATETIME 欄位只到秒
         order_time = now.strftime('%H:%M:%S')
-        success_count = 0
         created_order_numbers = []
         
         # 安全獲取天氣數據
         try:
-            weather_data = get_weather_data()
+            weather_data = get_cached_weather()
             
             # 檢查返回值結構
             if isinstance(weather_data, tuple) and len(weather_data) >= 4:
@@ -468,79 +467,81 @@ def confirm_order():
             weather = "sunny"
             temperature = 25
         
-        # 為每一個展開的訂單分配序號
+        # 整筆訂單以單一多列 INSERT 在同一個交易中寫入，全部成功或全部失敗
+        query = INSERT_ORDER_QUERY
+        values_list = []
         for i, order in enumerate(expanded_orders):
-            try:
-                # 生成最終訂單號碼：基礎號碼 + "-" + 序號
-                item_order_number = f"{base_order_number}-{i+1}"
-                query = """
-                    INSERT INTO orders (
-                        drink_name, size, ice_type, sugar_type, 
-                        order_date, order_time, 
-                        weather_status, temperature,
-                        status, created_at, order_number
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), %s)
-                """
-                values = (
-                    order.get('drink_name', '未知飲品'), 
-                    order.get('size', '大杯'),
-                    order.get('ice', '正常冰'), 
-                    order.get('sugar', '全糖'), 
-                    order_date, order_time, 
-                    weather, temperature,
-                    'pending', item_order_number
-                )
-                
-                print(f"準備插入訂單，值為: {values}")
-                if db.execute(query, values):
-                    success_count += 1
-                    created_order_numbers.append(item_order_number)
-                    
-                    # 使用 Socket.IO 廣播訂單狀態 - 狀態為 pending
-                    socketio.emit('order_status_update', {
-                        'order_number': item_order_number,
-                        'status': 'pending',
-                        'timestamp': now.strftime('%Y-%m-%d %H:%M:%S')
-                    })
-                    
-                    # 在開發環境中，自動模擬訂單狀態變更
-                    # 實際生產環境應該由後台管理系統觸發
-                    if app.config.get('ENV') == 'development':
-                        # 2秒後狀態變為 preparing
-                        socketio.sleep(2)
-                        socketio.emit('order_status_update', {
-                            'order_number': item_order_number,
-                            'status': 'preparing',
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        })
-                        
-                        # 再過6秒後狀態變為 completed
-                        def send_completed_status(order_number):
-                            socketio.sleep(6)
-                            socketio.emit('order_completed', {
-                                'order_number': order_number,
-                                'status': 'completed',
-                                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                            })
-                            
-                            # 更新數據庫狀態
-                            update_query = "UPDATE orders SET status = 'completed' WHERE order_number = %s"
-                            db.execute(update_query, (order_number,))
-                            
-                            print(f"訂單 {order_number} 已完成")
-                            
-                        # 啟動背景任務發送完成通知
-                        socketio.start_background_task(send_completed_status, item_order_number)
-                else:
-                    print(f"插入訂單失敗: {values}")
-            except Exception as e:
-                print(f"插入單筆訂單時發生錯誤: {str(e)}")
-        
-        if success_count == 0:
+            # 生成最終訂單號碼：基礎號碼 + "-" + 序號
+            item_order_number = f"{base_order_number}-{i+1}"
+            values_list.append((
+                order.get('drink_name', '未知飲品'), 
+                order.get('size', '大杯'),
+                order.get('ice', '正常冰'), 
+                order.get('sugar', '全糖'), 
+                order_date, order_time, 
+                weather, temperature,
+                'pending', created_at, item_order_number
+            ))
+            created_order_numbers.append(item_order_number)
+
+        print(f"準備插入 {len(values_list)} 筆訂單: {created_order_numbers}")
+        # 每日銷售彙總表與訂單在同一個交易中寫入，不會只有其中一邊成功
+        # (日期, 飲料, 大小, 冰量, 甜度, 天氣, 金額)；點餐端不寫入金額，以資料表預設值 0 計
+        sales_rollup = get_sales_rollup()
+        rollup_batches = sales_rollup.order_batches(
+            [(order_date, *values[:4], weather, 0) for values in values_list])
+        if not db.executemany_all([(query, values_list)] + rollup_batches):
             return jsonify({
                 'status': 'error',
-                'message': '所有訂單儲存失敗'
+                'message': '訂單儲存失敗'
+            })
+        if rollup_batches:
+            sales_rollup.mark_changed()
+        get_order_stats().record_created(len(values_list), order_date)
+        wait_estimator = get_wait_estimator()
+        for values in values_list:
+            wait_estimator.record_created(values[-1], values[0], now)
+
+        # commit 成功後才逐杯廣播訂單狀態
+        for item_order_number in created_order_numbers:
+            # 使用 Socket.IO 廣播訂單狀態 - 狀態為 pending
+            socketio.emit('order_status_update', {
+                'order_number': item_order_number,
+                'status': 'pending',
+                'timestamp': now.strftime('%Y-%m-%d %H:%M:%S')
             })
+            
+            # 在開發環境中，自動模擬訂單狀態變更
+            # 實際生產環境應該由後台管理系統觸發
+            if app.config.get('ENV') == 'development':
+                # 2秒後狀態變為 preparing
+                socketio.sleep(2)
+                socketio.emit('order_status_update', {
+                    'order_number': item_order_number,
+                    'status': 'preparing',
+                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                })
+                
+                # 再過6秒後狀態變為 completed
+                def send_completed_status(order_number):
+                    socketio.sleep(6)
+                    socketio.emit('order_completed', {
+                        'order_number': order_number,
+                        'status': 'completed',
+                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    })
+                    
+                    # 更新數據庫狀態
+                    update_query = "UPDATE orders SET status = 'completed' WHERE order_number = %s"
+                    db.execute(update_query, (order_number,))
+                    db.close()  # 背景任務不在請求內，需自行歸還連線
+                    get_order_stats().invalidate()  # 原狀態未知，重新統計
+                    get_wait_estimator().record_status(order_number, 'completed')
+                    
+                    print(f"訂單 {order_number} 已完成")
+                    
+                # 啟動背景任務發送完成通知
+                socketio.start_background_task(send_completed_status, item_order_number)
         
         # 輸出所有創建的訂單號碼，方便調試
         print(f"成功創建訂單: {created_order_numbers}")
@@ -1,8 +1,87 @@
-from openai import OpenAI
 import os
 from dotenv import load_dotenv
 import json
 import logging
+import re
+import time
+from frontend.llm_cache import ResponseCache, version_of
+from frontend.llm_gateway import get_gateway
+from codes.menu_index import menu_index
+from chat_tools.conversation_store import create_conversation_store, trim_history
+
+# 系統提示，幫助 GPT 更準確識別點餐意圖
+CHAT_SYSTEM_PROMPT = """你是一個智慧點餐助手，位於飲料店內。你的主要目標是幫助客戶點餐。
+
+當用戶出現下列情況時，請判斷為點餐意圖：
+1. 明確提到特定飲料名稱，例如：珍珠奶茶、紅茶、綠茶等
+2. 使用點餐相關詞彙，例如：我要、我想喝、來一杯、點、訂購等
+3. 談論甜度或冰量，例如：半糖、少冰、無糖等
+4. 詢問菜單或推薦飲料時
+5. 表明想要購買或訂購的意願
+
+請以 JSON 格式回應，包含以下字段：
+{
+    "reply": "對用戶的友善回覆",
+    "intent": "chat 或 order",
+    "confidence": 0.0到1.0之間的數值
+}
+
+不要在回覆中提到你是AI或機器人。保持回覆簡短自然，像真人店員一樣。"""
+
+# 未提供 session id 時共用的對話
+DEFAULT_SESSION = "default"
+
+# JSON 字串跳脫字元
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class ReplyStreamParser:
+    """
+    從串流中的 JSON 片段即時取出 "reply" 欄位的文字
+    例如依序收到 '{"reply": "好的', '，馬上', '為您準備"' 會依序回傳 '好的'、'，馬上'、'為您準備'
+    """
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0          # 已處理到 buffer 的位置
+        self.in_reply = False
+        self.done = False
+
+    def feed(self, chunk):
+        """加入新片段，回傳新增的 reply 文字"""
+        self.buffer += chunk
+        if self.done:
+            return ''
+        if not self.in_reply:
+            match = re.search(r'"reply"\s*:\s*"', self.buffer)
+            if not match:
+                return ''
+            self.in_reply = True
+            self.pos = match.end()
+
+        out = []
+        while self.pos < len(self.buffer):
+            char = self.buffer[self.pos]
+            if char == '"':
+                self.done = True
+                break
+            if char != '\\':
+                out.append(char)
+                self.pos += 1
+                continue
+            # 跳脫字元需要完整收到才處理
+            if self.pos + 1 >= len(self.buffer):
+                break
+            code = self.buffer[self.pos + 1]
+            if code == 'u':
+                if self.pos + 6 > len(self.buffer):
+                    break
+                out.append(chr(int(self.buffer[self.pos + 2:self.pos + 6], 16)))
+                self.pos += 6
+            else:
+                out.append(_ESCAPES.get(code, code))
+                self.pos += 2
+        return ''.join(out)
+
 
 class ChatAnalyzer:
     def __init__(self):
@@ -14,78 +93,59 @@ class ChatAnalyzer:
         if not api_key:
             raise ValueError("未設置 OPENAI_API_KEY 環境變數")
             
-        self.client = OpenAI(
-            api_key=api_key
-        )
+        # 與 OrderAnalyzer 共用的 LLM 呼叫入口
+        self.llm = get_gateway()
         
-        # 用於儲存對話歷史
-        self.conversation_history = []
+        # 每位顧客 (session id) 各自的對話歷史
+        self.conversations = create_conversation_store()
         
         # 初始化日誌
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger('chat_analyzer')
-    
-    def analyze_chat(self, text, conversation_history=None):
-        """分析聊天內容，返回適當的回應和意圖"""
-        try:
-            # 使用提供的歷史記錄或內部歷史記錄
-            history = conversation_history if conversation_history else self.conversation_history
-            
-            # 構建詳細的系統提示，幫助 GPT 更準確識別點餐意圖
-            system_prompt = """你是一個智慧點餐助手，位於飲料店內。你的主要目標是幫助客戶點餐。
 
-當用戶出現下列情況時，請判斷為點餐意圖：
-1. 明確提到特定飲料名稱，例如：珍珠奶茶、紅茶、綠茶等
-2. 使用點餐相關詞彙，例如：我要、我想喝、來一杯、點、訂購等
-3. 談論甜度或冰量，例如：半糖、少冰、無糖等
-4. 詢問菜單或推薦飲料時
-5. 表明想要購買或訂購的意願
+        # LLM 回應快取 (菜單或提示詞改變時自動失效；回覆中會提到飲料)
+        self.menu = menu_index
+        self.cache = ResponseCache('chat_analyzer', self.cache_version())
+        self.menu.subscribe(lambda index: self.refresh_cache_version())
 
-請以 JSON 格式回應，包含以下字段：
-{
-    "reply": "對用戶的友善回覆",
-    "intent": "chat 或 order",
-    "confidence": 0.0到1.0之間的數值
-}
+    def cache_version(self):
+        return version_of(CHAT_SYSTEM_PROMPT, self.menu.names)
 
-不要在回覆中提到你是AI或機器人。保持回覆簡短自然，像真人店員一樣。"""
-            
-            # 構建 messages 序列
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-            
-            # 添加歷史對話，最多10輪
-            for msg in history[-10:]:
-                messages.append({"role": msg["role"], "content": msg["content"]})
-            
-            # 添加當前用戶訊息
-            messages.append({"role": "user", "content": text})
-            
-            # 調用 API
-            self.logger.info(f"發送對話分析請求: {text}")
-            completion = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.7,
-                response_format={"type": "json_object"},
-                max_tokens=600
-            )
-            
-            # 分析結果
-            result = completion.choices[0].message.content.strip()
-            self.logger.info(f"API 回應: {result}")
+    def refresh_cache_version(self):
+        """菜單更新後呼叫，使舊的聊天回覆失效"""
+        self.cache.set_version(self.cache_version())
+    
+    def analyze_chat(self, text, conversation_history=None, session_id=DEFAULT_SESSION, on_delta=None):
+        """
+        分析聊天內容，返回適當的回應和意圖
+        提供 on_delta 時使用串流 API，reply 文字產生時即呼叫 on_delta(片段)
+        """
+        try:
+            # 使用提供的歷史記錄或該顧客的歷史記錄 (已依 token 預算裁切)
+            if conversation_history:
+                history = trim_history(conversation_history)
+            else:
+                history = self.conversations.history(session_id)
             
-            # 解析 JSON
-            response_data = json.loads(result)
+            # 沒有對話歷史 (新對話的第一句) 時，相同 (正規化後) 的語句直接使用快取回應
+            # 有歷史時回覆依上下文而定，不讀也不寫快取，避免回給其他顧客
+            use_cache = not history
+            response_data = self.cache.get(text) if use_cache else None
+            if response_data is not None:
+                self.logger.info(f"快取命中: {text}")
+                if on_delta and response_data.get("reply"):
+                    on_delta(response_data["reply"])
+            else:
+                start = time.perf_counter()
+                if on_delta:
+                    response_data = self._stream_chat(text, history, on_delta)
+                else:
+                    response_data = self._request_chat(text, history)
+                if use_cache:
+                    self.cache.put(text, response_data, time.perf_counter() - start)
             
             # 保存對話歷史
-            self.conversation_history.append({"role": "user", "content": text})
-            self.conversation_history.append({"role": "assistant", "content": response_data.get("reply", "")})
-            
-            # 如果歷史太長，移除最舊的對話
-            if len(self.conversation_history) > 20:
-                self.conversation_history = self.conversation_history[-20:]
+            self.conversations.append(session_id, text, response_data.get("reply", ""))
             
             # 標準化回應
             return {
@@ -106,6 +166,70 @@ class ChatAnalyzer:
                 "intent": "error"
             }
             
-    def reset_conversation(self):
+    def _build_messages(self, text, history):
+        # 構建 messages 序列
+        messages = [
+            {"role": "system", "content": CHAT_SYSTEM_PROMPT}
+        ]
+        
+        # 添加歷史對話
+        for msg in history:
+            messages.append({"role": msg["role"], "content": msg["content"]})
+        
+        # 添加當前用戶訊息
+        messages.append({"role": "user", "content": text})
+        return messages
+
+    def _request_chat(self, text, history):
+        """呼叫 OpenAI 取得回覆與意圖 (未標準化的 JSON)"""
+        messages = self._build_messages(text, history)
+        
+        # 調用 API
+        self.logger.info(f"發送對話分析請求: {text}")
+        completion = self.llm.complete(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            temperature=0.7,
+            response_format={"type": "json_object"},
+            max_tokens=600
+        )
+        
+        # 分析結果
+        result = completion.choices[0].message.content.strip()
+        self.logger.info(f"API 回應: {result}")
+        
+        # 解析 JSON
+        response_data = json.loads(result)
+        return response_data
+
+    def _stream_chat(self, text, history, on_delta):
+        """以串流 API 呼叫 OpenAI，reply 文字邊產生邊送出，完成後回傳完整 JSON"""
+        messages = self._build_messages(text, history)
+        
+        self.logger.info(f"發送串流對話分析請求: {text}")
+        stream = self.llm.stream(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            temperature=0.7,
+            response_format={"type": "json_object"},
+            max_tokens=600
+        )
+        
+        parser = ReplyStreamParser()
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            reply_delta = parser.feed(delta)
+            if reply_delta:
+                on_delta(reply_delta)
+        
+        result = parser.buffer.strip()
+        self.logger.info(f"API 串流回應: {result}")
+        return json.loads(result)
+
+    def reset_conversation(self, session_id=DEFAULT_SESSION):
         """重置對話歷史"""
-        self.conversation_history = []
\ No newline at end of file
+        self.conversations.reset(session_id)
\ No newline at end of file
@@ -0,0 +1,47 @@
+import os
+import threading
+import time
+
+# 串流聊天的結果保留時間 (秒)；前端串流逾時改用 POST /analyze_chat 時以 stream_id 取回同一個結果
+CHAT_STREAM_TTL = int(os.getenv("CHAT_STREAM_TTL", 120))
+CHAT_STREAM_WAIT = float(os.getenv("CHAT_STREAM_WAIT", 30))   # POST 等待進行中串流的秒數
+
+
+class ChatStreamRegistry:
+    """
+    記錄進行中與剛完成的串流聊天 (stream_id -> 結果)
+    同一個 stream_id 的備援請求直接等待原本的結果，不再呼叫一次 LLM，也不會重複寫入對話歷史
+    """
+    def __init__(self, ttl=CHAT_STREAM_TTL):
+        self.ttl = ttl
+        self._streams = {}  # stream_id -> [開始時間, threading.Event, 結果]
+        self._lock = threading.Lock()
+
+    def start(self, stream_id):
+        if not stream_id:
+            return
+        now = time.monotonic()
+        with self._lock:
+            # 順便清除過期的紀錄
+            for key in [key for key, entry in self._streams.items() if now - entry[0] > self.ttl]:
+                del self._streams[key]
+            self._streams[stream_id] = [now, threading.Event(), None]
+
+    def finish(self, stream_id, result):
+        with self._lock:
+            entry = self._streams.get(stream_id)
+        if entry:
+            entry[2] = result
+            entry[1].set()
+
+    def known(self, stream_id):
+        with self._lock:
+            return bool(stream_id) and stream_id in self._streams
+
+    def wait(self, stream_id, timeout=CHAT_STREAM_WAIT):
+        """等待 stream_id 的結果，沒有這個串流或等待逾時回傳 None"""
+        with self._lock:
+            entry = self._streams.get(stream_id)
+        if not entry or not entry[1].wait(timeout):
+            return None
+        return entry[2]
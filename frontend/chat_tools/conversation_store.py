@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# 對話狀態設定
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", 500))   # 記憶體中最多保留的顧客數
+CONVERSATION_IDLE_TTL = int(os.getenv("CONVERSATION_IDLE_TTL", 600))           # 閒置多少秒後清除
+CONVERSATION_MAX_MESSAGES = int(os.getenv("CONVERSATION_MAX_MESSAGES", 20))     # 每位顧客保留的訊息數
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", 800))    # 送給 LLM 的歷史 token 上限
+CONVERSATION_REDIS_URL = os.getenv("CONVERSATION_REDIS_URL")                    # 設定後改用 Redis 保存
+
+
+def estimate_tokens(text):
+    """
+    粗估 token 數 (不依賴 tokenizer)
+    中文字約 1 字 1 token，其他字元約 4 字元 1 token，每則訊息另加 4 個格式 token
+    """
+    cjk = sum(1 for char in text if ord(char) > 0x2e80)
+    return cjk + (len(text) - cjk + 3) // 4 + 4
+
+
+def trim_history(messages, token_budget=CONVERSATION_TOKEN_BUDGET):
+    """由最新往回保留訊息，直到超過 token 預算；開頭不留下孤立的 assistant 回覆"""
+    kept = []
+    used = 0
+    for message in reversed(messages):
+        used += estimate_tokens(message["content"])
+        if used > token_budget:
+            break
+        kept.append(message)
+    kept.reverse()
+    while kept and kept[0]["role"] == "assistant":
+        kept.pop(0)
+    return kept
+
+
+class MemoryBackend:
+    """
+    記憶體對話保存，依最後使用時間做 LRU
+    超過最大顧客數或閒置逾時的對話會被清除
+    """
+    def __init__(self, max_sessions=CONVERSATION_MAX_SESSIONS, idle_ttl=CONVERSATION_IDLE_TTL,
+                 max_messages=CONVERSATION_MAX_MESSAGES):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self._sessions = OrderedDict()  # session_id -> (最後使用時間, 訊息列表)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _evict(self, now):
+        # 最舊的在前面，遇到未逾時的就停止
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if now - last_used <= self.idle_ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._sessions.get(session_id)
+            return list(entry[1]) if entry else []
+
+    def append(self, session_id, *messages):
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            history = entry[1] if entry else []
+            history.extend(messages)
+            self._sessions[session_id] = (now, history[-self.max_messages:])
+            self._evict(now)
+
+    def reset(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions), "evictions": self.evictions}
+
+
+class RedisBackend:
+    """
+    Redis 對話保存，多個 worker 可共用同一份對話
+    client 只需提供 redis-py 的 rpush/ltrim/lrange/expire/delete
+    """
+    def __init__(self, client, idle_ttl=CONVERSATION_IDLE_TTL, max_messages=CONVERSATION_MAX_MESSAGES,
+                 prefix="conversation:"):
+        self.client = client
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.prefix = prefix
+
+    def get(self, session_id):
+        raw = self.client.lrange(self.prefix + session_id, 0, -1)
+        return [json.loads(item) for item in raw]
+
+    def append(self, session_id, *messages):
+        key = self.prefix + session_id
+        self.client.rpush(key, *[json.dumps(message, ensure_ascii=False) for message in messages])
+        self.client.ltrim(key, -self.max_messages, -1)
+        self.client.expire(key, self.idle_ttl)
+
+    def reset(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+class ConversationStore:
+    """以 session id 區分每位顧客的對話，取出時依 token 預算裁切"""
+    def __init__(self, backend=None, token_budget=CONVERSATION_TOKEN_BUDGET):
+        self.backend = backend or MemoryBackend()
+        self.token_budget = token_budget
+
+    def history(self, session_id):
+        """送給 LLM 的歷史 (已依 token 預算裁切)"""
+        return trim_history(self.backend.get(session_id), self.token_budget)
+
+    def append(self, session_id, user_text, reply):
+        self.backend.append(session_id,
+                            {"role": "user", "content": user_text},
+                            {"role": "assistant", "content": reply})
+
+    def reset(self, session_id):
+        self.backend.reset(session_id)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+def create_conversation_store():
+    """設定 CONVERSATION_REDIS_URL 且有安裝 redis 時使用 Redis，否則使用記憶體"""
+    if CONVERSATION_REDIS_URL:
+        try:
+            import redis
+            client = redis.Redis.from_url(CONVERSATION_REDIS_URL)
+            client.ping()
+            return ConversationStore(RedisBackend(client))
+        except Exception as e:
+            print(f"無法使用 Redis 保存對話，改用記憶體: {e}")
+    return ConversationStore()
@@ -0,0 +1,117 @@
+import heapq
+import os
+import threading
+import time
+
+# 暫存語音設定
+TEMP_AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'temp_audio')
+TEMP_AUDIO_TTL = float(os.getenv("TEMP_AUDIO_TTL", 20))                            # 檔案保留秒數 (足夠播放完成)
+TEMP_AUDIO_MAX_BYTES = int(os.getenv("TEMP_AUDIO_MAX_MB", 50)) * 1024 * 1024       # 目錄總大小上限
+
+
+class AudioJanitor:
+    """
+    管理暫存語音目錄的單一背景 thread
+    以 heap 依到期時間排序，只在最近一個檔案到期時醒來刪除
+    總大小超過上限時提前刪除最早到期的檔案；啟動時清除上次執行遺留的檔案
+    """
+    def __init__(self, directory=TEMP_AUDIO_DIR, ttl=TEMP_AUDIO_TTL, max_bytes=TEMP_AUDIO_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._heap = []       # (到期時間, 檔名)
+        self._files = {}      # 檔名 -> (大小, 到期時間)
+        self._bytes = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        # 統計數據
+        self.expired = 0
+        self.evicted = 0
+        self.orphans = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """清除遺留檔案並啟動背景 thread (重複呼叫不會建立第二個 thread)"""
+        with self._cond:
+            if self._thread:
+                return
+            self._sweep_orphans()
+            self._thread = threading.Thread(target=self._run, name='audio-janitor', daemon=True)
+            self._thread.start()
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def track(self, filename, ttl=None):
+        """登記新寫入的檔案，ttl 秒後刪除"""
+        try:
+            size = os.path.getsize(self.path(filename))
+        except OSError:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._cond:
+            self._bytes += size - self._files.get(filename, (0, None))[0]
+            self._files[filename] = (size, expires_at)
+            heapq.heappush(self._heap, (expires_at, filename))
+            # 超過總大小上限時提前刪除最早到期的檔案
+            while self._bytes > self.max_bytes and len(self._files) > 1:
+                self._remove_next(evicted=True)
+            self._cond.notify()
+
+    def _sweep_orphans(self):
+        """上次執行遺留 (沒有人登記) 的檔案一律刪除"""
+        for name in os.listdir(self.directory):
+            if name in self._files:
+                continue
+            try:
+                os.remove(self.path(name))
+                self.orphans += 1
+            except OSError:
+                pass
+        if self.orphans:
+            print(f"已清除 {self.orphans} 個遺留的暫存語音檔")
+
+    def _remove_next(self, evicted=False):
+        """刪除 heap 中最早到期的檔案 (需持有 _cond)"""
+        expires_at, filename = heapq.heappop(self._heap)
+        entry = self._files.get(filename)
+        if entry is None or entry[1] != expires_at:
+            # 檔案已刪除或被重新登記 (延長期限)，舊的到期項目直接略過
+            return
+        del self._files[filename]
+        self._bytes -= entry[0]
+        if evicted:
+            self.evicted += 1
+        else:
+            self.expired += 1
+        try:
+            os.remove(self.path(filename))
+        except OSError:
+            pass
+
+    def _run(self):
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                self._remove_next()
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "files": len(self._files),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "orphans": self.orphans
+            }
+
+
+# temp_audio 目錄唯一的管理者
+audio_janitor = AudioJanitor()
@@ -1,8 +1,13 @@
+import io
 import os
-import time
+import threading
 import uuid
-import azure.cognitiveservices.speech as speechsdk
-from flask import Blueprint, jsonify, request, current_app, url_for
+from urllib.parse import urlparse
+from flask import Blueprint, Response, jsonify, request, current_app, url_for, send_from_directory, \
+    stream_with_context
+from .tts_cache import TTSCache, tts_cache_key
+from .tts_engine import AZURE_SPEECH_KEY, TTSError, get_tts_engine
+from .audio_janitor import audio_janitor
 from dotenv import load_dotenv
 import logging
 # 載入環境變數
@@ -11,10 +16,6 @@ load_dotenv()
 # 創建藍圖
 speech_bp = Blueprint('speech', __name__)
 
-# Azure 憑證
-AZURE_SPEECH_KEY = os.environ.get('AZURE_SPEECH_KEY')
-AZURE_SPEECH_REGION = os.environ.get('AZURE_SPEECH_REGION', 'eastasia')
-
 # 聲音設定
 VOICE_NAMES = {
     'female_warm': 'zh-TW-HsiaoChenNeural',   # 溫暖女聲
@@ -30,95 +31,88 @@ logger = logging.getLogger('speech')
 
 
 
+# 固定的提示語，啟動時可預先合成 (TTS_PREWARM=1)
+PREWARM_PHRASES = [
+    '您好！我是您的智慧點餐助手。請問您今天想喝什麼呢？或是需要我為您推薦飲品？',
+    '抱歉，我不太明白您的意思。',
+    '抱歉，系統暫時遇到問題，請稍後再試。',
+    '請您明確告訴我想要的飲料名稱、大小、甜度和冰量。',
+    '訂單系統暫時無法使用，請稍後再試。'
+]
+DEFAULT_RATE = 1.2
+
+# 串流合成的限制：GET 端點可被任意網址觸發，限制長度與語速範圍以免濫用 Azure 額度與塞滿快取
+TTS_STREAM_MAX_CHARS = int(os.getenv("TTS_STREAM_MAX_CHARS", 200))
+RATE_RANGE = (0.5, 2.0)
+
+# 以內容為鍵的語音快取
+tts_cache = TTSCache()
+
+# 註冊藍圖時啟動暫存語音管理 (清除遺留檔案、到期刪除)
+speech_bp.record_once(lambda state: audio_janitor.start())
+
+
+def get_cached_speech(text, voice_style='default', speaking_rate=DEFAULT_RATE):
+    """回傳語音檔名，相同 (文字, 聲音, 語速) 只合成一次"""
+    voice_name = VOICE_NAMES.get(voice_style, VOICE_NAMES['default'])
+    key = tts_cache_key(text, voice_name, speaking_rate)
+    return tts_cache.get_or_create(
+        key, lambda path: get_tts_engine().synthesize_to_file(text, voice_name, speaking_rate, path))
+
+
+def get_temp_speech(text, voice_style='default', speaking_rate=DEFAULT_RATE):
+    """合成一次性語音到 temp_audio，由 audio_janitor 到期刪除，回傳檔名"""
+    voice_name = VOICE_NAMES.get(voice_style, VOICE_NAMES['default'])
+    filename = f"speech_{uuid.uuid4()}.mp3"
+    if not get_tts_engine().synthesize_to_file(text, voice_name, speaking_rate, audio_janitor.path(filename)):
+        return None
+    audio_janitor.track(filename)
+    return filename
+
+
+def prewarm_speech(phrases=PREWARM_PHRASES, voice_style='default', speaking_rate=DEFAULT_RATE):
+    """在背景預先合成固定提示語"""
+    def run():
+        for phrase in phrases:
+            try:
+                get_cached_speech(phrase, voice_style, speaking_rate)
+            except Exception as e:
+                logger.error(f"預先合成語音失敗: {str(e)}")
+        logger.info(f"已預先合成 {len(phrases)} 段語音")
+    threading.Thread(target=run, daemon=True).start()
+
+
 @speech_bp.route('/api/get_speech', methods=['POST'])
 def get_speech():
-    """生成語音檔案並返回URL"""
+    """
+    生成語音檔案並返回URL (相同內容沿用同一個快取檔案與網址)
+    cache=false 時產生一次性的暫存檔，播放後由 audio_janitor 刪除
+    """
     data = request.json
     text = data.get('text', '')
     voice_style = data.get('style', 'default')
-    speaking_rate = data.get('rate', 1.2)
+    speaking_rate = data.get('rate', DEFAULT_RATE)
+    use_cache = data.get('cache', True)
     
     if not text:
         return jsonify({'success': False, 'error': '未提供文字'}), 400
     
     try:
-        # 設置 Azure 語音配置
-        speech_config = speechsdk.SpeechConfig(
-            subscription=AZURE_SPEECH_KEY, 
-            region=AZURE_SPEECH_REGION
-        )
-        
-        # 選擇聲音
-        voice_name = VOICE_NAMES.get(voice_style, VOICE_NAMES['default'])
-        speech_config.speech_synthesis_voice_name = voice_name
-        
-        # 添加表情、語調和語速控制 (SSML)
-        ssml_text = f"""
-        <speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" 
-               xmlns:mstts="http://www.w3.org/2001/mstts" xml:lang="zh-TW">
-            <voice name="{voice_name}">
-                <prosody rate="{speaking_rate}">
-                    <mstts:express-as style="cheerful" styledegree="1.2">
-                        {text}
-                    </mstts:express-as>
-                </prosody>
-            </voice>
-        </speak>
-        """
-        
-        # 創建文件名和路徑
-        filename = f"speech_{uuid.uuid4()}.mp3"
-        
-        # 確保路徑是絕對路徑
-        temp_audio_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'temp_audio')
-        os.makedirs(temp_audio_dir, exist_ok=True)
-        
-        # 文件完整路徑
-        file_path = os.path.join(temp_audio_dir, filename)
-        
-        # 設置音頻輸出
-        audio_config = speechsdk.audio.AudioOutputConfig(filename=file_path)
-        
-        # 創建語音合成器
-        synthesizer = speechsdk.SpeechSynthesizer(
-            speech_config=speech_config, 
-            audio_config=audio_config
-        )
-        
-        # 合成語音
-        result = synthesizer.speak_ssml_async(ssml_text).get()
-        
-        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-            # 創建可訪問的URL
-            audio_url = f'/temp_audio/{filename}'
-            
-            # 設置延遲刪除（使用後台線程）
-            def delayed_delete():
-                import time
-                
-                # 等待20秒（假設足夠播放完成）
-                time.sleep(20)
-                
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                        logger.info(f"已自動刪除語音文件: {filename}")
-                except Exception as e:
-                    logger.error(f"自動刪除語音文件失敗: {str(e)}")
-            
-            # 創建後台線程運行刪除函數
-            import threading
-            threading.Thread(target=delayed_delete, daemon=True).start()
-            
+        if use_cache:
+            filename = get_cached_speech(text, voice_style, speaking_rate)
+            audio_url = url_for('speech.tts_audio', filename=filename) if filename else None
+        else:
+            filename = get_temp_speech(text, voice_style, speaking_rate)
+            audio_url = f'/temp_audio/{filename}' if filename else None
+        if audio_url:
             return jsonify({
                 'success': True,
                 'audio_url': audio_url
             })
         else:
-            current_app.logger.error(f"語音合成失敗: {result.reason}")
             return jsonify({
                 'success': False,
-                'error': f'語音合成失敗: {result.reason}'
+                'error': '語音合成失敗'
             }), 500
             
     except Exception as e:
@@ -126,4 +120,78 @@ def get_speech():
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+def _same_origin():
+    """只接受本站頁面發出的請求 (瀏覽器的 Sec-Fetch-Site，舊瀏覽器改看 Origin / Referer)"""
+    site = request.headers.get('Sec-Fetch-Site')
+    if site:
+        return site in ('same-origin', 'none')
+    source = request.headers.get('Origin') or request.headers.get('Referer')
+    return bool(source) and urlparse(source).netloc == request.host
+
+
+@speech_bp.route('/api/speech_stream')
+def speech_stream():
+    """
+    邊合成邊回傳 MP3 (chunked)，可直接作為 <audio src> 使用，合成完成前就能開始播放
+    已快取的語音直接回傳檔案；串流完成後寫入快取，之後相同內容不再合成
+    參數：text (最多 TTS_STREAM_MAX_CHARS 字)、style、rate；只接受本站頁面的請求
+    """
+    text = request.args.get('text', '').strip()
+    voice_style = request.args.get('style', 'default')
+    speaking_rate = request.args.get('rate', DEFAULT_RATE, type=float)
+    
+    if not _same_origin():
+        return jsonify({'success': False, 'error': '不允許的來源'}), 403
+    if not text:
+        return jsonify({'success': False, 'error': '未提供文字'}), 400
+    if len(text) > TTS_STREAM_MAX_CHARS:
+        return jsonify({'success': False, 'error': f'文字過長 (上限 {TTS_STREAM_MAX_CHARS} 字)'}), 400
+    if voice_style not in VOICE_NAMES or not RATE_RANGE[0] <= speaking_rate <= RATE_RANGE[1]:
+        return jsonify({'success': False, 'error': '不支援的聲音或語速'}), 400
+    # 語速取到小數一位，避免同一段文字以不同語速塞滿快取
+    speaking_rate = round(speaking_rate, 1)
+    
+    voice_name = VOICE_NAMES.get(voice_style, VOICE_NAMES['default'])
+    key = tts_cache_key(text, voice_name, speaking_rate)
+    filename = tts_cache.get(key)
+    if filename:
+        return tts_audio(filename)
+    
+    def generate():
+        buffer = io.BytesIO()
+        try:
+            for chunk in get_tts_engine().stream(text, voice_name, speaking_rate):
+                buffer.write(chunk)
+                yield chunk
+        except TTSError as e:
+            logger.error(str(e))
+            return
+        tts_cache.put_bytes(key, buffer.getvalue())
+    
+    return Response(stream_with_context(generate()), mimetype='audio/mpeg',
+                    headers={'Cache-Control': 'no-store'})
+
+
+@speech_bp.route('/tts_audio/<path:filename>')
+def tts_audio(filename):
+    """快取的語音檔以內容為檔名，內容不會改變，可讓瀏覽器長期快取"""
+    response = send_from_directory(tts_cache.directory, filename, mimetype='audio/mpeg')
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+
+@speech_bp.route('/api/tts_cache_stats')
+def tts_cache_stats():
+    return jsonify({
+        'cache': tts_cache.stats(),
+        'temp_audio': audio_janitor.metrics()
+    })
+
+
+if os.getenv('TTS_PREWARM') == '1' and AZURE_SPEECH_KEY:
+    prewarm_speech()
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# 語音快取設定
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tts_cache')
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", 200)) * 1024 * 1024
+
+
+def tts_cache_key(text, voice_name, rate):
+    """以 (文字, 聲音, 語速) 計算內容位址，相同內容永遠得到相同檔名與網址"""
+    raw = f"{voice_name}|{float(rate):g}|{text.strip()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class TTSCache:
+    """
+    磁碟上的語音檔 LRU 快取，總大小超過上限時刪除最久未使用的檔案
+    同一段文字同時被多個請求合成時只會合成一次
+    """
+    def __init__(self, directory=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._files = OrderedDict()  # key -> 檔案大小，最久未使用的在前
+        self._total = 0
+        self._lock = threading.Lock()
+        self._pending = {}           # key -> 合成中的 Lock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """啟動時以修改時間還原 LRU 順序 (命中時會更新修改時間)"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                # 上次執行合成到一半的暫存檔
+                os.remove(os.path.join(self.directory, name))
+            elif name.startswith('tts_') and name.endswith('.mp3'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name[4:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._files[key] = size
+            self._total += size
+        self._evict()
+
+    @staticmethod
+    def filename(key):
+        return f"tts_{key}.mp3"
+
+    def path(self, key):
+        return os.path.join(self.directory, self.filename(key))
+
+    def get(self, key):
+        """快取中有此語音時回傳檔名，並標記為最近使用"""
+        with self._lock:
+            if key not in self._files:
+                return None
+            self._files.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+        return self.filename(key)
+
+    def get_or_create(self, key, synthesize):
+        """
+        取得語音檔名，沒有時呼叫 synthesize(暫存路徑) 合成
+        synthesize 成功回傳 True；失敗回傳 False 或拋出例外，此時不寫入快取
+        """
+        filename = self.get(key)
+        if filename:
+            return filename
+
+        with self._lock:
+            pending = self._pending.setdefault(key, threading.Lock())
+        with pending:
+            # 等待期間其他請求可能已完成合成
+            filename = self.get(key)
+            if filename:
+                return filename
+            with self._lock:
+                self.misses += 1
+            tmp_path = f"{self.path(key)}.{threading.get_ident()}.tmp"
+            try:
+                if not synthesize(tmp_path):
+                    return None
+                self._add(key, tmp_path)
+                return self.filename(key)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                with self._lock:
+                    self._pending.pop(key, None)
+
+    def put_bytes(self, key, data):
+        """寫入已合成好的語音內容 (例如串流結束後)"""
+        if not data:
+            return
+        tmp_path = f"{self.path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            self._add(key, tmp_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _add(self, key, tmp_path):
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, self.path(key))
+        with self._lock:
+            self._total += size - self._files.pop(key, 0)
+            self._files[key] = size
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._files) > 1:
+            key, size = self._files.popitem(last=False)
+            self._total -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "files": len(self._files),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions
+            }
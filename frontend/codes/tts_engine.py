@@ -0,0 +1,108 @@
+import logging
+import os
+from xml.sax.saxutils import escape, quoteattr
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger('speech')
+
+# Azure 憑證
+AZURE_SPEECH_KEY = os.environ.get('AZURE_SPEECH_KEY')
+AZURE_SPEECH_REGION = os.environ.get('AZURE_SPEECH_REGION', 'eastasia')
+
+STREAM_CHUNK_SIZE = 4096  # 串流時每次讀取的位元組數
+
+
+class TTSError(Exception):
+    """語音合成失敗"""
+
+
+def build_ssml(text, voice_name, speaking_rate):
+    """添加表情、語調和語速控制 (SSML)；文字中的 & < > 需跳脫，否則 SSML 解析失敗"""
+    return f"""
+        <speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis"
+               xmlns:mstts="http://www.w3.org/2001/mstts" xml:lang="zh-TW">
+            <voice name={quoteattr(str(voice_name))}>
+                <prosody rate={quoteattr(str(speaking_rate))}>
+                    <mstts:express-as style="cheerful" styledegree="1.2">
+                        {escape(text)}
+                    </mstts:express-as>
+                </prosody>
+            </voice>
+        </speak>
+        """
+
+
+class AzureTTS:
+    """
+    Azure 語音合成
+    sdk 預設為 azure.cognitiveservices.speech，測試時可傳入提供相同介面的替身
+    (SpeechConfig、SpeechSynthesizer、audio.AudioOutputConfig、audio.PullAudioOutputStream、
+     ResultReason、SpeechSynthesisOutputFormat)
+    """
+    def __init__(self, sdk=None, key=AZURE_SPEECH_KEY, region=AZURE_SPEECH_REGION):
+        if sdk is None:
+            import azure.cognitiveservices.speech as sdk
+        self.sdk = sdk
+        self.key = key
+        self.region = region
+
+    def _config(self, voice_name):
+        speech_config = self.sdk.SpeechConfig(subscription=self.key, region=self.region)
+        speech_config.speech_synthesis_voice_name = voice_name
+        speech_config.set_speech_synthesis_output_format(
+            self.sdk.SpeechSynthesisOutputFormat.Audio16Khz32KBitRateMonoMp3)
+        return speech_config
+
+    def synthesize_to_file(self, text, voice_name, speaking_rate, file_path):
+        """將語音寫入 file_path，成功回傳 True"""
+        audio_config = self.sdk.audio.AudioOutputConfig(filename=file_path)
+        synthesizer = self.sdk.SpeechSynthesizer(speech_config=self._config(voice_name),
+                                                 audio_config=audio_config)
+        result = synthesizer.speak_ssml_async(build_ssml(text, voice_name, speaking_rate)).get()
+        # 釋放合成器，確保檔案寫入完成
+        del synthesizer
+        if result.reason != self.sdk.ResultReason.SynthesizingAudioCompleted:
+            logger.error(f"語音合成失敗: {result.reason}")
+            return False
+        return True
+
+    def stream(self, text, voice_name, speaking_rate, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        合成到記憶體中的 PullAudioOutputStream，邊合成邊產生 MP3 片段
+        不寫入磁碟；合成失敗時拋出 TTSError (已送出的片段無法收回)
+        """
+        pull_stream = self.sdk.audio.PullAudioOutputStream()
+        audio_config = self.sdk.audio.AudioOutputConfig(stream=pull_stream)
+        synthesizer = self.sdk.SpeechSynthesizer(speech_config=self._config(voice_name),
+                                                 audio_config=audio_config)
+        future = synthesizer.speak_ssml_async(build_ssml(text, voice_name, speaking_rate))
+        try:
+            buffer = bytes(chunk_size)
+            while True:
+                # read() 會等到有資料或合成結束，回傳 0 代表結束
+                size = pull_stream.read(buffer)
+                if size == 0:
+                    break
+                yield buffer[:size]
+            result = future.get()
+            if result.reason != self.sdk.ResultReason.SynthesizingAudioCompleted:
+                raise TTSError(f"語音合成失敗: {result.reason}")
+        finally:
+            del synthesizer
+
+
+_engine = None
+
+def get_tts_engine():
+    global _engine
+    if _engine is None:
+        _engine = AzureTTS()
+    return _engine
+
+
+def set_tts_engine(engine):
+    """替換語音合成引擎 (測試時注入使用假 SDK 的 AzureTTS)"""
+    global _engine
+    _engine = engine
@@ -0,0 +1,149 @@
+import atexit
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# LLM 回應快取設定
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 1000))      # 每個快取最多筆數
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 86400))       # 有效秒數
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR")                   # 設定後會保存到磁碟，重啟後沿用
+LLM_CACHE_SAVE_EVERY = 50                                    # 每新增幾筆寫入一次磁碟
+
+# 空白與標點 (CJK 文字屬於 \w，不會被移除)
+_NOISE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_text(text):
+    """
+    正規化使用者語句作為快取鍵
+    全形/半形統一 (NFKC)、英文轉小寫、移除空白與標點
+    例如「我要 珍珠奶茶！」與「我要珍珠奶茶」視為相同
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return _NOISE.sub("", text)
+
+
+def version_of(*parts):
+    """以提示詞、菜單等內容計算版本，內容改變時快取自動失效"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+class ResponseCache:
+    """
+    以正規化語句為鍵的 LRU + TTL 快取
+    記錄命中率與因命中而省下的 API 延遲
+    """
+    def __init__(self, name, version, max_size=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL, cache_dir=LLM_CACHE_DIR):
+        self.name = name
+        self.version = version
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = os.path.join(cache_dir, f"{name}.json") if cache_dir else None
+        self._entries = OrderedDict()  # key -> (寫入時間, 回應, 原始延遲秒數)
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        if self.path:
+            self._load()
+            atexit.register(self.save)
+
+    def set_version(self, version):
+        """提示詞或菜單改變時呼叫，版本不同會清空快取"""
+        with self._lock:
+            if version == self.version:
+                return
+            self.version = version
+            self._entries.clear()
+            self._unsaved += 1
+        print(f"{self.name} 快取已失效 (版本 {version})")
+
+    def get(self, text):
+        key = normalize_text(text)
+        if not key:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += entry[2]
+                # 回傳副本，避免呼叫端修改快取內容
+                return copy.deepcopy(entry[1])
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, text, value, latency=0.0):
+        key = normalize_text(text)
+        if not key:
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), value, latency)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= LLM_CACHE_SAVE_EVERY
+        if should_save:
+            self.save()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "version": self.version,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3)
+            }
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"讀取 {self.name} 快取失敗: {e}")
+            return
+        if data.get("version") != self.version:
+            print(f"{self.name} 快取版本不同，忽略磁碟上的舊資料")
+            return
+        now = time.time()
+        for key, created, value, latency in data.get("entries", []):
+            if now - created <= self.ttl:
+                self._entries[key] = (created, value, latency)
+        print(f"已載入 {self.name} 快取 {len(self._entries)} 筆")
+
+    def save(self):
+        """寫入磁碟 (先寫暫存檔再取代，避免寫到一半的檔案)"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "version": self.version,
+                "entries": [[key, created, value, latency]
+                            for key, (created, value, latency) in self._entries.items()]
+            }
+            self._unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"寫入 {self.name} 快取失敗: {e}")
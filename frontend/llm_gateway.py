@@ -0,0 +1,356 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from dotenv import load_dotenv
+from openai import (OpenAI, AsyncOpenAI, APIConnectionError, APITimeoutError,
+                    InternalServerError, RateLimitError)
+
+load_dotenv()
+
+# LLM 呼叫設定
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 15))                    # 單次呼叫的預設期限 (秒)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))               # 逾時/連線錯誤/429/5xx 的重試次數
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))       # 同時進行的呼叫數上限
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", 5))   # 連續失敗幾次後暫停呼叫
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", 30))        # 暫停幾秒後再試一次
+LLM_BASE_URL = os.getenv("OPENAI_BASE_URL")                          # 可指向 tools/mock_llm_server.py
+
+# 可重試的錯誤
+RETRYABLE_ERRORS = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+
+
+class LLMUnavailableError(Exception):
+    """LLM 暫時無法使用 (斷路器開啟、等待逾時或超過期限)，呼叫端應改用備援方式"""
+
+
+class CircuitBreaker:
+    """
+    連續失敗達門檻後開啟，期間直接拒絕呼叫
+    經過 reset_timeout 後放行一次試探，成功則關閉，失敗則重新計時
+    allow() 放行試探時回傳 TRIAL，試探沒有結果就結束 (等待名額逾時、串流被中斷、
+    非暫時性錯誤) 時須呼叫 cancel_trial()
+    """
+    TRIAL = "trial"
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, reset_timeout=LLM_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial:
+                return False
+            self._trial = True
+            return self.TRIAL
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def cancel_trial(self):
+        """放棄這次試探 (不影響開關狀態)，下一個呼叫可以再試探"""
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class LLMMetrics:
+    """呼叫次數、錯誤、延遲與 token 用量"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.retries = 0
+            self.rejected = 0
+            self.latency_total = 0.0
+            self.latency_max = 0.0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+
+    def record_call(self, latency, usage=None):
+        with self._lock:
+            self.calls += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            if usage is not None:
+                self.prompt_tokens += usage.prompt_tokens or 0
+                self.completion_tokens += usage.completion_tokens or 0
+
+    def record(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "avg_latency": round(self.latency_total / self.calls, 4) if self.calls else 0.0,
+                "max_latency": round(self.latency_max, 4),
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens
+            }
+
+
+class LLMGateway:
+    """
+    共用的 OpenAI 呼叫入口
+    complete()/stream() 為同步介面 (Flask 使用)，acomplete() 為非同步介面
+    每次呼叫都有期限、同時呼叫數上限、退避重試，連續失敗時由斷路器直接拒絕
+    """
+    def __init__(self, api_key=None, base_url=LLM_BASE_URL, timeout=LLM_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES, max_concurrency=LLM_MAX_CONCURRENCY):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        # 重試由本模組處理，關閉 SDK 內建的重試
+        self.client = None
+        if self.api_key:
+            self.client = OpenAI(api_key=self.api_key, base_url=base_url, timeout=timeout, max_retries=0)
+        self._async_client = None
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore (loop 結束後自動移除)
+        self.breaker = CircuitBreaker()
+        self.metrics = LLMMetrics()
+
+    @property
+    def available(self):
+        return bool(self.api_key)
+
+    def _check_breaker(self):
+        """回傳這次呼叫是否為斷路器的試探"""
+        if not self.available:
+            raise LLMUnavailableError("未設置 OPENAI_API_KEY")
+        allowed = self.breaker.allow()
+        if not allowed:
+            self.metrics.record("rejected")
+            raise LLMUnavailableError("LLM 斷路器開啟中，暫停呼叫")
+        return allowed == CircuitBreaker.TRIAL
+
+    def _end_trial(self, trial):
+        # 已記錄成功/失敗時 _trial 早已清除；否則 (等待逾時、串流中斷等) 放棄這次試探，避免斷路器永遠無法再試探
+        if trial:
+            self.breaker.cancel_trial()
+
+    @staticmethod
+    def _remaining(deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMUnavailableError("LLM 呼叫超過期限")
+        return remaining
+
+    def _backoff(self, attempt, deadline):
+        """指數退避 + 隨機抖動，不超過剩餘期限"""
+        delay = min(0.5 * 2 ** attempt, 4) * random.uniform(0.5, 1.0)
+        return min(delay, max(deadline - time.monotonic(), 0))
+
+    def _acquire_slot(self, deadline):
+        """取得一個呼叫名額，每次嘗試各自取得，退避等待期間不佔用"""
+        if not self._slots.acquire(timeout=self._remaining(deadline)):
+            self.metrics.record("rejected")
+            raise LLMUnavailableError("等待 LLM 呼叫名額逾時")
+
+    def complete(self, messages, timeout=None, **params):
+        """同步呼叫 chat completion，timeout 為整體期限 (包含等待與重試)"""
+        trial = self._check_breaker()
+        try:
+            deadline = time.monotonic() + (timeout or self.timeout)
+            attempt = 0
+            while True:
+                self._acquire_slot(deadline)
+                start = time.perf_counter()
+                try:
+                    completion = self.client.with_options(timeout=self._remaining(deadline)) \
+                        .chat.completions.create(messages=messages, **params)
+                except RETRYABLE_ERRORS:
+                    self.metrics.record("errors")
+                    if attempt >= self.max_retries or deadline - time.monotonic() <= 0:
+                        self.breaker.record_failure()
+                        raise
+                except LLMUnavailableError:
+                    self.breaker.record_failure()
+                    raise
+                except Exception:
+                    # 參數錯誤等非暫時性錯誤不重試；不代表服務狀態，斷路器不計成功也不計失敗
+                    self.metrics.record("errors")
+                    raise
+                else:
+                    self.metrics.record_call(time.perf_counter() - start, completion.usage)
+                    self.breaker.record_success()
+                    return completion
+                finally:
+                    self._slots.release()
+                attempt += 1
+                self.metrics.record("retries")
+                time.sleep(self._backoff(attempt, deadline))
+        finally:
+            self._end_trial(trial)
+
+    def stream(self, messages, timeout=None, **params):
+        """
+        同步串流呼叫，逐一產生 chunk
+        只在收到第一個 chunk 之前重試，開始輸出後的錯誤直接拋出
+        呼叫端中途停止讀取 (關閉 generator) 時關閉上游連線並歸還名額
+        """
+        trial = self._check_breaker()
+        try:
+            deadline = time.monotonic() + (timeout or self.timeout)
+            attempt = 0
+            while True:
+                self._acquire_slot(deadline)
+                start = time.perf_counter()
+                chunks = None
+                try:
+                    chunks = self.client.with_options(timeout=self._remaining(deadline)) \
+                        .chat.completions.create(messages=messages, stream=True,
+                                                 stream_options={"include_usage": True}, **params)
+                except RETRYABLE_ERRORS:
+                    self.metrics.record("errors")
+                    if attempt >= self.max_retries or deadline - time.monotonic() <= 0:
+                        self.breaker.record_failure()
+                        raise
+                except LLMUnavailableError:
+                    self.breaker.record_failure()
+                    raise
+                except Exception:
+                    self.metrics.record("errors")
+                    raise
+                finally:
+                    if chunks is None:
+                        self._slots.release()
+                if chunks is not None:
+                    break
+                attempt += 1
+                self.metrics.record("retries")
+                time.sleep(self._backoff(attempt, deadline))
+
+            # 串流期間持有名額，結束、出錯或被中斷時才歸還
+            try:
+                usage = None
+                try:
+                    for chunk in chunks:
+                        if chunk.usage is not None:
+                            usage = chunk.usage
+                        yield chunk
+                except RETRYABLE_ERRORS:
+                    self.metrics.record("errors")
+                    self.breaker.record_failure()
+                    raise
+                self.metrics.record_call(time.perf_counter() - start, usage)
+                self.breaker.record_success()
+            finally:
+                chunks.close()
+                self._slots.release()
+        finally:
+            self._end_trial(trial)
+
+    def _get_async_client(self):
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                             timeout=self.timeout, max_retries=0)
+        return self._async_client
+
+    def _get_async_slots(self):
+        # asyncio.Semaphore 綁定在 event loop 上，每個 loop 各自一個
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_slots:
+            self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._async_slots[loop]
+
+    async def _aacquire_slot(self, deadline):
+        """_acquire_slot 的非同步版本"""
+        try:
+            await asyncio.wait_for(self._get_async_slots().acquire(), self._remaining(deadline))
+        except asyncio.TimeoutError:
+            self.metrics.record("rejected")
+            raise LLMUnavailableError("等待 LLM 呼叫名額逾時")
+
+    async def acomplete(self, messages, timeout=None, **params):
+        """非同步呼叫 chat completion，規則與 complete() 相同"""
+        trial = self._check_breaker()
+        try:
+            deadline = time.monotonic() + (timeout or self.timeout)
+            client = self._get_async_client()
+            attempt = 0
+            while True:
+                await self._aacquire_slot(deadline)
+                start = time.perf_counter()
+                try:
+                    completion = await client.with_options(timeout=self._remaining(deadline)) \
+                        .chat.completions.create(messages=messages, **params)
+                except RETRYABLE_ERRORS:
+                    self.metrics.record("errors")
+                    if attempt >= self.max_retries or deadline - time.monotonic() <= 0:
+                        self.breaker.record_failure()
+                        raise
+                except LLMUnavailableError:
+                    self.breaker.record_failure()
+                    raise
+                except Exception:
+                    self.metrics.record("errors")
+                    raise
+                else:
+                    self.metrics.record_call(time.perf_counter() - start, completion.usage)
+                    self.breaker.record_success()
+                    return completion
+                finally:
+                    self._get_async_slots().release()
+                attempt += 1
+                self.metrics.record("retries")
+                await asyncio.sleep(self._backoff(attempt, deadline))
+        finally:
+            self._end_trial(trial)
+
+    def stats(self):
+        return {
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "max_concurrency": self.max_concurrency,
+            **self.metrics.snapshot()
+        }
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_gateway():
+    """OrderAnalyzer 與 ChatAnalyzer 共用同一個 gateway (共用名額、斷路器與統計)"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
@@ -1,8 +1,33 @@
-from openai import OpenAI
 import os
 from dotenv import load_dotenv
 import json
-import re
+import time
+from .order_parser import OrderParser, DRINKS_MENU, SIZES, ICE_OPTIONS, SUGAR_OPTIONS, QUANTITY_KEYWORDS
+from .llm_cache import ResponseCache, version_of
+from .llm_gateway import get_gateway
+from codes.menu_index import menu_index
+
+# 系統提示詞
+ORDER_SYSTEM_PROMPT = """你是一位飲料店的點餐人員，請分析客人的點餐需求並回傳 JSON 格式的訂單內容。
+            規則：
+            1. 請分析出飲料名稱、大小、甜度、冰量和數量
+            2. sugar只能是(全糖, 半糖, 微糖, 無糖)
+            3. ice只能是(正常冰, 少冰, 微冰, 去冰, 熱飲, 溫)
+            4. size只能是(大杯, 小杯)，預設是大杯
+            5. quantity是數量，預設是1
+            6. 直接回傳JSON格式，不要加入markdown標記
+            
+            回傳格式範例：
+            [
+                {
+                    "drink_name": "珍珠奶茶",
+                    "size": "大杯",
+                    "sugar": "半糖",
+                    "ice": "少冰",
+                    "quantity": 1
+                }
+            ]"""
+
 
 class OrderAnalyzer:
     def __init__(self):
@@ -14,92 +39,72 @@ class OrderAnalyzer:
         if not self.api_key:
             print("警告: 未設置 OPENAI_API_KEY 環境變數，將使用簡單分析")
             
-        if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
+        # 共用的 LLM 呼叫入口 (期限、重試、同時呼叫數上限、斷路器)
+        self.llm = get_gateway()
         
-        # 飲料菜單
-        self.drinks_menu = [
-            '珍珠奶茶', '紅茶', '綠茶', '奶茶', '青茶', '烏龍茶', '鮮奶茶',
-            '冬瓜茶', '檸檬茶', '蜂蜜檸檬', '梅子綠茶', '冬瓜檸檬', '普洱茶',
-            '奶綠', '烏龍奶茶', '焦糖奶茶', '波霸奶茶', '椰果奶茶', '蜂蜜奶茶',
-            '仙草奶茶', '布丁奶茶', '巧克力牛奶', '美式咖啡', '卡布奇諾', 
-            '拿鐵咖啡', '摩卡咖啡', '烏龍拿鐵', '紅茶咖啡', '牛奶咖啡'
-        ]
+        # 飲料菜單 (前後台共用的菜單索引，資料庫載入前使用預設菜單)
+        self.menu = menu_index
+        if not self.menu.names:
+            self.menu.replace_all(DRINKS_MENU)
         
         # 杯型
-        self.sizes = ['大杯', '中杯', '小杯']
+        self.sizes = list(SIZES)
         
         # 冰塊選項
-        self.ice_options = ['正常冰', '少冰', '微冰', '去冰', '熱', '溫']
+        self.ice_options = list(ICE_OPTIONS)
         
         # 甜度選項
-        self.sugar_options = ['全糖', '七分糖', '半糖', '三分糖', '微糖', '無糖']
+        self.sugar_options = list(SUGAR_OPTIONS)
         
         # 數量關鍵詞
-        self.quantity_keywords = {
-            '一': 1, '二': 2, '兩': 2, '三': 3, '四': 4, '五': 5,
-            '六': 6, '七': 7, '八': 8, '九': 9, '十': 10
-        }
+        self.quantity_keywords = dict(QUANTITY_KEYWORDS)
+
+        # 規則式解析器 (信心分數低於門檻時才呼叫 OpenAI)
+        self.parser = OrderParser(sizes=self.sizes, sugar_options=self.sugar_options,
+                                  ice_options=self.ice_options, quantity_keywords=self.quantity_keywords,
+                                  menu_index=self.menu)
+        self.min_confidence = float(os.getenv('ORDER_PARSER_MIN_CONFIDENCE', 0.8))
+
+        # LLM 回應快取 (菜單或提示詞改變時自動失效)
+        self.cache = ResponseCache('order_analyzer', self.cache_version())
+        self.menu.subscribe(lambda index: self.refresh_cache_version())
+
+    @property
+    def drinks_menu(self):
+        return self.menu.names
+
+    def cache_version(self):
+        return version_of(ORDER_SYSTEM_PROMPT, self.drinks_menu, self.sizes,
+                          self.ice_options, self.sugar_options)
+
+    def refresh_cache_version(self):
+        """菜單更新後呼叫，使舊的 LLM 回應失效"""
+        self.cache.set_version(self.cache_version())
 
     def analyze_order(self, text):
-        # 特殊處理：如果文本非常簡短並且是單一飲料名稱
-        for drink in self.drinks_menu:
-            if text.strip() == drink:
-                print(f"處理簡單飲料名稱: {drink}")
-                order_detail = {
-                    'drink_name': drink,
-                    'size': '大杯',  # 默認中杯
-                    'ice': '正常冰',  # 默認正常冰
-                    'sugar': '全糖',  # 默認全糖
-                    'quantity': 1     # 默認1杯
-                }
-                return [order_detail]
-        
-        # 修正純飲料名稱可能的輸入格式 "一杯[飲料名]"
-        if text.startswith('一杯'):
-            for drink in self.drinks_menu:
-                if text == f"一杯{drink}":
-                    print(f"處理簡單訂單: 一杯{drink}")
-                    order_detail = {
-                        'drink_name': drink,
-                        'size': '中杯',
-                        'ice': '正常冰',
-                        'sugar': '全糖',
-                        'quantity': 1
-                    }
-                    return [order_detail]
+        # 先以規則式解析器處理常見說法，信心足夠時不必呼叫 OpenAI
+        parsed = self.parser.parse(text)
+        if parsed.confidence >= self.min_confidence:
+            print(f"規則解析訂單 (信心 {parsed.confidence}): {parsed.items}")
+            return parsed.items
         
         # 檢查是否有 API 金鑰
         if not self.api_key:
             return self.simple_order_analysis(text)
         
+        # 相同 (正規化後) 的語句直接使用快取結果
+        cached = self.cache.get(text)
+        if cached is not None:
+            print(f"快取命中訂單: {cached}")
+            return cached
+        
         # 使用 OpenAI API 分析訂單
         try:
-            # 系統提示詞
-            system_prompt = """你是一位飲料店的點餐人員，請分析客人的點餐需求並回傳 JSON 格式的訂單內容。
-            規則：
-            1. 請分析出飲料名稱、大小、甜度、冰量和數量
-            2. sugar只能是(全糖, 半糖, 微糖, 無糖)
-            3. ice只能是(正常冰, 少冰, 微冰, 去冰, 熱飲, 溫)
-            4. size只能是(大杯, 小杯)，預設是大杯
-            5. quantity是數量，預設是1
-            6. 直接回傳JSON格式，不要加入markdown標記
-            
-            回傳格式範例：
-            [
-                {
-                    "drink_name": "珍珠奶茶",
-                    "size": "大杯",
-                    "sugar": "半糖",
-                    "ice": "少冰",
-                    "quantity": 1
-                }
-            ]"""
-
-            completion = self.client.chat.completions.create(
+            start = time.perf_counter()
+            completion = self.llm.complete(
                 model="gpt-3.5-turbo",
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": ORDER_SYSTEM_PROMPT},
                     {"role": "user", "content": text}
                 ],
                 temperature=0.3
@@ -112,71 +117,25 @@ class OrderAnalyzer:
             if result.startswith('```'):
                 result = result.replace('```json', '').replace('```', '').strip()
             
-            return json.loads(result)
+            items = json.loads(result)
+            self.cache.put(text, items, time.perf_counter() - start)
+            return items
             
         except Exception as e:
             print(f"OpenAI API 錯誤: {str(e)}")
-            # 如果 API 調用失敗，回退到簡單分析
+            # 如果 API 調用失敗或斷路器開啟，回退到簡單分析
             return self.simple_order_analysis(text)
     
     def simple_order_analysis(self, text):
         """簡單的訂單分析方法，用於 API 不可用時"""
         try:
-            # 嘗試找出飲料名稱
-            drink_name = None
-            for drink in self.drinks_menu:
-                if drink in text:
-                    drink_name = drink
-                    break
-            
-            if not drink_name:
+            parsed = self.parser.parse(text)
+            if not parsed.items:
                 return {
                     'status': 'error',
                     'message': '無法識別飲料名稱，請重新點餐。'
                 }
-            
-            # 尋找甜度
-            sugar = '全糖'  # 默認全糖
-            for option in self.sugar_options:
-                if option in text:
-                    sugar = option
-                    break
-            
-            # 尋找冰量
-            ice = '正常冰'  # 默認正常冰
-            for option in self.ice_options:
-                if option in text:
-                    ice = option
-                    break
-            
-            # 尋找大小
-            size = '大杯'  # 默認大杯
-            for option in self.sizes:
-                if option in text:
-                    size = option
-                    break
-            
-            # 尋找數量
-            quantity = 1  # 默認1杯
-            for key, value in self.quantity_keywords.items():
-                if f"{key}杯" in text:
-                    quantity = value
-                    break
-            
-            # 檢查數字
-            number_match = re.search(r'(\d+)\s*杯', text)
-            if number_match:
-                quantity = int(number_match.group(1))
-            
-            order_detail = {
-                'drink_name': drink_name,
-                'size': size,
-                'ice': ice,
-                'sugar': sugar,
-                'quantity': quantity
-            }
-            
-            return [order_detail]
+            return parsed.items
             
         except Exception as e:
             print(f"簡單訂單分析錯誤: {str(e)}")
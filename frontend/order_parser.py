@@ -0,0 +1,252 @@
+import re
+from dataclasses import dataclass, field
+from codes.menu_index import MenuIndex
+
+# 飲料菜單
+DRINKS_MENU = [
+    '珍珠奶茶', '紅茶', '綠茶', '奶茶', '青茶', '烏龍茶', '鮮奶茶',
+    '冬瓜茶', '檸檬茶', '蜂蜜檸檬', '梅子綠茶', '冬瓜檸檬', '普洱茶',
+    '奶綠', '烏龍奶茶', '焦糖奶茶', '波霸奶茶', '椰果奶茶', '蜂蜜奶茶',
+    '仙草奶茶', '布丁奶茶', '巧克力牛奶', '美式咖啡', '卡布奇諾', 
+    '拿鐵咖啡', '摩卡咖啡', '烏龍拿鐵', '紅茶咖啡', '牛奶咖啡'
+]
+
+# 杯型
+SIZES = ['大杯', '中杯', '小杯']
+
+# 冰塊選項
+ICE_OPTIONS = ['正常冰', '少冰', '微冰', '去冰', '熱', '溫']
+
+# 甜度選項
+SUGAR_OPTIONS = ['全糖', '七分糖', '半糖', '三分糖', '微糖', '無糖']
+
+# 數量關鍵詞
+QUANTITY_KEYWORDS = {
+    '一': 1, '二': 2, '兩': 2, '三': 3, '四': 4, '五': 5,
+    '六': 6, '七': 7, '八': 8, '九': 9, '十': 10
+}
+
+# 未指定時的預設值
+DEFAULT_SIZE = '大杯'
+DEFAULT_SUGAR = '全糖'
+DEFAULT_ICE = '正常冰'
+
+# 冰量關鍵字正規化為資料庫轉換 (convert_order_date_for_db) 認得的寫法
+ICE_NORMALIZE = {'熱': '熱飲'}
+
+# 分隔不同品項的詞
+SEPARATORS = ['，', ',', '、', '。', '；', ';', '和', '跟', '還有', '另外', '然後', '再來', '再']
+
+# 點餐常見的口語，不影響訂單內容
+FILLER_WORDS = [
+    '我要', '我想要', '我想喝', '想喝', '給我', '幫我', '麻煩', '請', '來', '點', '要',
+    '杯', '份', '的', '喔', '哦', '啊', '呢', '吧', '好', '了', '謝謝', '一下', '就'
+]
+
+# 出現這些詞代表語意較複雜 (否定、修改、取消、套用到多個品項)，交給 LLM 判斷
+COMPLEX_WORDS = ['不要', '不用', '不加', '別', '換', '改', '取消', '除了', '還是', '或', '都', '全部', '嗎', '？', '?']
+
+# 數字後面接「杯、份、或杯型」才視為數量 (中文數字可為十五、二十、二十五等複合寫法)
+QUANTITY_PATTERN = re.compile(r'(\d+|[一二兩三四五六七八九十]+)(?=\s*(?:杯|份|大杯|中杯|小杯))')
+
+# 實際可寫入資料庫的杯型
+VALID_SIZES = {'大杯', '小杯'}
+
+# convert_order_date_for_db 能正確轉換的甜度與冰量，其他寫法 (三分糖、溫) 會被轉成全糖/正常冰，交給 LLM 處理
+VALID_SUGARS = {'全糖', '七分糖', '半糖', '微糖', '無糖'}
+VALID_ICES = {'正常冰', '少冰', '微冰', '去冰', '熱飲'}
+
+
+def parse_chinese_number(raw, digits=QUANTITY_KEYWORDS):
+    """
+    中文數字轉為整數，支援 X、十、十X、X十、X十Y (兩 = 二)
+    例如 十五 -> 15、二十 -> 20、二十五 -> 25；無法解析 (例如 一二、十十) 時回傳 None
+    """
+    def digit(char):
+        value = digits.get(char)
+        return value if value is not None and 1 <= value <= 9 else None
+
+    if '十' not in raw:
+        return digit(raw) if len(raw) == 1 else None
+    tens, _, ones = raw.partition('十')
+    if len(tens) > 1 or len(ones) > 1:
+        return None
+    tens_value = digit(tens) if tens else 1
+    ones_value = digit(ones) if ones else 0
+    if tens_value is None or ones_value is None:
+        return None
+    return tens_value * 10 + ones_value
+
+
+class KeywordTrie:
+    """
+    關鍵字字典樹，由左至右掃描並取最長匹配
+    例如「珍珠奶茶」優先於「奶茶」，掃描成本與文字長度成正比，與菜單大小無關
+    """
+    def __init__(self):
+        self.root = {}
+
+    def add(self, word, kind, value=None):
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = (kind, value if value is not None else word)
+
+    def longest_match(self, text, start):
+        """回傳從 start 開始最長的關鍵字 (結束位置, 類型, 值)，沒有則回傳 None"""
+        node = self.root
+        match = None
+        for i in range(start, len(text)):
+            node = node.get(text[i])
+            if node is None:
+                break
+            if None in node:
+                match = (i + 1,) + node[None]
+        return match
+
+
+@dataclass
+class ParseResult:
+    items: list = field(default_factory=list)
+    confidence: float = 0.0
+
+
+class OrderParser:
+    """
+    規則式點餐解析器
+    支援多品項 (例如：兩杯大杯珍珠奶茶半糖少冰，一杯紅茶去冰)，並回傳信心分數
+    信心分數低時才需要呼叫 LLM
+    飲料名稱由 MenuIndex 比對 (含別名)，菜單更新後不必重建解析器
+    """
+    def __init__(self, drinks=DRINKS_MENU, sizes=SIZES, sugar_options=SUGAR_OPTIONS,
+                 ice_options=ICE_OPTIONS, quantity_keywords=QUANTITY_KEYWORDS, menu_index=None):
+        self.quantity_keywords = quantity_keywords
+        self.menu = menu_index if menu_index is not None else MenuIndex(drinks)
+        self.trie = KeywordTrie()
+        for word in FILLER_WORDS:
+            self.trie.add(word, 'filler')
+        for word in SEPARATORS:
+            self.trie.add(word, 'separator')
+        for word in COMPLEX_WORDS:
+            self.trie.add(word, 'complex')
+        for size in sizes:
+            self.trie.add(size, 'size')
+        for sugar in sugar_options:
+            self.trie.add(sugar, 'sugar')
+        for ice in ice_options:
+            self.trie.add(ice, 'ice', ICE_NORMALIZE.get(ice, ice))
+
+    def tokenize(self, text):
+        """將文字切成 (開始, 結束, 類型, 值)，無法辨識的字元類型為 None"""
+        quantities = {}
+        for match in QUANTITY_PATTERN.finditer(text):
+            raw = match.group(1)
+            # 無法解析的中文數字值為 None，解析時視為衝突 (交給 LLM)
+            value = int(raw) if raw.isdigit() else parse_chinese_number(raw, self.quantity_keywords)
+            quantities[match.start()] = (match.end(), value)
+
+        tokens = []
+        pos = 0
+        while pos < len(text):
+            if text[pos].isspace():
+                tokens.append((pos, pos + 1, 'separator', text[pos]))
+                pos += 1
+                continue
+            if pos in quantities:
+                end, value = quantities[pos]
+                tokens.append((pos, end, 'quantity', value))
+                pos = end
+                continue
+            match = self.trie.longest_match(text, pos)
+            # 飲料名稱與關鍵字取較長者，同長時以飲料為準
+            drink = self.menu.longest_match(text, pos)
+            if drink and (not match or drink[0] >= match[0]):
+                match = (drink[0], 'drink', drink[1])
+            if match:
+                end, kind, value = match
+                tokens.append((pos, end, kind, value))
+                pos = end
+            else:
+                tokens.append((pos, pos + 1, None, text[pos]))
+                pos += 1
+        return tokens
+
+    def parse(self, text):
+        text = (text or '').strip()
+        if not text:
+            return ParseResult()
+
+        tokens = self.tokenize(text)
+        items = []
+        current = None   # 目前品項 (已出現飲料名稱)
+        pending = {}     # 尚未對應到飲料的屬性 (寫在飲料名稱之前)
+        conflicts = 0
+        unknown_chars = 0
+        complex_words = 0
+        content_chars = 0
+
+        for start, end, kind, value in tokens:
+            if kind != 'separator':
+                content_chars += end - start
+
+            if kind is None:
+                unknown_chars += end - start
+            elif kind == 'complex':
+                complex_words += 1
+            elif kind == 'separator':
+                # 分隔詞之後的屬性屬於下一個品項
+                current = None
+            elif kind == 'drink':
+                current = {'drink_name': value}
+                current.update(pending)
+                pending = {}
+                items.append(current)
+            elif kind in ('size', 'sugar', 'ice', 'quantity'):
+                if value is None:
+                    conflicts += 1
+                    continue
+                if current is not None and kind not in current:
+                    current[kind] = value
+                elif kind in pending:
+                    conflicts += 1
+                    pending[kind] = value
+                else:
+                    pending[kind] = value
+
+        # 句尾剩下的屬性補到最後一個品項 (例如：珍珠奶茶，少冰)
+        if pending and items:
+            for kind, value in pending.items():
+                if kind in items[-1]:
+                    conflicts += 1
+                else:
+                    items[-1][kind] = value
+        elif pending:
+            conflicts += 1
+
+        if not items:
+            return ParseResult()
+
+        order_items = []
+        for item in items:
+            order_items.append({
+                'drink_name': item['drink_name'],
+                'size': item.get('size', DEFAULT_SIZE),
+                'ice': item.get('ice', DEFAULT_ICE),
+                'sugar': item.get('sugar', DEFAULT_SUGAR),
+                'quantity': item.get('quantity', 1)
+            })
+            # 資料庫無法正確保存的選項，交給 LLM 確認
+            if order_items[-1]['size'] not in VALID_SIZES:
+                conflicts += 1
+            if order_items[-1]['sugar'] not in VALID_SUGARS or order_items[-1]['ice'] not in VALID_ICES:
+                conflicts += 1
+
+        # 信心分數：可辨識文字的比例，遇到否定/修改語句或屬性衝突時大幅降低
+        coverage = 1 - unknown_chars / max(content_chars, 1)
+        confidence = coverage
+        if complex_words:
+            confidence = min(confidence, 0.3)
+        confidence -= 0.3 * conflicts
+        confidence = round(max(0.0, min(1.0, confidence)), 2)
+
+        return ParseResult(items=order_items, confidence=confidence)
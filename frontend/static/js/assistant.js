@@ -6,6 +6,31 @@
 (function() {
     // 確保不重複初始化
     if (window.assistant) return;
+
+    /**
+     * 取得此頁面的對話 session id (重新整理頁面後沿用)
+     */
+    function getChatSessionId() {
+        let sessionId = sessionStorage.getItem('chatSessionId');
+        if (!sessionId) {
+            sessionId = Date.now().toString(36) + Math.random().toString(36).slice(2, 10);
+            sessionStorage.setItem('chatSessionId', sessionId);
+        }
+        return sessionId;
+    }
+    
+    /**
+     * 取得串流聊天使用的 Socket.IO 連線 (同一個前台伺服器)
+     */
+    let chatSocket = null;
+    function getChatSocket() {
+        if (!chatSocket && typeof io === 'function') {
+            chatSocket = io();
+        }
+        return chatSocket;
+    }
+    // 預先連線，第一句話就能使用串流
+    getChatSocket();
     
     // 在等待模塊版本的同時，初始化一個簡單版本
     const assistant = {
@@ -310,6 +335,82 @@
             this.processChat(text);
         },
         
+        /**
+         * 送出聊天內容，Socket.IO 已連線時使用串流回覆，否則使用 /analyze_chat
+         * @param {string} text 用戶輸入
+         */
+        requestChat: async function(text) {
+            const socket = getChatSocket();
+            let streamId;
+            if (socket && socket.connected) {
+                try {
+                    return await this.requestChatStream(socket, text);
+                } catch (error) {
+                    console.warn('串流回覆失敗，改用一般請求:', error);
+                    // 伺服器可能仍在處理這次串流，帶上 stream_id 取回同一個結果，避免重複呼叫
+                    streamId = error.streamId;
+                }
+            }
+            
+            const response = await fetch('/analyze_chat', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ text: text, session_id: getChatSessionId(), stream_id: streamId })
+            });
+            return await response.json();
+        },
+        
+        /**
+         * 串流聊天：回覆文字邊產生邊顯示，完成後回傳完整結果 (與 /analyze_chat 格式相同)
+         * @param {object} socket Socket.IO 連線
+         * @param {string} text 用戶輸入
+         */
+        requestChatStream: function(socket, text) {
+            const streamId = Date.now().toString(36) + Math.random().toString(36).slice(2, 8);
+            const chatMessages = document.getElementById('chatMessages');
+            let bubble = null;
+            
+            return new Promise((resolve, reject) => {
+                const cleanup = () => {
+                    clearTimeout(timer);
+                    socket.off('chat_reply_delta', onDelta);
+                    socket.off('chat_reply_done', onDone);
+                    // 暫時顯示的文字由完整回覆取代 (包含語音播放)
+                    if (bubble) bubble.remove();
+                };
+                const onDelta = (data) => {
+                    if (data.stream_id !== streamId || !chatMessages) return;
+                    if (!bubble) {
+                        bubble = document.createElement('div');
+                        bubble.className = 'message assistant streaming';
+                        bubble.appendChild(document.createElement('div')).className = 'message-content';
+                        chatMessages.appendChild(bubble);
+                    }
+                    bubble.firstChild.textContent += data.delta;
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                };
+                const onDone = (data) => {
+                    if (data.stream_id !== streamId) return;
+                    cleanup();
+                    resolve(data);
+                };
+                const timer = setTimeout(() => {
+                    cleanup();
+                    const error = new Error('串流回覆逾時');
+                    error.streamId = streamId;
+                    reject(error);
+                }, 30000);
+                
+                socket.on('chat_reply_delta', onDelta);
+                socket.on('chat_reply_done', onDone);
+                socket.emit('analyze_chat', {
+                    text: text,
+                    session_id: getChatSessionId(),
+                    stream_id: streamId
+                });
+            });
+        },
+        
         /**
          * 處理聊天
          * @param {string} text 用戶輸入
@@ -321,13 +422,7 @@
                 console.log('處理用戶輸入:', text);
                 
                 // 所有用戶輸入都交給後端處理
-                const response = await fetch('/analyze_chat', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ text: text })
-                });
-                
-                const result = await response.json();
+                const result = await this.requestChat(text);
                 console.log('OpenAI 完整回應:', result);
                 
                 // 根據後端判斷的意圖處理
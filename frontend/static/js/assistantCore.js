@@ -4,6 +4,18 @@
 import orderCore from './orderCore.js';
 import voiceManager from './voiceManager.js';
 
+/**
+ * 取得此頁面的對話 session id (重新整理頁面後沿用)
+ */
+function getChatSessionId() {
+    let sessionId = sessionStorage.getItem('chatSessionId');
+    if (!sessionId) {
+        sessionId = Date.now().toString(36) + Math.random().toString(36).slice(2, 10);
+        sessionStorage.setItem('chatSessionId', sessionId);
+    }
+    return sessionId;
+}
+
 class AssistantCore {
     constructor() {
         console.log('初始化助手核心...');
@@ -436,7 +448,7 @@ class AssistantCore {
             const response = await fetch('/analyze_chat', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ text: text })
+                body: JSON.stringify({ text: text, session_id: getChatSessionId() })
             });
             
             const result = await response.json();
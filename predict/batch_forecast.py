@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from predict.model_registry import load_model
+from predict.sales_pred.drink_candidates import get_drink_candidates
+from predict.total_pred.predict_total_sales import WEATHER_MAPPING
+
+# 兩個模型的特徵欄位 (順序與訓練時相同)
+TOTAL_FEATURES = ["weather_status", "weather_temperature", "weekday", "month", "day_of_year"]
+DRINK_FEATURES = ["drink_name", "ice", "weather_status", "weather_temperature", "day_of_year", "weekday", "daily_total_sales"]
+
+
+def build_scenarios(dates, weathers, temperatures):
+    """
+    將 (日期, 天氣, 氣溫) 陣列整理成情境表，純量會廣播成相同長度
+    例如 build_scenarios("2025-03-20", "sunny", range(10, 35)) 為同一天 25 種氣溫
+    """
+    dates, weathers, temperatures = np.broadcast_arrays(
+        np.asarray(dates, dtype=object), np.asarray(weathers, dtype=object), np.asarray(temperatures))
+    scenarios = pd.DataFrame({
+        "date": pd.to_datetime(dates.ravel()),
+        "weather": pd.Series(weathers.ravel(), dtype=str).str.lower(),
+        "temperature": temperatures.ravel()
+    })
+    unknown = sorted(set(scenarios["weather"]) - set(WEATHER_MAPPING))
+    if unknown:
+        raise ValueError(f"未知的天氣類型: {unknown}，請使用 {list(WEATHER_MAPPING.keys())}")
+    return scenarios
+
+
+def build_total_features(scenarios):
+    """一次建立所有情境的總銷量特徵 (與 Pred_Total_Sales.process_features 相同)"""
+    return pd.DataFrame({
+        "weather_status": scenarios["weather"].map(WEATHER_MAPPING).to_numpy(),
+        "weather_temperature": scenarios["temperature"].to_numpy(),
+        "weekday": scenarios["date"].dt.weekday.to_numpy(),
+        "month": scenarios["date"].dt.month.to_numpy(),
+        "day_of_year": scenarios["date"].dt.dayofyear.to_numpy()
+    })[TOTAL_FEATURES]
+
+
+def build_drink_features(scenarios, daily_total_sales, candidates, categories):
+    """
+    所有情境 × 所有 (飲料, 冰塊) 候選組合的特徵 (與 Pred_Sales.process_features 相同)
+    以類別代碼 repeat / tile 展開，不逐情境複製 DataFrame
+    """
+    n, m = len(scenarios), len(candidates)
+    repeat = lambda values: np.repeat(np.asarray(values), m)
+    return pd.DataFrame({
+        "scenario": repeat(np.arange(n)),
+        "drink_name": pd.Categorical.from_codes(np.tile(candidates["drink_name"].cat.codes.to_numpy(), n),
+                                                categories=candidates["drink_name"].cat.categories),
+        "ice": pd.Categorical.from_codes(np.tile(candidates["ice"].cat.codes.to_numpy(), n),
+                                         categories=candidates["ice"].cat.categories),
+        "weather_status": pd.Categorical(repeat(scenarios["weather"]), categories=categories["weather_status"]),
+        "weather_temperature": repeat(scenarios["temperature"]),
+        "day_of_year": repeat(scenarios["date"].dt.dayofyear),
+        "weekday": repeat(scenarios["date"].dt.weekday),
+        "daily_total_sales": repeat(daily_total_sales)
+    })
+
+
+class BatchForecaster:
+    """
+    批次預測：多個日期 / 天氣 / 氣溫情境一次建立特徵，每個模型只呼叫一次 predict
+    結果與逐筆使用 Pred_Total_Sales + Pred_Sales 相同
+    """
+    def __init__(self, total_model_filename, sales_model_filename, csv_filename=None):
+        self.total_model_filename = total_model_filename
+        self.sales_model_filename = sales_model_filename
+        self.csv_filename = csv_filename
+
+    def forecast_totals(self, dates, weathers, temperatures):
+        """回傳情境表，附加 daily_total_sales (預測總杯數)"""
+        scenarios = build_scenarios(dates, weathers, temperatures)
+        model = load_model(self.total_model_filename)
+        predicted = model.predict(build_total_features(scenarios))
+        scenarios["daily_total_sales"] = np.round(predicted).astype(int)
+        return scenarios
+
+    def forecast(self, dates, weathers, temperatures):
+        """
+        回傳整理好的預測表，每個 (情境, 飲料, 冰塊) 一列：
+        scenario, date, weather, temperature, daily_total_sales, drink_name, ice, predicted_sales
+        """
+        scenarios = self.forecast_totals(dates, weathers, temperatures)
+        candidates, categories = get_drink_candidates(self.sales_model_filename, self.csv_filename)
+        features = build_drink_features(scenarios, scenarios["daily_total_sales"], candidates, categories)
+
+        model = load_model(self.sales_model_filename)
+        # 避免負數銷量
+        predicted = np.maximum(model.predict(features[DRINK_FEATURES]), 0)
+
+        result = scenarios.iloc[features["scenario"]].reset_index(drop=True)
+        result.insert(0, "scenario", features["scenario"].to_numpy())
+        result["drink_name"] = features["drink_name"]
+        result["ice"] = features["ice"]
+        result["predicted_sales"] = predicted
+        return result
+
+
+def top_drinks(forecast, n=6, hot_below=22):
+    """
+    每個情境銷量前 n 名的飲料 (與 Pred_Sales.get_top_6_sales_by_condition 相同的規則：
+    氣溫 >= hot_below 時只看冷飲，否則只看熱飲)，回傳 {scenario: [飲料...]}
+    """
+    is_hot = forecast["ice"] == "hot"
+    filtered = forecast[np.where(forecast["temperature"] >= hot_below, ~is_hot, is_hot)]
+    grouped = filtered.groupby(["scenario", "drink_name"], observed=False)["predicted_sales"].sum()
+    ranked = grouped.reset_index().sort_values(["scenario", "predicted_sales"], ascending=[True, False], kind="stable")
+    return {scenario: list(group["drink_name"].head(n))
+            for scenario, group in ranked.groupby("scenario", sort=True)}
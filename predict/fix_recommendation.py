@@ -3,6 +3,8 @@ import pandas as pd
 import lightgbm as lgb
 import joblib
 from sklearn.model_selection import train_test_split
+from predict.sales_pred.drink_candidates import save_drink_candidates, candidates_filename
+from predict.tree_export import export_model
 
 def train_and_fix_models():
     """訓練模型並修復列名問題"""
@@ -79,6 +81,8 @@ def train_total_model(df):
     output_path = "predict/total_pred/sales_total_model_v2_2025_03_18.pkl"
     joblib.dump(model, output_path)
     print(f"總銷量模型已保存到: {output_path}")
+    # 服務端使用的樹陣列檔 (不需載入 LightGBM)
+    export_model(model, output_path)
 
 def train_sales_model(df):
     """訓練飲品銷量預測模型"""
@@ -131,6 +135,11 @@ def train_sales_model(df):
     joblib.dump(model, output_path)
     print(f"飲品銷量模型已保存到: {output_path}")
 
+    # 輸出預測用的候選組合檔，預測時不必再讀整份 CSV
+    save_drink_candidates(df, candidates_filename(output_path))
+    # 服務端使用的樹陣列檔 (不需載入 LightGBM)
+    export_model(model, output_path)
+
 def fix_column_names():
     """修正預測腳本中的列名引用，使用 weather_temperature 而非 temperature"""
     # 修正總銷量預測腳本
@@ -0,0 +1,81 @@
+import os
+import threading
+from predict.tree_model import TreeEnsemble, tree_model_filename, file_digest
+
+# 模型旁有對應的 .trees.npz 時改用純 NumPy 推論，不載入 LightGBM / scikit-learn
+PREDICT_NATIVE_MODELS = os.getenv("PREDICT_NATIVE_MODELS", "1") == "1"
+
+
+def _joblib_load(path):
+    # 只有實際讀取 pickle 時才匯入 joblib (以及 pickle 內的 LightGBM / scikit-learn)
+    import joblib
+    return joblib.load(path)
+
+
+class ModelRegistry:
+    """
+    以 (檔案路徑, mtime) 為鍵的模型快取
+    每個 process 只載入一次，檔案被重新訓練覆蓋 (mtime 改變) 時自動重新載入
+    """
+    def __init__(self, loader=_joblib_load):
+        self.loader = loader
+        self._models = {}  # path -> (mtime, model)
+        self._lock = threading.Lock()
+
+    def get(self, model_filename):
+        path = os.path.abspath(model_filename)
+        try:
+            mtime = os.path.getmtime(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"無法找到模型檔案: {model_filename}")
+
+        entry = self._models.get(path)
+        if entry and entry[0] == mtime:
+            return entry[1]
+
+        # 同一時間只讓一個 thread 載入，其餘等待後直接取用結果
+        with self._lock:
+            entry = self._models.get(path)
+            if entry and entry[0] == mtime:
+                return entry[1]
+            try:
+                model = self.loader(path)
+            except Exception as e:
+                raise Exception(f"載入模型時發生錯誤: {e}")
+            self._models[path] = (mtime, model)
+            print(f"已載入模型: {os.path.basename(path)}")
+            return model
+
+    def clear(self):
+        """清除所有已載入的模型"""
+        with self._lock:
+            self._models.clear()
+
+
+# 全域共用的模型快取 (前台與後台共用)
+model_registry = ModelRegistry()
+tree_registry = ModelRegistry(loader=TreeEnsemble.load)
+_digests = {}  # pickle 路徑 -> (mtime, sha256)
+
+
+def _model_digest(model_filename):
+    path = os.path.abspath(model_filename)
+    mtime = os.path.getmtime(path)
+    entry = _digests.get(path)
+    if not entry or entry[0] != mtime:
+        entry = _digests[path] = (mtime, file_digest(path))
+    return entry[1]
+
+
+def load_model(model_filename):
+    """
+    取得模型；有 predict.tree_export 轉出的樹陣列檔且記錄的 sha256 與 pickle 相同時使用 TreeEnsemble
+    (兩者的 predict 結果相同)，否則載入 pickle
+    """
+    compiled = tree_model_filename(model_filename)
+    if PREDICT_NATIVE_MODELS and os.path.exists(compiled):
+        ensemble = tree_registry.get(compiled)
+        if ensemble.source_digest == _model_digest(model_filename):
+            return ensemble
+        print(f"樹陣列檔與模型不符，改用 pickle: {compiled}")
+    return model_registry.get(model_filename)
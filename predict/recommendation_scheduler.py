@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from datetime import datetime
+from predict.batch_forecast import BatchForecaster, top_drinks
+from tools.load_path import LoadPath
+from weather_API.weather_API import weather_dict, classify_weather, get_tomorrow_weather
+from weather_API.weather_cache import get_cached_weather, WEATHER_REFRESH_INTERVAL
+
+# 推薦預先計算設定
+RECOMMEND_CHECK_INTERVAL = float(os.getenv("RECOMMEND_CHECK_INTERVAL", 60))   # 檢查天氣/模型是否改變的間隔秒數
+TOMORROW_WEATHER_INTERVAL = float(os.getenv("TOMORROW_WEATHER_INTERVAL", WEATHER_REFRESH_INTERVAL))  # 隔日預報的更新間隔
+
+TOTAL_MODEL_FILENAME = "sales_total_model_v2_2025_03_18.pkl"
+SALES_MODEL_FILENAME = "lgbm_drink_weather_model_v4_2025_03_18.pkl"
+SALES_CSV_FILENAME = "drink_orders_2025_03_18.csv"
+
+
+def default_model_paths():
+    """(總銷量模型, 飲品模型, 訓練 CSV)；沒有 CSV 時飲品模型改用旁邊的候選組合檔"""
+    load_path = LoadPath(total_model_filename=TOTAL_MODEL_FILENAME,
+                         sales_model_filename=SALES_MODEL_FILENAME,
+                         sales_csv_filename=SALES_CSV_FILENAME)
+    try:
+        csv_path = load_path.load_sales_csv_path()
+    except FileNotFoundError:
+        csv_path = None
+    return load_path.load_total_model_path(), load_path.load_sales_model_path(), csv_path
+
+
+def current_weather_inputs():
+    """今日的 (日期, 天氣, 氣溫)，天氣快取沒有資料時回傳 None"""
+    weather_data = get_cached_weather()
+    if not (isinstance(weather_data, tuple) and len(weather_data) >= 4):
+        return None
+    _, _, weather, temperature = weather_data[:4]
+    return (datetime.now().date().isoformat(),
+            classify_weather(weather=weather, weather_dict=weather_dict), int(temperature))
+
+
+def tomorrow_weather_inputs():
+    """隔日預報的 (日期, 天氣, 平均氣溫)，取得失敗時回傳 None"""
+    forecast = get_tomorrow_weather()
+    if not (isinstance(forecast, tuple) and len(forecast) >= 4) or forecast[0] is None:
+        return None
+    weather, max_temp, min_temp, date = forecast[:4]
+    return (date, classify_weather(weather=weather, weather_dict=weather_dict), round((max_temp + min_temp) / 2))
+
+
+class RecommendationScheduler:
+    """
+    背景預先計算今日與明日的推薦 (總銷量 + 前 6 名飲品)
+    定期檢查天氣輸入與模型檔案的 mtime，有改變時才以 BatchForecaster 一次算完兩天，
+    結果連同計算時間存在記憶體，端點直接讀取 (O(1))
+    """
+    def __init__(self, model_paths=default_model_paths, today_inputs=current_weather_inputs,
+                 tomorrow_inputs=tomorrow_weather_inputs, check_interval=RECOMMEND_CHECK_INTERVAL,
+                 tomorrow_interval=TOMORROW_WEATHER_INTERVAL):
+        self.model_paths = model_paths
+        self.today_inputs = today_inputs
+        self.tomorrow_inputs = tomorrow_inputs
+        self.check_interval = check_interval
+        self.tomorrow_interval = tomorrow_interval
+        self._results = {}            # 'today' / 'tomorrow' -> 推薦結果
+        self._fingerprint = None      # 上次計算時的 (輸入, 模型 mtime)
+        self._tomorrow = (0.0, None)  # (取得時間, 隔日預報輸入)
+        self._lock = threading.Lock()        # 同一時間只有一個計算
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        # 統計數據
+        self.computations = 0
+        self.failures = 0
+
+    def get(self, kind):
+        """
+        回傳預先計算的推薦 (date, weather, temperature, daily_total_sales, top_6_drinks, computed_at)
+        沒有結果，或結果已跨日 (今日的不是今天、明日的不在今天之後) 時回傳 None
+        """
+        result = self._results.get(kind)
+        if not result:
+            return None
+        today = datetime.now().date().isoformat()
+        if (kind == 'today' and result['date'] != today) or (kind == 'tomorrow' and result['date'] <= today):
+            return None
+        return result
+
+    def _tomorrow_inputs(self):
+        fetched_at, inputs = self._tomorrow
+        if inputs is None or time.monotonic() - fetched_at >= self.tomorrow_interval:
+            inputs = self.tomorrow_inputs() or inputs
+            self._tomorrow = (time.monotonic(), inputs)
+        return inputs
+
+    def refresh(self, force=False):
+        """天氣或模型改變時重新計算，回傳是否重新計算"""
+        with self._lock:
+            paths = self.model_paths()
+            inputs = {'today': self.today_inputs(), 'tomorrow': self._tomorrow_inputs()}
+            inputs = {kind: value for kind, value in inputs.items() if value}
+            if not inputs:
+                return False
+            mtimes = tuple(os.path.getmtime(path) if path and os.path.exists(path) else None for path in paths)
+            fingerprint = (tuple(sorted(inputs.items())), mtimes)
+            if not force and fingerprint == self._fingerprint:
+                return False
+
+            kinds = list(inputs)
+            dates, weathers, temperatures = zip(*(inputs[kind] for kind in kinds))
+            try:
+                forecast = BatchForecaster(*paths).forecast(dates, weathers, temperatures)
+                tops = top_drinks(forecast)
+            except Exception as e:
+                self.failures += 1
+                print(f"預先計算推薦失敗: {e}")
+                return False
+
+            totals = forecast.groupby("scenario")["daily_total_sales"].first()
+            computed_at = datetime.now().isoformat(timespec='seconds')
+            results = dict(self._results)
+            for scenario, kind in enumerate(kinds):
+                date, weather, temperature = inputs[kind]
+                results[kind] = {
+                    "date": date,
+                    "weather": weather,
+                    "temperature": temperature,
+                    "daily_total_sales": int(totals[scenario]),
+                    "top_6_drinks": tops.get(scenario, []),
+                    "computed_at": computed_at
+                }
+            # 整個 dict 一次替換，讀取端不需加鎖
+            self._results = results
+            self._fingerprint = fingerprint
+            self.computations += 1
+            for kind in kinds:
+                print(f"已更新{kind}推薦: {results[kind]['top_6_drinks']}")
+            return True
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"推薦背景更新錯誤: {e}")
+            self._stop_event.wait(self.check_interval)
+
+    def start(self):
+        """啟動背景更新 thread (重複呼叫只會啟動一次)"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="recommendation-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def metrics(self):
+        return {
+            "computations": self.computations,
+            "failures": self.failures,
+            "results": {kind: result["computed_at"] for kind, result in self._results.items()}
+        }
+
+
+# 前後台共用 (run.py 在同一個 process 中啟動兩者)
+recommendation_scheduler = RecommendationScheduler()
+
+
+def get_recommendation(kind):
+    """取得預先計算的推薦 ('today' 或 'tomorrow')；背景計算應在 app 初始化時已啟動，這裡只是保險"""
+    recommendation_scheduler.start()
+    return recommendation_scheduler.get(kind)
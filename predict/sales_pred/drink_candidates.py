@@ -0,0 +1,94 @@
+import json
+import os
+import sys
+import pandas as pd
+from predict.model_registry import ModelRegistry
+
+# 飲品模型使用的類別型特徵
+CATEGORY_COLUMNS = ["drink_name", "ice", "weather_status"]
+
+
+def candidates_filename(model_filename):
+    """模型旁的候選組合檔: xxx.pkl -> xxx.candidates.json"""
+    return os.path.splitext(model_filename)[0] + ".candidates.json"
+
+
+def save_drink_candidates(df, output_path):
+    """
+    訓練時輸出 (飲料, 冰塊) 候選組合與類別對應表
+    預測時只需讀取這個小檔案，不必再讀整份訓練 CSV
+    """
+    categories = {
+        col: df[col].astype("category").cat.categories.tolist()
+        for col in CATEGORY_COLUMNS
+    }
+    combinations = df[["drink_name", "ice"]].drop_duplicates().values.tolist()
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"categories": categories, "combinations": combinations}, f, ensure_ascii=False, indent=2)
+    print(f"飲品候選組合已存入 {output_path}")
+
+
+def save_candidates_from_model(model, output_path):
+    """
+    沒有訓練 CSV 時，由模型本身記錄的類別 (pandas_categorical) 輸出候選組合檔
+    模型不記錄實際出現過的組合，因此候選為所有 飲料 × 冰塊
+    """
+    booster = getattr(model, "booster_", model)
+    categories = dict(zip(CATEGORY_COLUMNS, booster.pandas_categorical or []))
+    if set(categories) != set(CATEGORY_COLUMNS):
+        raise ValueError("模型沒有記錄完整的類別對應表 (需以 pandas 類別欄位訓練)")
+    combinations = [[drink, ice] for drink in categories["drink_name"] for ice in categories["ice"]]
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"categories": categories, "combinations": combinations}, f, ensure_ascii=False, indent=2)
+    print(f"飲品候選組合已存入 {output_path}")
+
+
+def _build_frame(combinations, categories):
+    frame = pd.DataFrame(combinations, columns=["drink_name", "ice"])
+    for col in ["drink_name", "ice"]:
+        frame[col] = pd.Categorical(frame[col], categories=categories[col])
+    return frame, categories
+
+
+def _load_from_sidecar(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return _build_frame(data["combinations"], data["categories"])
+
+
+def _load_from_csv(path):
+    # 舊模型沒有候選組合檔時，退回讀取訓練 CSV (同樣只讀一次)
+    df = pd.read_csv(path)
+    categories = {
+        col: df[col].astype("category").cat.categories.tolist()
+        for col in CATEGORY_COLUMNS
+    }
+    combinations = df[["drink_name", "ice"]].drop_duplicates().values.tolist()
+    return _build_frame(combinations, categories)
+
+
+_sidecar_registry = ModelRegistry(loader=_load_from_sidecar)
+_csv_registry = ModelRegistry(loader=_load_from_csv)
+
+
+def get_drink_candidates(model_filename, csv_filename=None):
+    """
+    回傳 (候選組合 DataFrame, 類別對應表)
+    結果依檔案 mtime 快取，回傳的 DataFrame 為共用物件，使用前請先 copy()
+    """
+    sidecar = candidates_filename(model_filename)
+    if os.path.exists(sidecar):
+        return _sidecar_registry.get(sidecar)
+    if csv_filename:
+        return _csv_registry.get(csv_filename)
+    raise FileNotFoundError(f"找不到飲品候選組合檔: {sidecar}")
+
+
+if __name__ == "__main__":
+    # 由模型輸出候選組合檔: python -m predict.sales_pred.drink_candidates [模型.pkl ...]
+    import joblib
+    default_model = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lgbm_drink_weather_model_v4_2025_03_18.pkl")
+    for model_filename in sys.argv[1:] or [default_model]:
+        save_candidates_from_model(joblib.load(model_filename), candidates_filename(model_filename))
@@ -3,6 +3,8 @@ import lightgbm as lgb
 from datetime import datetime
 from sklearn.model_selection import train_test_split
 import joblib
+from predict.sales_pred.drink_candidates import save_drink_candidates, candidates_filename
+from predict.tree_export import export_model
 
 today_date = str(datetime.now().date()).replace('-', '_')
 
@@ -89,3 +91,9 @@ print("預測結果已存入 drink_sales_predictions.csv")
 model_filename = "lgbm_drink_weather_model_v4_2025_03_18.pkl"
 joblib.dump(model, model_filename)
 print(f"模型已存入 {model_filename}")
+
+# 存儲預測用的候選組合檔 (飲料 × 冰塊 與類別對應表)
+save_drink_candidates(df, candidates_filename(model_filename))
+
+# 存儲服務端使用的樹陣列檔 (不需載入 LightGBM)
+export_model(model, model_filename)
@@ -1,5 +1,6 @@
 import pandas as pd
-import joblib
+from predict.model_registry import load_model
+from predict.sales_pred.drink_candidates import get_drink_candidates
 from predict.models import Pred_sales
 
 
@@ -13,13 +14,8 @@ class Pred_Sales:
         self.csv_filename = pred_info.csv_filename
 
     def load_total_model(self):
-        try:
-            model = joblib.load(self.model_filename)
-            return model
-        except FileNotFoundError:
-            raise FileNotFoundError(f"無法找到模型檔案: {self.model_filename}")
-        except Exception as e:
-            raise Exception(f"載入模型時發生錯誤: {e}")
+        # 由共用的模型快取取得，避免每次預測都重新 joblib.load
+        return load_model(self.model_filename)
 
     def process_features(self):
         # 計算 day_of_year 和 weekday
@@ -27,23 +23,16 @@ class Pred_Sales:
         day_of_year = date.timetuple().tm_yday
         weekday = date.weekday()  # 0 = Monday, 6 = Sunday
 
-        # 取得所有可能的飲料組合（從訓練資料來）
-        df = pd.read_csv(self.csv_filename)
-        # 確保類別型變數
-        for col in ["drink_name", "ice", "weather_status"]:
-            df[col] = df[col].astype("category")
-        # 取得所有飲料種類
-        drink_combinations = df[["drink_name", "ice"]].drop_duplicates()
+        # 取得所有可能的飲料組合（訓練時輸出的候選組合檔，依 mtime 快取）
+        drink_combinations, categories = get_drink_candidates(self.model_filename, self.csv_filename)
         # 建立預測 DataFrame
         predict_df = drink_combinations.copy()
-        predict_df["weather_status"] = self.weather
+        predict_df["weather_status"] = pd.Categorical([self.weather] * len(predict_df),
+                                                      categories=categories["weather_status"])
         predict_df["weather_temperature"] = self.temperature
         predict_df["day_of_year"] = day_of_year
         predict_df["weekday"] = weekday
         predict_df["daily_total_sales"] = self.daily_total_sales
-        # 轉換類別型變數
-        for col in ["drink_name", "ice", "weather_status"]:
-            predict_df[col] = predict_df[col].astype("category")
         # 特徵欄位
         features = ["drink_name", "ice", "weather_status", "weather_temperature", "day_of_year", "weekday", "daily_total_sales"]
         return predict_df, features
@@ -1,7 +1,15 @@
-import joblib
 import pandas as pd
+from predict.model_registry import load_model
 from predict.models import Pred_total
 
+# 天氣狀態 -> 總銷量模型的特徵值
+WEATHER_MAPPING = {
+    "cloudy": 0,
+    "rainy": 1,
+    "stormy": 2,
+    "sunny": 3
+}
+
 
 class Pred_Total_Sales:
     def __init__(self, pred_info: Pred_total):
@@ -9,22 +17,12 @@ class Pred_Total_Sales:
         self.weather = pred_info.weather
         self.temperature = pred_info.temperature
         self.model_filename = pred_info.model_filename
-        self.weather_mapping = {
-                                 "cloudy": 0,
-                                 "rainy": 1,
-                                 "stormy": 2,
-                                 "sunny": 3
-                                 }
+        self.weather_mapping = WEATHER_MAPPING
 
     def load_total_model(self):
         """load model"""
-        try:
-            model = joblib.load(self.model_filename)
-            return model
-        except FileNotFoundError:
-            raise FileNotFoundError(f"無法找到模型檔案: {self.model_filename}")
-        except Exception as e:
-            raise Exception(f"載入模型時發生錯誤: {e}")
+        # 由共用的模型快取取得，避免每次預測都重新 joblib.load
+        return load_model(self.model_filename)
 
     # 處理特徵
     def process_features(self):
@@ -4,6 +4,7 @@ import joblib
 import lightgbm as lgb
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error
+from predict.tree_export import export_model
 
 today_date = str(datetime.now().date()).replace('-', '_')
 
@@ -66,3 +67,6 @@ print(f"預測銷量（晴天 + 28°C + 7 月 + 星期三 + 一年內第 200 天
 model_filename = "sales_total_model_v2_2025_03_18.pkl"
 joblib.dump(model, model_filename)
 print(f"模型已存入 {model_filename}")
+
+# 存儲服務端使用的樹陣列檔 (不需載入 LightGBM)
+export_model(model, model_filename)
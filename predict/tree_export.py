@@ -0,0 +1,127 @@
+import json
+import sys
+from pathlib import Path
+import joblib
+import numpy as np
+from predict.tree_model import MISSING_NONE, MISSING_ZERO, MISSING_NAN, tree_model_filename, file_digest
+
+# 將訓練好的 LightGBM 模型 (.pkl，Booster 或 sklearn 包裝) 轉為 tree_model 使用的 .trees.npz
+#   python -m predict.tree_export                 轉換 repo 內的兩個預測模型
+#   python -m predict.tree_export a.pkl b.pkl     轉換指定的模型
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_MODELS = [
+    BASE_DIR / "total_pred" / "sales_total_model_v2_2025_03_18.pkl",
+    BASE_DIR / "sales_pred" / "lgbm_drink_weather_model_v4_2025_03_18.pkl",
+]
+
+MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+
+# 訓練目標 -> 輸出轉換
+OBJECT_TRANSFORMS = {
+    "regression": "identity", "regression_l1": "identity", "huber": "identity", "fair": "identity",
+    "quantile": "identity", "mape": "identity",
+    "poisson": "exp", "gamma": "exp", "tweedie": "exp",
+}
+
+
+def booster_of(model):
+    """sklearn 包裝 (LGBMRegressor) 取出底層的 Booster"""
+    return getattr(model, "booster_", model)
+
+
+def flatten_trees(dump):
+    """把 dump_model() 的巢狀樹結構攤平成陣列"""
+    nodes = {key: [] for key in ["feature", "threshold", "categorical", "cat_index",
+                                 "missing_type", "default_left", "left", "right"]}
+    leaf_value, cat_sets, roots = [], [], []
+
+    def visit(tree_node):
+        if "split_index" not in tree_node:
+            leaf_value.append(tree_node["leaf_value"])
+            return ~(len(leaf_value) - 1)
+        index = len(nodes["feature"])
+        for values in nodes.values():
+            values.append(None)
+        nodes["feature"][index] = tree_node["split_feature"]
+        nodes["missing_type"][index] = MISSING_TYPES[tree_node["missing_type"]]
+        nodes["default_left"][index] = tree_node["default_left"]
+        if tree_node["decision_type"] == "==":
+            # 類別型分裂：threshold 為往左的類別代碼，以 || 分隔
+            nodes["categorical"][index] = True
+            nodes["threshold"][index] = 0.0
+            nodes["cat_index"][index] = len(cat_sets)
+            cat_sets.append([int(code) for code in str(tree_node["threshold"]).split("||")])
+        elif tree_node["decision_type"] == "<=":
+            nodes["categorical"][index] = False
+            nodes["threshold"][index] = float(tree_node["threshold"])
+            nodes["cat_index"][index] = 0
+        else:
+            raise ValueError(f"不支援的分裂方式: {tree_node['decision_type']}")
+        nodes["left"][index] = visit(tree_node["left_child"])
+        nodes["right"][index] = visit(tree_node["right_child"])
+        return index
+
+    for tree in dump["tree_info"]:
+        roots.append(visit(tree["tree_structure"]))
+
+    width = max((max(codes) for codes in cat_sets), default=-1) + 1
+    sets = np.zeros((max(len(cat_sets), 1), max(width, 1)), dtype=bool)
+    for row, codes in enumerate(cat_sets):
+        sets[row, codes] = True
+
+    return {
+        "roots": np.array(roots, dtype=np.int32),
+        "feature": np.array(nodes["feature"], dtype=np.int32),
+        "threshold": np.array(nodes["threshold"], dtype=np.float64),
+        "categorical": np.array(nodes["categorical"], dtype=bool),
+        "cat_index": np.array(nodes["cat_index"], dtype=np.int32),
+        "cat_sets": sets,
+        "missing_type": np.array(nodes["missing_type"], dtype=np.int8),
+        "default_left": np.array(nodes["default_left"], dtype=bool),
+        "left": np.array(nodes["left"], dtype=np.int32),
+        "right": np.array(nodes["right"], dtype=np.int32),
+        "leaf_value": np.array(leaf_value, dtype=np.float64),
+    }
+
+
+def export_model(model, model_filename):
+    """
+    將已存成 model_filename 的模型 (Booster 或 sklearn 包裝) 轉出到旁邊的 .trees.npz，回傳輸出路徑
+    一併記錄 pickle 的 sha256，pickle 被覆蓋而未重新轉出時服務端會改用 pickle
+    """
+    output_path = tree_model_filename(str(model_filename))
+    booster = booster_of(model)
+    dump = booster.dump_model()
+    if dump["num_tree_per_iteration"] != 1:
+        raise ValueError("只支援單一輸出的模型 (迴歸)")
+    objective = dump["objective"].split()[0]
+    if objective not in OBJECT_TRANSFORMS:
+        raise ValueError(f"不支援的訓練目標: {objective}")
+
+    # 類別型特徵依欄位順序對應 pandas_categorical (訓練時 DataFrame 的類別)
+    categorical_features = [name for name in dump["feature_names"] if dump["feature_infos"][name].get("values")]
+    pandas_categorical = booster.pandas_categorical or []
+    if len(categorical_features) != len(pandas_categorical):
+        raise ValueError("類別型特徵與 pandas_categorical 數量不一致，模型需以 pandas 類別欄位訓練")
+
+    meta = {
+        "feature_names": dump["feature_names"],
+        "categories": dict(zip(categorical_features, pandas_categorical)),
+        "average_output": bool(dump.get("average_output")),
+        "transform": OBJECT_TRANSFORMS[objective],
+        "source_digest": file_digest(model_filename),
+    }
+    np.savez_compressed(output_path, meta=np.array(json.dumps(meta, ensure_ascii=False, default=lambda value: value.item())), **flatten_trees(dump))
+    return output_path
+
+
+def export_file(model_filename):
+    output_path = export_model(joblib.load(model_filename), model_filename)
+    print(f"已輸出 {output_path}")
+    return output_path
+
+
+if __name__ == "__main__":
+    for filename in sys.argv[1:] or DEFAULT_MODELS:
+        export_file(filename)
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+# 純 NumPy 的決策樹集成推論，讀取 tree_export 輸出的 .trees.npz
+# 不需要 LightGBM / scikit-learn / joblib，載入只需讀取幾個陣列
+
+ZERO_THRESHOLD = 1e-35           # LightGBM 判斷「零」的門檻 (kZeroThreshold)
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+
+# 輸出轉換 (依訓練目標)
+OUTPUT_TRANSFORMS = {
+    "identity": lambda raw: raw,
+    "exp": np.exp,
+}
+
+
+def tree_model_filename(model_filename):
+    """模型旁的樹陣列檔: xxx.pkl -> xxx.trees.npz"""
+    return os.path.splitext(model_filename)[0] + ".trees.npz"
+
+
+def file_digest(path):
+    """檔案內容的 sha256，用來確認樹陣列檔是由哪個 pickle 轉出"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TreeEnsemble:
+    """
+    以扁平陣列表示的決策樹集成，與 LightGBM Booster.predict 的結果相同
+    節點編號 >= 0 為分裂節點，< 0 為葉節點 (~葉編號)
+    所有資料列與所有樹同時往下走一層，迴圈次數只等於樹的最大深度
+    """
+    def __init__(self, arrays, meta):
+        self.roots = arrays["roots"]
+        self.feature = arrays["feature"].astype(np.intp)
+        self.threshold = arrays["threshold"]
+        self.categorical = arrays["categorical"]
+        self.cat_index = arrays["cat_index"].astype(np.intp)
+        self.cat_sets = arrays["cat_sets"]
+        self._cat_width = self.cat_sets.shape[1]
+        self.missing_type = arrays["missing_type"]
+        self.default_left = arrays["default_left"]
+        self.left = arrays["left"].astype(np.intp)
+        self.right = arrays["right"].astype(np.intp)
+        self.leaf_value = arrays["leaf_value"]
+        self._has_zero_missing = bool((self.missing_type == MISSING_ZERO).any())
+        self.feature_names = meta["feature_names"]
+        # 類別型特徵：欄位名稱 -> {類別: 代碼}
+        self.categories = {name: {value: code for code, value in enumerate(values)}
+                           for name, values in meta["categories"].items()}
+        self.average_output = meta["average_output"]
+        self.transform = OUTPUT_TRANSFORMS[meta["transform"]]
+        self.source_digest = meta.get("source_digest")  # 轉出時 pickle 的 sha256
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files if key != "meta"}
+            meta = json.loads(str(data["meta"]))
+        return cls(arrays, meta)
+
+    def _encode(self, name, column):
+        """類別型欄位轉為訓練時的代碼，未知類別為 NaN (與 LightGBM 的 pandas 處理相同)"""
+        lookup = self.categories[name]
+        if hasattr(column, "cat"):
+            # pandas Categorical：只需對應各類別一次
+            remap = np.array([lookup.get(value, np.nan) for value in column.cat.categories], dtype=np.float64)
+            codes = np.asarray(column.cat.codes)
+            return np.where(codes >= 0, remap[np.maximum(codes, 0)] if len(remap) else np.nan, np.nan)
+        return np.fromiter((lookup.get(value, np.nan) for value in column), dtype=np.float64, count=len(column))
+
+    def _matrix(self, X):
+        """DataFrame / dict 依特徵名稱取欄位；二維陣列依欄位順序"""
+        if isinstance(X, np.ndarray):
+            return np.asarray(X, dtype=np.float64)
+        columns = []
+        for name in self.feature_names:
+            column = X[name]
+            if name in self.categories:
+                columns.append(self._encode(name, column))
+            else:
+                columns.append(np.asarray(column, dtype=np.float64))
+        return np.column_stack(columns) if columns else np.empty((0, 0))
+
+    def _go_left_fast(self, node, values):
+        """資料沒有 NaN 且模型沒有「零為缺值」的節點時，缺值規則都不會觸發"""
+        code = np.clip(values, 0, self._cat_width - 1).astype(np.intp)
+        in_set = self.cat_sets[self.cat_index[node], code] & (values >= 0) & (values < self._cat_width)
+        return np.where(self.categorical[node], in_set, values <= self.threshold[node])
+
+    def _go_left(self, node, values):
+        """values 為各資料列在節點 node 的特徵值，回傳是否往左"""
+        go_left = np.empty(len(node), dtype=bool)
+        categorical = self.categorical[node]
+
+        # 數值型：非 NaN 缺值模式下 NaN 視為 0；缺值 (零或 NaN) 走 default_left，否則 <= threshold 往左
+        numeric = ~categorical
+        if numeric.any():
+            n_node, value = node[numeric], values[numeric]
+            missing_type = self.missing_type[n_node]
+            is_nan = np.isnan(value)
+            value = np.where(is_nan & (missing_type != MISSING_NAN), 0.0, value)
+            missing = (((missing_type == MISSING_ZERO) & (np.abs(value) <= ZERO_THRESHOLD))
+                       | ((missing_type == MISSING_NAN) & is_nan))
+            with np.errstate(invalid="ignore"):
+                go_left[numeric] = np.where(missing, self.default_left[n_node], value <= self.threshold[n_node])
+
+        # 類別型：NaN 或負數往右，其餘在該節點的類別集合中才往左
+        if categorical.any():
+            c_node, value = node[categorical], values[categorical]
+            valid = ~np.isnan(value) & (value >= 0)
+            code = np.where(valid, value, 0).astype(np.int64)
+            valid &= code < self.cat_sets.shape[1]
+            sets = self.cat_index[c_node]
+            go_left[categorical] = valid & self.cat_sets[sets, np.where(valid, code, 0)]
+        return go_left
+
+    def predict_raw(self, X):
+        data = self._matrix(X)
+        n_rows, n_trees = len(data), len(self.roots)
+        node = np.broadcast_to(self.roots.astype(np.intp), (n_rows, n_trees)).copy()
+        rows = np.broadcast_to(np.arange(n_rows)[:, None], (n_rows, n_trees))
+
+        go_left = self._go_left if self._has_zero_missing or np.isnan(data).any() else self._go_left_fast
+
+        active = np.flatnonzero(node.ravel() >= 0)
+        flat_node, flat_data = node.ravel(), data.ravel()
+        offsets = rows.ravel() * data.shape[1]  # 資料列在 flat_data 中的起點
+        while active.size:
+            current = flat_node[active]
+            values = flat_data[offsets[active] + self.feature[current]]
+            flat_node[active] = np.where(go_left(current, values), self.left[current], self.right[current])
+            active = active[flat_node[active] >= 0]
+
+        leaves = self.leaf_value[~node]
+        # 依樹的順序逐棵累加，與 LightGBM 的加總順序相同
+        output = np.zeros(n_rows, dtype=np.float64)
+        for tree in range(n_trees):
+            output += leaves[:, tree]
+        if self.average_output and n_trees:
+            output /= n_trees
+        return output
+
+    def predict(self, X):
+        return self.transform(self.predict_raw(X))
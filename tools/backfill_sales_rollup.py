@@ -0,0 +1,38 @@
+import argparse
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from codes.db import DB, dbconfig
+from codes.sales_rollup import SalesRollup
+
+# 以 orders 重新計算 daily_sales 彙總表
+#   python tools/backfill_sales_rollup.py             回填所有歷史訂單
+#   python tools/backfill_sales_rollup.py --days 7    只重算最近 7 天 (例如修正直接改資料庫造成的差異)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回填每日銷售彙總表')
+    parser.add_argument('--days', type=int, help='只重算最近幾天')
+    args = parser.parse_args()
+
+    db = DB(dbconfig())
+    rollup = SalesRollup(db)
+    try:
+        if not rollup.ensure_ready():
+            sys.exit(1)
+        if args.days:
+            today = date.today()
+            ok = rollup.rebuild(today - timedelta(days=args.days), today)
+        else:
+            ok = rollup.rebuild()
+    finally:
+        db.close()
+    print("回填完成" if ok else "回填失敗")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
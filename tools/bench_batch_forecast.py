@@ -0,0 +1,97 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from predict.batch_forecast import BatchForecaster, top_drinks
+from predict.model_registry import load_model
+from predict.models import Pred_total, Pred_sales
+from predict.sales_pred.drink_candidates import candidates_filename, save_candidates_from_model
+from predict.sales_pred.predict_sales_v4_2 import Pred_Sales
+from predict.total_pred.predict_total_sales import Pred_Total_Sales
+
+# 比較逐筆預測 (Pred_Total_Sales + Pred_Sales) 與批次預測 (BatchForecaster) 的耗時，並確認結果一致
+# 使用 repo 內的模型；候選組合以模型本身記錄的類別 (所有飲料 × 冰塊) 產生，不需要訓練 CSV
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TOTAL_MODEL = BASE_DIR / "predict" / "total_pred" / "sales_total_model_v2_2025_03_18.pkl"
+SALES_MODEL = BASE_DIR / "predict" / "sales_pred" / "lgbm_drink_weather_model_v4_2025_03_18.pkl"
+REPEAT = 3
+
+
+def prepare_sales_model(workdir):
+    """把飲品模型複製到暫存目錄，並在旁邊寫入候選組合檔"""
+    model_path = os.path.join(workdir, SALES_MODEL.name)
+    shutil.copy(SALES_MODEL, model_path)
+    save_candidates_from_model(load_model(model_path), candidates_filename(model_path))
+    return model_path
+
+
+def scenarios():
+    """未來 7 天的展望 + 同一天 10~34 度的氣溫敏感度"""
+    start = date(2025, 3, 20)
+    outlook = [((start + timedelta(days=i)).isoformat(), ["sunny", "cloudy", "rainy"][i % 3], 18 + i) for i in range(7)]
+    sensitivity = [(start.isoformat(), "sunny", t) for t in range(10, 35)]
+    return outlook + sensitivity
+
+
+def per_call(cases, sales_model):
+    results = []
+    for date_string, weather, temperature in cases:
+        total = Pred_Total_Sales(Pred_total(date_string=date_string, weather=weather, temperature=temperature,
+                                            model_filename=str(TOTAL_MODEL))).pred()
+        predictor = Pred_Sales(Pred_sales(date_string=date_string, weather=weather, temperature=temperature,
+                                          daily_total_sales=total, model_filename=sales_model, csv_filename=""))
+        results.append((total, predictor.pred()["predicted_sales"].to_numpy(), predictor.get_top_6_sales_by_condition()))
+    return results
+
+
+def benchmark():
+    workdir = tempfile.mkdtemp()
+    try:
+        sales_model = prepare_sales_model(workdir)
+        cases = scenarios()
+        dates, weathers, temperatures = zip(*cases)
+        forecaster = BatchForecaster(str(TOTAL_MODEL), sales_model)
+
+        # 先各跑一次，載入模型與候選組合 (兩者皆由共用快取提供)
+        expected = per_call(cases, sales_model)
+        forecast = forecaster.forecast(dates, weathers, temperatures)
+
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            per_call(cases, sales_model)
+        per_call_time = (time.perf_counter() - start) / REPEAT
+
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            forecast = forecaster.forecast(dates, weathers, temperatures)
+            tops = top_drinks(forecast)
+        batch_time = (time.perf_counter() - start) / REPEAT
+
+        # 一致性檢查
+        totals = forecast.groupby("scenario")["daily_total_sales"].first().to_numpy()
+        assert list(totals) == [total for total, _, _ in expected], "總銷量預測不一致"
+        max_diff = max(
+            np.abs(forecast.loc[forecast["scenario"] == i, "predicted_sales"].to_numpy() - sales).max()
+            for i, (_, sales, _) in enumerate(expected)
+        )
+        assert max_diff < 1e-9, f"飲品銷量預測不一致 (最大差異 {max_diff})"
+        same_top = sum(set(tops.get(i, [])) == set(top) for i, (_, _, top) in enumerate(expected))
+
+        print(f"情境數: {len(cases)}，預測列數: {len(forecast)}")
+        print(f"逐筆預測: {per_call_time * 1000:.1f}ms")
+        print(f"批次預測: {batch_time * 1000:.1f}ms ({per_call_time / batch_time:.1f}x)")
+        print(f"飲品銷量最大差異: {max_diff:.2e}，推薦前 6 名相同: {same_top}/{len(cases)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from pymysql.converters import escape_item, encoders
+from pymysql.cursors import Cursor, RE_INSERT_VALUES
+from codes.order_queries import INSERT_ORDER_QUERY
+
+# /confirm_order 寫入方式的效能比較 (以 SQLite 檔案模擬 MySQL，每次 commit 都會 fsync)
+# 逐杯 INSERT + commit  vs  executemany + 單一 commit
+# 另外確認 /confirm_order 實際使用的 INSERT_ORDER_QUERY 經 pymysql executemany 後只送出一條語句
+
+CREATE_TABLE = """
+    CREATE TABLE orders (
+        order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        drink_name TEXT, size TEXT, ice_type TEXT, sugar_type TEXT,
+        order_date TEXT, order_time TEXT,
+        weather_status TEXT, temperature REAL,
+        status TEXT, created_at TEXT, order_number TEXT
+    )
+"""
+
+INSERT_ORDER = """
+    INSERT INTO orders (
+        drink_name, size, ice_type, sugar_type,
+        order_date, order_time,
+        weather_status, temperature,
+        status, created_at, order_number
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def make_basket(order_index, cups):
+    now = datetime.now()
+    base = f"{now:%m%d}A{order_index}"
+    return [
+        ('珍珠奶茶', '大杯', 'less', 'half',
+         str(now.date()), now.strftime('%H:%M:%S'),
+         'sunny', 25, 'pending', now.strftime('%Y-%m-%d %H:%M:%S'), f"{base}-{i+1}")
+        for i in range(cups)
+    ]
+
+
+def insert_per_cup(conn, basket):
+    # 舊作法：每杯一次 INSERT 與 commit
+    for values in basket:
+        conn.execute(INSERT_ORDER, values)
+        conn.commit()
+
+
+def insert_batched(conn, basket):
+    # 新作法：整筆訂單一次寫入，一次 commit
+    with conn:
+        conn.executemany(INSERT_ORDER, basket)
+
+
+def run(insert_fn, orders=200, cups=10):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(os.path.join(tmp_dir, "bench.db"))
+        conn.execute("PRAGMA synchronous = FULL")
+        conn.execute(CREATE_TABLE)
+        conn.commit()
+
+        start = time.perf_counter()
+        for order_index in range(orders):
+            insert_fn(conn, make_basket(order_index, cups))
+        elapsed = time.perf_counter() - start
+        conn.close()
+    return orders * cups / elapsed
+
+
+class _OfflineConnection:
+    """只提供 pymysql Cursor 組語句時需要的跳脫功能，不連資料庫"""
+    encoding = 'utf8'
+    max_allowed_packet = 16 * 1024 * 1024
+
+    def escape(self, obj, mapping=None):
+        return escape_item(obj, self.encoding, mapping)
+
+    def literal(self, obj):
+        return self.escape(obj, encoders)
+
+
+class _CountingCursor(Cursor):
+    """記錄 executemany 實際送出的語句，不執行"""
+    def __init__(self, connection):
+        super().__init__(connection)
+        self.statements = []
+
+    def execute(self, query, args=None):
+        self.statements.append(query if args is None else self.mogrify(query, args))
+        return 1
+
+
+def mysql_statements(query, cups):
+    """pymysql executemany 寫入一筆 cups 杯的訂單時送出的語句數"""
+    now = datetime.now().replace(microsecond=0)
+    basket = [('珍珠奶茶', '大杯', 'less', 'half', now.date(), now.strftime('%H:%M:%S'),
+               'sunny', 25, 'pending', now, f"{now:%m%d}A1-{i+1}") for i in range(cups)]
+    cursor = _CountingCursor(_OfflineConnection())
+    cursor.executemany(query, basket)
+    return len(cursor.statements)
+
+
+if __name__ == "__main__":
+    batched = RE_INSERT_VALUES.match(INSERT_ORDER_QUERY) is not None
+    print(f"INSERT_ORDER_QUERY 可合併為多列 INSERT: {batched}")
+    for cups in [1, 3, 10]:
+        print(f"每筆 {cups:2d} 杯 | 送出語句數: {mysql_statements(INSERT_ORDER_QUERY, cups)}")
+    if not batched:
+        sys.exit(1)
+
+    for cups in [1, 3, 10]:
+        before = run(insert_per_cup, cups=cups)
+        after = run(insert_batched, cups=cups)
+        print(f"每筆 {cups:2d} 杯 | 逐杯寫入: {before:8.0f} 杯/秒 | 批次寫入: {after:8.0f} 杯/秒 | 加速 {after / before:.1f}x")
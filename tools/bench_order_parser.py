@@ -0,0 +1,63 @@
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from frontend.order_parser import OrderParser, DRINKS_MENU
+
+# 點餐語句語料：比較舊規則與規則式解析器需要呼叫 LLM 的比例，以及解析延遲
+CORPUS = [
+    '珍珠奶茶', '紅茶', '一杯綠茶', '一杯珍珠奶茶', '蜂蜜檸檬',
+    '我要一杯紅茶', '我要珍珠奶茶', '給我一杯烏龍茶', '來一杯冬瓜茶',
+    '兩杯大杯珍珠奶茶半糖少冰', '大杯紅茶微糖去冰', '小杯綠茶無糖',
+    '我要兩杯奶綠半糖', '三杯冬瓜檸檬少冰', '我要3杯綠茶微糖',
+    '一杯焦糖奶茶 半糖 少冰', '熱紅茶', '一杯熱拿鐵咖啡', '大杯美式咖啡去冰',
+    '珍珠奶茶兩杯紅茶一杯', '兩杯大杯珍珠奶茶半糖少冰，一杯紅茶去冰',
+    '一杯波霸奶茶和一杯椰果奶茶', '我要一杯梅子綠茶跟兩杯青茶微冰',
+    '麻煩給我一杯小杯蜂蜜奶茶七分糖', '請給我一杯卡布奇諾', '我想喝布丁奶茶',
+    '四杯摩卡咖啡，兩杯烏龍拿鐵', '一杯仙草奶茶三分糖',
+    '紅茶不要冰', '珍珠奶茶換成半糖', '取消剛剛的紅茶', '紅茶、綠茶都去冰',
+    '有什麼推薦', '今天天氣好熱', '你們幾點關門', '可以刷卡嗎',
+    '我要一杯最好喝的', '珍珠奶茶還是紅茶比較好喝？', '一杯中杯紅茶',
+    '幫我加珍珠'
+]
+
+
+def old_rules_need_llm(text):
+    """舊版 analyze_order：只有完整飲料名稱或「一杯<飲料>」不呼叫 LLM"""
+    for drink in DRINKS_MENU:
+        if text.strip() == drink or text == f"一杯{drink}":
+            return False
+    return True
+
+
+def benchmark(repeat=200, min_confidence=0.8):
+    parser = OrderParser()
+
+    latencies = []
+    for _ in range(repeat):
+        for text in CORPUS:
+            start = time.perf_counter()
+            parser.parse(text)
+            latencies.append((time.perf_counter() - start) * 1_000_000)
+
+    old_llm = sum(old_rules_need_llm(text) for text in CORPUS)
+    new_llm = 0
+    for text in CORPUS:
+        result = parser.parse(text)
+        need_llm = result.confidence < min_confidence
+        new_llm += need_llm
+        mark = 'LLM ' if need_llm else '規則'
+        print(f"[{mark}] {result.confidence:.2f} {text} -> {result.items}")
+
+    latencies.sort()
+    print(f"\n語料數量: {len(CORPUS)}")
+    print(f"LLM 呼叫比例 | 舊規則: {old_llm / len(CORPUS):.0%} | 規則式解析器: {new_llm / len(CORPUS):.0%}")
+    print(f"解析延遲 | 平均 {statistics.mean(latencies):.1f}µs | "
+          f"p50 {latencies[len(latencies) // 2]:.1f}µs | p99 {latencies[int(len(latencies) * 0.99)]:.1f}µs")
+
+
+if __name__ == "__main__":
+    benchmark()
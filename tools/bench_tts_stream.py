@@ -0,0 +1,125 @@
+import ctypes
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from frontend.codes.tts_engine import AzureTTS
+
+# 以假的 Azure Speech SDK 比較「寫檔後再下載」與「記憶體串流」的首個位元組時間
+# 假 SDK 每 CHUNK_INTERVAL 秒產生一段音訊，模擬邊合成邊輸出的行為，不需要 Azure 金鑰
+
+CHUNKS = 20
+CHUNK_BYTES = 2048
+CHUNK_INTERVAL = 0.02
+
+
+class FakePullStream:
+    def __init__(self):
+        self._chunks = []
+        self._done = False
+        self._cond = threading.Condition()
+
+    def _write(self, data):
+        with self._cond:
+            self._chunks.append(data)
+            self._cond.notify()
+
+    def _close(self):
+        with self._cond:
+            self._done = True
+            self._cond.notify()
+
+    def read(self, buffer):
+        with self._cond:
+            while not self._chunks and not self._done:
+                self._cond.wait()
+            if not self._chunks:
+                return 0
+            data = self._chunks.pop(0)
+        # 與真實 SDK 相同，把資料直接填進呼叫端傳入的 buffer
+        size = min(len(data), len(buffer))
+        ctypes.memmove(buffer, data, size)
+        return size
+
+
+class FakeAudioOutputConfig:
+    def __init__(self, filename=None, stream=None):
+        self.filename = filename
+        self.stream = stream
+
+
+class FakeSynthesizer:
+    def __init__(self, speech_config, audio_config):
+        self.audio_config = audio_config
+
+    def speak_ssml_async(self, ssml):
+        result = SimpleNamespace(reason=FakeSDK.ResultReason.SynthesizingAudioCompleted)
+        done = threading.Event()
+
+        def run():
+            file = open(self.audio_config.filename, 'wb') if self.audio_config.filename else None
+            for _ in range(CHUNKS):
+                time.sleep(CHUNK_INTERVAL)
+                chunk = b'\xff' * CHUNK_BYTES
+                if file:
+                    file.write(chunk)
+                else:
+                    self.audio_config.stream._write(chunk)
+            if file:
+                file.close()
+            else:
+                self.audio_config.stream._close()
+            done.set()
+
+        threading.Thread(target=run, daemon=True).start()
+        return SimpleNamespace(get=lambda: done.wait() and result)
+
+
+class FakeSpeechConfig:
+    def __init__(self, subscription=None, region=None):
+        self.speech_synthesis_voice_name = None
+
+    def set_speech_synthesis_output_format(self, output_format):
+        pass
+
+
+FakeSDK = SimpleNamespace(
+    SpeechConfig=FakeSpeechConfig,
+    SpeechSynthesizer=FakeSynthesizer,
+    ResultReason=SimpleNamespace(SynthesizingAudioCompleted='completed'),
+    SpeechSynthesisOutputFormat=SimpleNamespace(Audio16Khz32KBitRateMonoMp3='mp3'),
+    audio=SimpleNamespace(AudioOutputConfig=FakeAudioOutputConfig, PullAudioOutputStream=FakePullStream)
+)
+
+
+def benchmark():
+    engine = AzureTTS(sdk=FakeSDK, key='fake', region='fake')
+    text, voice, rate = '訂單已確認！您的取餐號碼為 A3', 'zh-TW-HsiaoYuNeural', 1.2
+
+    # 寫檔：合成完成後才能開始下載
+    path = os.path.join(tempfile.mkdtemp(), 'speech.mp3')
+    start = time.perf_counter()
+    engine.synthesize_to_file(text, voice, rate, path)
+    with open(path, 'rb') as f:
+        f.read(1)
+    file_first_byte = time.perf_counter() - start
+
+    # 串流：第一段音訊產生後即可送出
+    start = time.perf_counter()
+    stream = engine.stream(text, voice, rate)
+    next(stream)
+    stream_first_byte = time.perf_counter() - start
+    total = CHUNK_BYTES + sum(len(chunk) for chunk in stream)
+
+    print(f"寫檔後下載 首個位元組: {file_first_byte * 1000:.0f}ms")
+    print(f"記憶體串流 首個位元組: {stream_first_byte * 1000:.0f}ms (共 {total} bytes)")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,156 @@
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from codes.db import DB, DBUser, ConnectionPool
+from codes.order_queries import INSERT_ORDER_QUERY
+from codes.order_sequence import OrderNumberAllocator
+from codes.order_stats import OrderStatsService
+from codes.sales_rollup import SalesRollup
+from codes.wait_estimator import WaitTimeEstimator
+
+# 確認一個 /confirm_order 請求只向連線池借出一條連線
+# 請求用的 db、訂單號碼配發器、統計、彙總與等候時間各自持有 DB 物件，但同一個 thread 共用連線
+#   python tools/check_db_connections.py
+# 不需資料庫：以記憶體內的假連線取代 pymysql
+
+FAKE_CONFIG = DBUser(host="fake", port=0, user="check", password="", database="check_db_connections")
+
+
+class FakeCursor:
+    """只回傳各元件需要的最少結果"""
+    def __init__(self):
+        self.rowcount = 0
+        self._result = []
+
+    def execute(self, query, params=None):
+        if "LAST_INSERT_ID" in query:
+            self._result = [{"seq": 1}]
+        elif "FROM daily_sales" in query:
+            self._result = [{"found": 1}]  # 彙總表已有資料，不觸發回填
+        else:
+            self._result = []
+
+    def executemany(self, query, data_list):
+        self.rowcount = len(data_list)
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CountingPool(ConnectionPool):
+    """記錄借出次數與同時借出的最大連線數"""
+    def __init__(self, config):
+        super().__init__(config)
+        self.acquires = 0
+        self.peak = 0
+
+    def _create(self):
+        with self._lock:
+            self.created += 1
+        return FakeConnection()
+
+    def acquire(self):
+        conn = super().acquire()
+        with self._lock:
+            self.acquires += 1
+            self.peak = max(self.peak, self.in_use)
+        return conn
+
+    def reset(self):
+        self.acquires = 0
+        self.peak = 0
+
+
+def make_app_objects():
+    """與 frontend/app.py 相同：每個元件各自建立 DB 物件"""
+    db = DB(FAKE_CONFIG)
+    return {
+        "db": db,
+        "allocator": OrderNumberAllocator(DB(FAKE_CONFIG)),
+        "stats": OrderStatsService(DB(FAKE_CONFIG), incremental=False),
+        "rollup": SalesRollup(DB(FAKE_CONFIG)),
+        "estimator": WaitTimeEstimator(DB(FAKE_CONFIG)),
+    }
+
+
+def confirm_order(objects, cups=3):
+    """/confirm_order 的資料庫操作順序"""
+    now = datetime.now()
+    order_date = now.date()
+    base_order_number, order_numbers = objects["allocator"].allocate(cups, order_date)
+    values_list = [
+        ('珍珠奶茶', '大杯', '少冰', '半糖', order_date, now.time(), '晴天', 25,
+         'pending', now, order_number)
+        for order_number in order_numbers
+    ]
+    rollup_batches = objects["rollup"].order_batches(
+        [(order_date, *values[:4], '晴天', 0) for values in values_list])
+    if not objects["db"].executemany_all([(INSERT_ORDER_QUERY, values_list)] + rollup_batches):
+        raise RuntimeError("訂單寫入失敗")
+    objects["stats"].record_created(len(values_list), order_date)
+    for values in values_list:
+        objects["estimator"].record_created(values[-1], values[0], now)
+    objects["estimator"].waiting_minutes()
+    objects["stats"].get(order_date)
+
+
+def main():
+    import codes.db as db_module
+    pool = CountingPool(FAKE_CONFIG)
+    key = (FAKE_CONFIG.host, FAKE_CONFIG.port, FAKE_CONFIG.user, FAKE_CONFIG.database)
+    db_module._pools[key] = pool
+    objects = make_app_objects()
+
+    # 請求內：Flask 的 before_request / teardown_appcontext (DB.init_app 註冊的掛鉤)
+    objects["db"]._enter_request()
+    confirm_order(objects)
+    in_request = (pool.acquires, pool.peak, pool.in_use)
+    objects["db"]._leave_request()
+    released = pool.in_use
+
+    # 請求之外 (背景任務)：各元件用完立即歸還
+    pool.reset()
+    objects["stats"].invalidate()
+    objects["stats"].get(date.today())
+    background = (pool.acquires, pool.in_use)
+
+    print(f"請求內借出次數: {in_request[0]} (同時最多 {in_request[1]} 條，請求結束前使用中 {in_request[2]} 條)")
+    print(f"請求結束後使用中: {released}")
+    print(f"背景查詢借出次數: {background[0]}，查詢後使用中: {background[1]}")
+    print(f"連線池建立的連線: {pool.created}")
+
+    return in_request[0] == 1 and in_request[1] == 1 and released == 0 and background == (1, 0)
+
+
+if __name__ == "__main__":
+    if main():
+        print("✅ 一個請求只借出一條連線")
+    else:
+        print("❌ 請求借出多條連線或沒有歸還")
+        sys.exit(1)
@@ -0,0 +1,74 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import joblib
+import numpy as np
+import pandas as pd
+from predict.tree_export import DEFAULT_MODELS, booster_of
+from predict.tree_model import TreeEnsemble, tree_model_filename, file_digest
+
+# 確認 .trees.npz (TreeEnsemble) 與原本的 LightGBM pickle 預測完全相同，並比較載入與預測時間
+#   python tools/check_tree_parity.py [模型.pkl ...]
+# 以模型記錄的類別與特徵範圍隨機產生資料 (含未知類別與缺值)，不需要訓練 CSV
+
+ROWS = [90, 180, 2880, 50000]
+SEED = 0
+
+
+def sample_features(booster, n, rng):
+    """依 feature_infos 產生 n 列資料：數值欄在訓練範圍外各延伸 10%，類別欄含 1% 缺值"""
+    dump = booster.dump_model(num_iteration=0)
+    categories = iter(booster.pandas_categorical or [])
+    data = {}
+    for name in dump["feature_names"]:
+        info = dump["feature_infos"][name]
+        if info.get("values"):
+            values = list(next(categories))
+            codes = rng.integers(0, len(values), size=n)
+            codes[rng.random(n) < 0.01] = -1
+            data[name] = pd.Categorical.from_codes(codes, categories=values)
+        else:
+            low, high = float(info["min_value"]), float(info["max_value"])
+            margin = (high - low) * 0.1
+            column = np.round(rng.uniform(low - margin, high + margin, size=n))
+            column[rng.random(n) < 0.01] = np.nan
+            data[name] = column
+    return pd.DataFrame(data)
+
+
+def timed(func, repeat=3):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def check(model_filename):
+    compiled = tree_model_filename(str(model_filename))
+    model, pickle_ms = timed(lambda: joblib.load(model_filename), repeat=1)
+    ensemble, native_ms = timed(lambda: TreeEnsemble.load(compiled), repeat=1)
+    print(f"{Path(model_filename).name}: 載入 pickle {pickle_ms:.1f}ms / trees.npz {native_ms:.1f}ms")
+
+    ok = ensemble.source_digest == file_digest(model_filename)
+    if not ok:
+        print("  trees.npz 不是由目前的 pickle 轉出，請重新執行 python -m predict.tree_export")
+
+    rng = np.random.default_rng(SEED)
+    for n in ROWS:
+        X = sample_features(booster_of(model), n, rng)
+        expected, lgbm_ms = timed(lambda: model.predict(X))
+        actual, numpy_ms = timed(lambda: ensemble.predict(X))
+        same = np.array_equal(expected, actual)
+        ok &= same
+        print(f"  {n:>6} 列: LightGBM {lgbm_ms:7.1f}ms  NumPy {numpy_ms:7.1f}ms  "
+              f"{'一致' if same else f'不一致 (最大差異 {np.abs(expected - actual).max():.2e})'}")
+    return ok
+
+
+if __name__ == "__main__":
+    results = [check(filename) for filename in sys.argv[1:] or DEFAULT_MODELS]
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,47 @@
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from codes.db import DB, dbconfig
+from codes.order_queries import migrate, missing_indexes, explain_hot_queries
+from codes.sales_rollup import SalesRollup
+
+# orders 表索引的 migration 與 EXPLAIN 回歸檢查
+#   python tools/migrate_order_indexes.py          建立缺少的索引後檢查熱門查詢
+#   python tools/migrate_order_indexes.py --check  只檢查，不修改資料庫 (可放在 CI / 部署前執行)
+# 任何熱門查詢退回沒有索引可用的全表掃描時以結束碼 1 結束
+
+
+def main():
+    parser = argparse.ArgumentParser(description='orders 表索引 migration')
+    parser.add_argument('--check', action='store_true', help='只檢查索引與查詢計畫，不建立索引')
+    args = parser.parse_args()
+
+    db = DB(dbconfig())
+    try:
+        if args.check:
+            missing = missing_indexes(db)
+            for name, columns in missing:
+                print(f"缺少索引 {name} ({', '.join(columns)})")
+        else:
+            missing = []
+            created = migrate(db)
+            print(f"已建立 {len(created)} 個索引" if created else "索引皆已存在")
+            SalesRollup(db).ensure_ready()  # 分析查詢讀取的彙總表
+
+        failed = bool(missing)
+        for name, key, problem in explain_hot_queries(db):
+            if problem:
+                failed = True
+                print(f"✗ {name}: {problem}")
+            else:
+                print(f"✓ {name}: {key or '(優化器選擇全表掃描，但有可用的索引)'}")
+    finally:
+        db.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 本機模擬的 OpenAI chat completion 服務，用於測試 frontend/llm_gateway.py
+# 啟動後設定 OPENAI_BASE_URL=http://127.0.0.1:8089/v1 與任意 OPENAI_API_KEY 即可
+# 可調整延遲與失敗率，觀察逾時、重試與斷路器的行為
+
+CHAT_REPLY = {"reply": "好的，請問要什麼甜度和冰塊呢？", "intent": "order", "confidence": 0.9}
+ORDER_REPLY = [{"drink_name": "珍珠奶茶", "size": "大杯", "sugar": "半糖", "ice": "少冰", "quantity": 1}]
+
+
+class MockState:
+    delay = 0.2          # 每次回應前的延遲 (秒)
+    failure_rate = 0.0   # 回傳 500 的機率
+    chunk_delay = 0.02   # 串流時每個 chunk 的間隔
+    requests = 0
+    lock = threading.Lock()
+
+
+def reply_content(messages):
+    """系統提示詞要求回傳 intent 時視為聊天，否則回傳訂單"""
+    system = messages[0]["content"] if messages else ""
+    content = CHAT_REPLY if "intent" in system else ORDER_REPLY
+    return json.dumps(content, ensure_ascii=False)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        with MockState.lock:
+            MockState.requests += 1
+
+        time.sleep(MockState.delay)
+        if random.random() < MockState.failure_rate:
+            self._send_json(500, {"error": {"message": "mock failure", "type": "server_error"}})
+            return
+
+        content = reply_content(request.get("messages", []))
+        model = request.get("model", "mock")
+        usage = {"prompt_tokens": 50, "completion_tokens": len(content), "total_tokens": 50 + len(content)}
+        if request.get("stream"):
+            self._stream(model, content, usage)
+            return
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": usage
+        })
+
+    def _stream(self, model, content, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def send(data):
+            self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model}
+        for i in range(0, len(content), 4):
+            send(json.dumps({**base, "choices": [{"index": 0, "delta": {"content": content[i:i + 4]},
+                                                  "finish_reason": None}]}, ensure_ascii=False))
+            time.sleep(MockState.chunk_delay)
+        send(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        send(json.dumps({**base, "choices": [], "usage": usage}))
+        send("[DONE]")
+
+
+def start_server(port=8089, delay=0.2, failure_rate=0.0):
+    """在背景 thread 啟動模擬服務，回傳 server (呼叫 shutdown() 停止)"""
+    MockState.delay = delay
+    MockState.failure_rate = failure_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模擬 OpenAI chat completion 服務")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=0.2, help="每次回應的延遲秒數")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="回傳 500 的機率 (0~1)")
+    args = parser.parse_args()
+
+    MockState.delay = args.delay
+    MockState.failure_rate = args.failure_rate
+    print(f"模擬 LLM 服務: http://127.0.0.1:{args.port}/v1 (延遲 {args.delay}s, 失敗率 {args.failure_rate})")
+    ThreadingHTTPServer(("127.0.0.1", args.port), MockHandler).serve_forever()
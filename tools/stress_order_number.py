@@ -0,0 +1,150 @@
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from codes.order_sequence import (OrderNumberAllocator, OrderNumberExhaustedError, DAILY_CAPACITY,
+                                  CREATE_SEQUENCE_TABLE, SEED_SEQUENCE, NEXT_SEQUENCE)
+
+# 多執行緒壓力測試：模擬多台點餐機同時配發訂單號碼，確認沒有重複
+#   python tools/stress_order_number.py          連到 .env 設定的 MySQL
+#   python tools/stress_order_number.py --fake   不需資料庫，以記憶體內的模擬資料庫執行
+# 使用遠在未來的日期，不會影響當天的真實序號；結束後刪除該日期的計數列
+
+TEST_DATE = date(2099, 12, 31)
+KIOSKS = 8              # 模擬的點餐機數量 (各自獨立連線)
+THREADS_PER_KIOSK = 4   # 每台點餐機同時處理的請求
+ORDERS_PER_THREAD = 25
+
+
+class FakeSequenceServer:
+    """
+    模擬 MySQL 上的 order_sequences 表：ON DUPLICATE KEY UPDATE 在行鎖內完成遞增，
+    LAST_INSERT_ID 以連線為單位保存
+    """
+    def __init__(self):
+        self.rows = {}
+        self.row_lock = threading.Lock()
+        self.connections = []  # 閒置連線 (與連線池相同，後歸還的先借出)
+        self.pool_lock = threading.Lock()
+
+    def borrow(self):
+        with self.pool_lock:
+            return self.connections.pop() if self.connections else {"last_insert_id": 0}
+
+    def give_back(self, conn):
+        with self.pool_lock:
+            self.connections.append(conn)
+
+
+class FakeDB:
+    """與 codes.db.DB 介面相同：每個 thread 借一條連線，close() 時歸還"""
+    def __init__(self, server):
+        self.server = server
+        self._local = threading.local()
+
+    def _conn(self):
+        if getattr(self._local, "conn", None) is None:
+            self._local.conn = self.server.borrow()
+        return self._local.conn
+
+    def execute(self, query, params=None):
+        conn = self._conn()
+        if query == NEXT_SEQUENCE:
+            with self.server.row_lock:
+                value = self.server.rows.get(params[0], 0) + 1
+                self.server.rows[params[0]] = value
+            conn["last_insert_id"] = value
+            time.sleep(0)  # 讓其他 thread 有機會在遞增與讀取之間插入
+        elif query == SEED_SEQUENCE:
+            with self.server.row_lock:
+                self.server.rows.setdefault(params[0], 0)
+        elif query != CREATE_SEQUENCE_TABLE:
+            raise ValueError(f"模擬資料庫不支援的語句: {query}")
+        return True
+
+    def fetchone(self, query, params=None):
+        return {"seq": self._conn()["last_insert_id"]}
+
+    def close(self):
+        conn, self._local.conn = getattr(self._local, "conn", None), None
+        if conn is not None:
+            self.server.give_back(conn)
+
+    release = close  # 壓力測試不在請求內，用完立即歸還
+
+
+def stress_test(fake=False):
+    if fake:
+        server = FakeSequenceServer()
+        make_db = lambda: FakeDB(server)
+    else:
+        from codes.db import DB, dbconfig
+        make_db = lambda: DB(dbconfig())
+    allocators = [OrderNumberAllocator(make_db()) for _ in range(KIOSKS)]
+    order_numbers = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(allocator):
+        local = []
+        try:
+            for _ in range(ORDERS_PER_THREAD):
+                local.append(allocator.allocate(order_date=TEST_DATE)[0])
+        except Exception as e:
+            errors.append(e)
+        with lock:
+            order_numbers.extend(local)
+
+    threads = [
+        threading.Thread(target=worker, args=(allocator,))
+        for allocator in allocators
+        for _ in range(THREADS_PER_KIOSK)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 超過當天容量時必須拒絕配發，不能回到 A1
+    try:
+        allocators[0].allocate(order_date=TEST_DATE)
+        exhausted = False
+    except OrderNumberExhaustedError:
+        exhausted = True
+
+    if not fake:
+        cleanup = make_db()
+        cleanup.connect()
+        cleanup.execute("DELETE FROM order_sequences WHERE seq_date = %s", (TEST_DATE,))
+        cleanup.close()
+    for allocator in allocators:
+        allocator.db.close()
+
+    expected = KIOSKS * THREADS_PER_KIOSK * ORDERS_PER_THREAD
+    duplicates = [number for number, count in Counter(order_numbers).items() if count > 1]
+    over_capacity = [e for e in errors if isinstance(e, OrderNumberExhaustedError)]
+
+    print(f"配發數量: {len(order_numbers)} / {expected} (每天上限 {DAILY_CAPACITY})")
+    print(f"錯誤數量: {len(errors)} (號碼用完: {len(over_capacity)})")
+    print(f"重複號碼: {duplicates[:10]}")
+    print(f"用完後拒絕配發: {exhausted}")
+
+    return (not duplicates and exhausted and len(errors) == len(over_capacity)
+            and len(order_numbers) == min(expected, DAILY_CAPACITY))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="訂單號碼配發壓力測試")
+    parser.add_argument("--fake", action="store_true", help="不連資料庫，使用記憶體內的模擬資料庫")
+    args = parser.parse_args()
+    if stress_test(fake=args.fake):
+        print("✅ 沒有重複的訂單號碼")
+    else:
+        print("❌ 訂單號碼配發異常")
+        sys.exit(1)
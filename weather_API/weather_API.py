@@ -25,7 +25,8 @@ def classify_weather(weather: str, weather_dict: list[dict]):
 
 # 中央氣象局API設定
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")  # 請確認這是您的有效金鑰
-WEATHER_API_URL = "https://opendata.cwa.gov.tw/api/v1/rest/datastore/O-A0001-001"      #now
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://opendata.cwa.gov.tw/api/v1/rest/datastore/O-A0001-001")  #now (可改指向本機 stub)
+WEATHER_API_TIMEOUT = float(os.getenv("WEATHER_API_TIMEOUT", 5))
 FORECAST_WEATHER_URL = "https://opendata.cwa.gov.tw/api/v1/rest/datastore/F-D0047-091" #tomorrow
 
 def get_weather_data(station_ID="467490", target_station="后里"):
@@ -36,7 +37,7 @@ def get_weather_data(station_ID="467490", target_station="后里"):
             "elementName": "TEMP"  # 取得溫度與天氣狀況
         }
 
-        response = requests.get(WEATHER_API_URL, params=params)
+        response = requests.get(WEATHER_API_URL, params=params, timeout=WEATHER_API_TIMEOUT)
 
         if response.status_code != 200:
             print(f"HTTP錯誤: {response.status_code}")
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from weather_API.weather_API import get_weather_data
+
+# 背景更新間隔 (秒)
+WEATHER_REFRESH_INTERVAL = int(os.getenv("WEATHER_REFRESH_INTERVAL", 300))
+# 快取可接受的最長時間 (秒)，超過視為沒有資料
+WEATHER_MAX_STALENESS = int(os.getenv("WEATHER_MAX_STALENESS", 1800))
+# 測站還沒有資料時，等待背景第一次取得的最長秒數 (從該測站第一次被查詢起算)
+WEATHER_SEED_TIMEOUT = float(os.getenv("WEATHER_SEED_TIMEOUT", 5))
+
+DEFAULT_STATION = ("467490", "后里")
+
+
+class WeatherCache:
+    """
+    保存每個測站最新的觀測資料，由背景 thread 定期更新
+    呼叫端直接取得快取結果；請求一律由背景 thread 發送，測站還沒有資料時最多等待 seed_timeout 秒
+    """
+    def __init__(self, fetcher=get_weather_data,
+                 refresh_interval=WEATHER_REFRESH_INTERVAL,
+                 max_staleness=WEATHER_MAX_STALENESS,
+                 seed_timeout=WEATHER_SEED_TIMEOUT):
+        self.fetcher = fetcher
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.seed_timeout = seed_timeout
+        self._data = {}          # (station_ID, target_station) -> (fetched_at, 觀測結果)
+        self._stations = {DEFAULT_STATION}
+        self._pending = set()    # 正在更新中的測站，避免重複發送請求
+        self._first_fetch = {}   # 測站 -> Event，第一次取得結束 (成功或失敗) 時設定
+        self._seed_deadline = {} # 測站 -> 等待第一次取得的截止時間
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def refresh(self, station_ID, target_station):
+        """向 API 取得最新觀測並寫入快取，失敗時保留舊資料"""
+        key = (station_ID, target_station)
+        try:
+            result = self.fetcher(station_ID, target_station)
+            if isinstance(result, tuple) and len(result) >= 4:
+                with self._lock:
+                    self._data[key] = (time.monotonic(), result)
+            else:
+                print(f"天氣快取更新失敗 {key}: {result}")
+            return result
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+                self._first_fetch.setdefault(key, threading.Event()).set()
+
+    def refresh_all(self):
+        with self._lock:
+            stations = [key for key in self._stations if key not in self._pending]
+            self._pending.update(stations)
+        for station_ID, target_station in stations:
+            self.refresh(station_ID, target_station)
+
+    def _refresh_in_background(self, key):
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        threading.Thread(target=self.refresh, args=key, daemon=True).start()
+
+    def _seed(self, key):
+        """
+        測站還沒有資料時等待背景的第一次取得 (不持有鎖、不在呼叫端的 thread 發送請求)
+        所有呼叫端共用同一個截止時間，API 沒有回應時最多只拖慢 seed_timeout 秒內的請求
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry:
+                return entry
+            fetched = self._first_fetch.setdefault(key, threading.Event())
+            deadline = self._seed_deadline.setdefault(key, time.monotonic() + self.seed_timeout)
+        if not fetched.is_set():
+            # 背景 thread 已在取得時 (例如剛 start()) 不會重複發送
+            self._refresh_in_background(key)
+            fetched.wait(max(deadline - time.monotonic(), 0))
+        with self._lock:
+            return self._data.get(key)
+
+    def get(self, station_ID=DEFAULT_STATION[0], target_station=DEFAULT_STATION[1], max_staleness=None):
+        """
+        回傳快取中的觀測 (測站, 地點, 天氣狀況, 溫度)
+        測站第一次取得完成前等待 (開機後的第一個請求也有資料)；之後不會等待 API，
+        沒有資料或資料超過 max_staleness 秒時回傳 None，並在背景觸發更新
+        """
+        key = (station_ID, target_station)
+        max_staleness = self.max_staleness if max_staleness is None else max_staleness
+
+        with self._lock:
+            self._stations.add(key)
+            entry = self._data.get(key)
+        if entry is None:
+            entry = self._seed(key)
+
+        if entry and time.monotonic() - entry[0] <= max_staleness:
+            return entry[1]
+
+        self._refresh_in_background(key)
+        return None
+
+    def age(self, station_ID=DEFAULT_STATION[0], target_station=DEFAULT_STATION[1]):
+        """快取資料的經過秒數，沒有資料時回傳 None"""
+        entry = self._data.get((station_ID, target_station))
+        return time.monotonic() - entry[0] if entry else None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh_all()
+            except Exception as e:
+                print(f"天氣快取背景更新錯誤: {e}")
+            self._stop_event.wait(self.refresh_interval)
+
+    def start(self):
+        """啟動背景更新 thread (重複呼叫只會啟動一次)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="weather-cache", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# 全域共用的天氣快取
+weather_cache = WeatherCache()
+
+
+def get_cached_weather(station_ID=DEFAULT_STATION[0], target_station=DEFAULT_STATION[1], max_staleness=None):
+    """get_weather_data 的快取版本，回傳格式相同；沒有可用資料時回傳 None (app 初始化時應先 weather_cache.start())"""
+    weather_cache.start()
+    return weather_cache.get(station_ID, target_station, max_staleness)